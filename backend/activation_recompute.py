@@ -0,0 +1,131 @@
+"""
+Activation Recomputation
+Trades compute for memory when fine-tuning the whole network, used by
+train_model.py --recompute and benchmark_finetuning.py
+
+The functional graph is cut into segments at tensors that carry the whole
+state of the forward pass (in EfficientNetB0 roughly every block boundary
+and the narrow points inside blocks). Each segment runs under
+tf.recompute_grad: the forward pass keeps only the segment inputs, and the
+backward pass runs each segment again to get the activations it needs.
+With about sqrt(n) segments for n cut points, the stored activations shrink
+to the segment inputs plus one segment at a time, for roughly one extra
+forward pass per step.
+
+The cut points are found in Keras 3's functional graph, so this needs
+TensorFlow >= 2.16 (train_model.py checks before training).
+
+The recomputed model shares every layer and weight with the original one,
+so the original stays the model that is saved and served.
+PinnedModelCheckpoint saves it while fit runs on the recomputed one.
+
+Usage:
+    from activation_recompute import with_recomputation
+    training_model = with_recomputation(model)
+"""
+
+import math
+import tensorflow as tf
+from tensorflow.keras.callbacks import ModelCheckpoint
+
+
+class RecomputeSegment(tf.keras.layers.Layer):
+    """Runs a sub-model under tf.recompute_grad when training"""
+    
+    def __init__(self, segment, **kwargs):
+        super().__init__(**kwargs)
+        self.segment = segment
+        # State the forward pass changes: dropout and stochastic-depth seeds, batch normalization moving statistics
+        layers = list(segment._flatten_layers())
+        self.state_variables = [layer.seed_generator.state for layer in layers if hasattr(layer, "seed_generator")]
+        self.state_variables += [
+            variable
+            for layer in layers if isinstance(layer, tf.keras.layers.BatchNormalization)
+            for variable in (layer.moving_mean, layer.moving_variance)
+        ]
+    
+    def call(self, inputs, training=None):
+        if not training:
+            return self.segment(inputs, training=training)
+        
+        # The recomputation starts from the same state as the forward pass: it draws the same
+        # dropout masks, and the moving statistics end up updated once per step, not twice
+        states = [tf.identity(variable.value) for variable in self.state_variables]
+        
+        def run(x):
+            for variable, state in zip(self.state_variables, states):
+                variable.assign(state)
+            return self.segment(x, training=True)
+        
+        return tf.recompute_grad(run)(inputs)
+    
+    def compute_output_shape(self, input_shape):
+        return self.segment.compute_output_shape(input_shape)
+
+
+def cut_points(model):
+    """Tensors in execution order after which no earlier tensor is needed any more"""
+    if int(tf.keras.__version__.split(".")[0]) < 3:
+        raise RuntimeError(f"Activation recomputation needs Keras 3 (TensorFlow >= 2.16), found {tf.keras.__version__}")
+    model = getattr(model, "_functional", None) or model
+    nodes = [
+        node
+        for depth in sorted(model._nodes_by_depth, reverse=True)
+        for node in model._nodes_by_depth[depth]
+        if node.operation and not node.is_input
+    ]
+    last_use = {}
+    for position, node in enumerate(nodes):
+        for x in node.input_tensors:
+            last_use[id(x)] = position
+    
+    cuts = []
+    needed_until = -1  # Last position where a tensor made before the current node is consumed
+    for position, node in enumerate(nodes[:-1]):
+        if needed_until <= position and len(node.outputs) == 1:
+            cuts.append(node.outputs[0])
+        for x in node.outputs:
+            needed_until = max(needed_until, last_use.get(id(x), position))
+    return cuts
+
+
+def with_recomputation(model, segments=0):
+    """
+    Same model, but with activations recomputed in the backward pass
+    
+    Each recomputation restores the seeds and batch normalization moving
+    statistics the forward pass started from, so a step trains exactly
+    what it would without recomputation.
+    
+    Args:
+        model: Functional model with one input and one output
+        segments: Number of recomputed segments (0 = sqrt of the number of cut points)
+    
+    Returns:
+        Model sharing all layers with model
+    """
+    cuts = cut_points(model)
+    if not cuts:
+        return model
+    segments = min(segments or round(math.sqrt(len(cuts))), len(cuts)) or 1
+    boundaries = [cuts[round(k * len(cuts) / segments) - 1] for k in range(1, segments)]
+    
+    inputs = tf.keras.Input(shape=model.input_shape[1:])
+    x = inputs
+    start = model.inputs[0]
+    for index, end in enumerate(boundaries + [model.outputs[0]]):
+        segment = tf.keras.Model(start, end, name=f"{model.name}_segment_{index}")
+        x = RecomputeSegment(segment, name=f"recompute_segment_{index}")(x)
+        start = end
+    return tf.keras.Model(inputs, x, name=f"{model.name}_recomputed")
+
+
+class PinnedModelCheckpoint(ModelCheckpoint):
+    """ModelCheckpoint that always saves the given model, even when fit trains another one sharing its weights"""
+    
+    def __init__(self, saved_model, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.saved_model = saved_model
+    
+    def set_model(self, model):
+        super().set_model(self.saved_model)
@@ -2,6 +2,9 @@ from pydantic_settings import BaseSettings
 from typing import List
 import os
 
+# Publicly known keys that must never protect a model server
+INSECURE_MODEL_SERVER_AUTHKEYS = {"oral-lesion-model-server"}
+
 
 class Settings(BaseSettings):
     """Application settings and configuration"""
@@ -25,11 +28,115 @@ class Settings(BaseSettings):
     # Model Settings
     MODEL_PATH: str = os.path.join("models", "oral_lesion_model.h5")
     MODEL_TYPE: str = "tensorflow"  # tensorflow, pytorch, onnx
+    SERVING_MODEL_PATH: str = os.path.join("models", "oral_lesion_model_serving.pb")  # Written by export_serving_model.py
+    USE_SERVING_ARTIFACT: bool = True  # Serve the frozen graph when it is up to date with MODEL_PATH
+    
+    # Cascade Settings (a small screening model answers confident cases; run calibrate_cascade.py)
+    CASCADE_ENABLED: bool = False
+    SCREENING_MODEL_PATH: str = os.path.join("models", "oral_lesion_screening_model.h5")
+    CASCADE_LOWER_THRESHOLD: float = 0.1  # Screening malignant probability below this is answered as Benign
+    CASCADE_UPPER_THRESHOLD: float = 0.9  # Screening malignant probability above this is answered as Malignant
+    
+    # Inference Runtime Settings (run autotune.py to size these per machine)
+    TF_INTRA_OP_THREADS: int = 0  # Threads used inside a single op (0 = TensorFlow default)
+    TF_INTER_OP_THREADS: int = 0  # Independent ops run concurrently (0 = TensorFlow default)
+    INFERENCE_WORKERS: int = 1  # Number of server worker processes, each with its own model instance
+    INFERENCE_BATCH_SIZE: int = 8  # Max images per model call in /batch-predict
+    USE_COMPILED_INFERENCE: bool = True  # Use pre-traced functions instead of model.predict
+    INFERENCE_BATCH_BUCKETS: List[int] = [1, 2, 4, 8, 16, 32]  # Padded batch sizes traced at startup
+    MC_DROPOUT_SAMPLES: int = 32  # Stochastic head passes behind /predict?uncertainty=true
+    
+    # Batch Pipeline Settings (decode, inference and post-processing overlap, utilization under /admin/pipeline)
+    PIPELINE_DECODE_WORKERS: int = 2  # Threads decoding and resizing uploads in /batch-predict
+    PIPELINE_QUEUE_SIZE: int = 16  # Max items waiting between two stages
+    PIPELINE_BATCH_WAIT_MS: float = 5.0  # Max wait for a fuller batch before the model starts on a partial one
+    
+    # Model Server Settings (run inference in separate processes, start them with run_model_server.py)
+    MODEL_SERVER_ENABLED: bool = False  # API workers send tensors to model servers instead of loading the model
+    MODEL_SERVER_ADDRESSES: List[str] = ["127.0.0.1:8765"]  # One model server process per address
+    # Shared secret for the control channel, required: it carries pickled messages, so anyone holding
+    # the key can run code in the model server (e.g. python -c "import secrets; print(secrets.token_hex(32))")
+    MODEL_SERVER_AUTHKEY: str = ""
+    MODEL_SERVER_SLOTS: int = 32  # Shared-memory tensor slots per API worker and server
+    MODEL_SERVER_MAX_BATCH: int = 16  # Max images the server batches into one model call
+    MODEL_SERVER_BATCH_TIMEOUT_MS: float = 2.0  # How long the server waits to fill a batch
+    MODEL_SERVER_TIMEOUT_SECONDS: float = 30.0  # Max wait for a slot or a result
+    MODEL_SERVER_CONNECT_TIMEOUT_SECONDS: float = 60.0  # How long API workers wait for servers at startup
+    MODEL_SERVER_PIN_CORES: bool = False  # Pin each model server to its own block of cores with matching TF threads
+    MODEL_SERVER_CORES_PER_INSTANCE: int = 0  # Cores per pinned model server (0 = split all cores evenly)
+    
+    # Admission Control Settings (load shedding in front of inference)
+    MAX_CONCURRENT_INFERENCES: int = 2  # Requests allowed to decode/infer at the same time
+    MAX_QUEUE_SIZE: int = 32  # Requests allowed to wait for a slot before returning 503
+    REQUEST_DEADLINE_SECONDS: float = 10.0  # Queued requests older than this are rejected
+    MAX_REQUESTS_PER_CLIENT: int = 4  # Running + queued requests per client before returning 429
+    RETRY_AFTER_SECONDS: int = 1  # Retry-After hint used until service times are known
+    DISCONNECT_POLL_SECONDS: float = 0.1  # How often queued requests check for client disconnect
+    
+    # Similar-Case Retrieval Settings (build the index with build_reference_index.py)
+    REFERENCE_DATA_PATH: str = "reference_data"  # Class folders of confirmed reference images
+    REFERENCE_INDEX_PATH: str = os.path.join("models", "reference_index.npz")
+    INDEX_DTYPE: str = "float16"  # float16 or int8
+    INDEX_IVF_LISTS: int = 0  # 0 = brute force; >0 partitions the index for large reference sets
+    INDEX_IVF_PROBE: int = 8  # IVF lists scanned per query
+    SIMILAR_CASES_K: int = 5  # Default number of similar cases returned
+    MAX_SIMILAR_CASES_K: int = 50
+    
+    # Admin Settings (every /admin/* route requires the "X-Admin-Token: <token>" header)
+    ADMIN_TOKEN: str = ""  # Empty locks /admin/* and the X-Profile header
+    
+    # Profiling Settings (per-request sampling profiler, browse results under /admin/profiles)
+    PROFILE_SAMPLE_RATE: float = 0.0  # Fraction of /predict requests profiled automatically
+    PROFILE_INTERVAL_MS: float = 1.0  # Stack sampling interval
+    PROFILE_DIR: str = "profiles"
+    PROFILE_MAX_STORED: int = 200  # Oldest profiles are deleted beyond this
+    
+    # Tracing Settings (spans for every request stage, query them under /admin/traces)
+    TRACING_ENABLED: bool = True
+    TRACE_BUFFER_SIZE: int = 10000  # Most recent spans kept in memory
+    TRACE_EXPORT_PATH: str = ""  # Also append finished spans as JSON lines to this file ("" = memory only)
+    
+    # Audit Log Settings (every prediction is recorded in SQLite, query it under /admin/audit)
+    AUDIT_ENABLED: bool = True
+    AUDIT_DB_PATH: str = os.path.join("audit", "predictions.db")
+    AUDIT_QUEUE_SIZE: int = 10000  # Records waiting for the writer; beyond this they are dropped and counted
+    AUDIT_FLUSH_SIZE: int = 256  # Write a batch as soon as this many records are waiting
+    AUDIT_FLUSH_INTERVAL_MS: float = 200.0  # ...or once the oldest waiting record is this old
+    
+    # Drift Monitor Settings (build the reference with build_drift_reference.py, scores under /admin/drift)
+    DRIFT_MONITOR_ENABLED: bool = True
+    DRIFT_REFERENCE_PATH: str = os.path.join("models", "drift_reference.json")
+    DRIFT_WINDOW_SIZE: int = 500  # Images per comparison window
+    DRIFT_MIN_IMAGES: int = 50  # Windows with fewer images get no drift scores
+    DRIFT_PSI_WARNING: float = 0.1  # Histogram PSI that counts as a moderate shift
+    DRIFT_PSI_ALERT: float = 0.25  # Histogram PSI that counts as drift
+    DRIFT_MEAN_SHIFT_ALERT: float = 0.25  # Channel mean shift, in reference standard deviations
+    DRIFT_VARIANCE_RATIO_ALERT: float = 1.5  # Channel variance ratio (either direction)
     
     # Image Processing Settings
     IMAGE_SIZE: tuple = (224, 224)
     IMAGE_CHANNELS: int = 3
     
+    # Image Quality Gate (the API endpoints reject unusable photos before the full decode and inference;
+    # offline tools only apply it when asked, e.g. bulk_predict.py --quality-gate)
+    QUALITY_GATE_ENABLED: bool = True
+    QUALITY_THUMBNAIL_SIZE: int = 128  # Longest side of the grayscale thumbnail the checks run on
+    QUALITY_MIN_SHARPNESS: float = 2.0  # Minimum Laplacian variance, in % of the thumbnail's contrast (lower = blurrier)
+    QUALITY_MIN_BRIGHTNESS: float = 35.0  # Minimum mean gray level (0-255)
+    QUALITY_MAX_BRIGHTNESS: float = 225.0  # Maximum mean gray level (0-255)
+    QUALITY_DARK_LEVEL: int = 20  # Gray levels at or below this count as crushed shadows
+    QUALITY_BRIGHT_LEVEL: int = 245  # Gray levels at or above this count as blown highlights
+    QUALITY_MIN_COVERAGE: float = 0.5  # Minimum fraction of pixels that are neither crushed nor blown out
+    
+    # Tiled Inference Settings (/predict-tiled keeps small lesions in large photos visible)
+    TILED_MAX_SIDE: int = 1344  # Longest side the image is scaled to before tiling (6 tiles of 224)
+    TILE_OVERLAP: float = 0.25  # Fraction of a tile shared with its neighbour
+    TILE_BUDGET: int = 64  # Max tiles run through the model per image, most textured first
+    TILE_MIN_FOREGROUND: float = 0.6  # Min fraction of well-exposed pixels for a tile to count as tissue
+    TILE_MIN_STD: float = 6.0  # Min gray-level standard deviation; flatter tiles are background
+    TILED_AGGREGATION: str = "topk"  # "max" or "topk" (mean of the TILED_TOP_K highest-scoring tiles)
+    TILED_TOP_K: int = 3
+    
     # Class Names (Update these based on your actual classes)
     CLASS_NAMES: List[str] = [
         "Normal",
@@ -46,6 +153,16 @@ class Settings(BaseSettings):
     # File Upload Settings
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: List[str] = ["jpg", "jpeg", "png"]
+    MAX_RAW_BATCH_SIZE: int = 32  # Max frames per /predict-raw request
+    
+    def model_server_authkey(self) -> bytes:
+        """MODEL_SERVER_AUTHKEY as bytes; refuses an empty key or the one older releases shipped with"""
+        if not self.MODEL_SERVER_AUTHKEY or self.MODEL_SERVER_AUTHKEY in INSECURE_MODEL_SERVER_AUTHKEYS:
+            raise RuntimeError(
+                "MODEL_SERVER_AUTHKEY must be set to a private random value (in .env or the environment) "
+                "before model servers can be started or connected to"
+            )
+        return self.MODEL_SERVER_AUTHKEY.encode()
     
     class Config:
         env_file = ".env"
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 
 class HealthResponse(BaseModel):
@@ -9,11 +9,22 @@ class HealthResponse(BaseModel):
     version: str = Field(..., description="API version")
 
 
+class UncertaintyEstimate(BaseModel):
+    """Monte-Carlo dropout statistics over repeated stochastic passes of the classification head"""
+    samples: int = Field(..., description="Number of stochastic head passes")
+    mean_probabilities: Dict[str, float] = Field(..., description="Mean probability for each class across passes")
+    variance: Dict[str, float] = Field(..., description="Variance of each class probability across passes")
+    predictive_entropy: float = Field(..., ge=0.0, description="Entropy of the mean probabilities (nats)")
+    mutual_information: float = Field(..., ge=0.0, description="Share of the entropy due to model uncertainty (nats)")
+
+
 class PredictionResponse(BaseModel):
     """Prediction response model"""
     prediction: str = Field(..., description="Predicted lesion class")
     confidence: float = Field(..., ge=0.0, le=1.0, description="Prediction confidence (0-1)")
     probabilities: Dict[str, float] = Field(..., description="Probability for each class")
+    stage: Optional[str] = Field(None, description="Cascade stage that produced the answer (screening/full)")
+    uncertainty: Optional[UncertaintyEstimate] = Field(None, description="Only with ?uncertainty=true")
     
     class Config:
         json_schema_extra = {
@@ -26,11 +37,57 @@ class PredictionResponse(BaseModel):
                     "Erythroplakia": 0.03,
                     "Ulcer": 0.02,
                     "Oral Squamous Cell Carcinoma": 0.02
-                }
+                },
+                "stage": "full"
+            }
+        }
+
+
+class SimilarCase(BaseModel):
+    """A labeled reference image close to the query in embedding space"""
+    label: str = Field(..., description="Confirmed label of the reference image")
+    path: str = Field(..., description="Reference image path relative to the reference dataset")
+    similarity: float = Field(..., description="Cosine similarity to the query image (-1 to 1)")
+
+
+class SimilarCasesResponse(PredictionResponse):
+    """Prediction plus the nearest labeled reference cases"""
+    similar_cases: List[SimilarCase] = Field(..., description="Most similar reference cases, closest first")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "prediction": "Benign",
+                "confidence": 0.88,
+                "probabilities": {"Benign": 0.88, "Malignant": 0.12},
+                "similar_cases": [
+                    {"label": "Benign", "path": "Benign/case_0142.jpg", "similarity": 0.93},
+                    {"label": "Benign", "path": "Benign/case_0077.jpg", "similarity": 0.91}
+                ]
             }
         }
 
 
+class TileSummary(BaseModel):
+    """How an image was tiled for /predict-tiled"""
+    grid: List[int] = Field(..., description="Tile grid as [rows, cols]")
+    total: int = Field(..., description="Number of tiles in the grid")
+    evaluated: int = Field(..., description="Tiles run through the model")
+    skipped_background: int = Field(..., description="Tiles skipped as background")
+    skipped_budget: int = Field(..., description="Tissue tiles dropped by the tile budget")
+    tiled_size: List[int] = Field(..., description="Image size [width, height] the tiles were cut from")
+    scale: float = Field(..., description="Tiled size relative to the uploaded image")
+    aggregation: str = Field(..., description="How tile outputs were combined (max/topk)")
+
+
+class TiledPredictionResponse(PredictionResponse):
+    """Image-level prediction from tiles plus a per-tile lesion heatmap"""
+    tiles: TileSummary
+    heatmap: List[List[Optional[float]]] = Field(
+        ..., description="Lesion score per tile, row by row; null where the tile was skipped"
+    )
+
+
 class ErrorResponse(BaseModel):
     """Error response model"""
     error: str = Field(..., description="Error type")
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of being queued for inference"""
+    
+    def __init__(self, status_code: int, message: str, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.retry_after = retry_after
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client goes away while its request is still queued"""
+
+
+class AdmissionController:
+    """
+    Bounded admission queue in front of the inference path
+    
+    At most MAX_CONCURRENT_INFERENCES requests run at once. Up to
+    MAX_QUEUE_SIZE more wait in FIFO order; anything beyond that is rejected
+    immediately with 503, as are requests still queued when their deadline
+    passes. Each client may hold at most MAX_REQUESTS_PER_CLIENT slots
+    (running or queued) before getting 429.
+    """
+    
+    def __init__(self):
+        self.max_concurrent = settings.MAX_CONCURRENT_INFERENCES
+        self.max_queue_size = settings.MAX_QUEUE_SIZE
+        self.deadline_seconds = settings.REQUEST_DEADLINE_SECONDS
+        self.max_per_client = settings.MAX_REQUESTS_PER_CLIENT
+        self.disconnect_poll_seconds = settings.DISCONNECT_POLL_SECONDS
+        
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._client_requests: Dict[str, int] = defaultdict(int)
+        
+        # Exponentially weighted average of time spent holding a slot
+        self._avg_service_seconds: Optional[float] = None
+        
+        self.stats = {
+            "admitted": 0,
+            "rejected_queue_full": 0,
+            "rejected_client_limit": 0,
+            "expired_in_queue": 0,
+            "cancelled_disconnected": 0,
+        }
+    
+    @asynccontextmanager
+    async def admit(
+        self,
+        client_id: str,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ):
+        """
+        Hold an inference slot for the duration of the block
+        
+        Args:
+            client_id: Identifier used for the per-client concurrency limit
+            is_disconnected: Coroutine function polled while queued
+        
+        Raises:
+            AdmissionRejected: Client limit reached, queue full or deadline passed
+            ClientDisconnected: Client disconnected before inference started
+        """
+        if self._client_requests[client_id] >= self.max_per_client:
+            self.stats["rejected_client_limit"] += 1
+            raise AdmissionRejected(
+                429,
+                f"Too many concurrent requests from this client (limit {self.max_per_client})",
+                self.retry_after()
+            )
+        
+        if self._active >= self.max_concurrent and len(self._waiters) >= self.max_queue_size:
+            self.stats["rejected_queue_full"] += 1
+            raise AdmissionRejected(503, "Server is busy, inference queue is full", self.retry_after())
+        
+        self._client_requests[client_id] += 1
+        try:
+            await self._acquire(time.monotonic() + self.deadline_seconds, is_disconnected)
+            self.stats["admitted"] += 1
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self._record_service_time(time.perf_counter() - start)
+                self._release()
+        finally:
+            self._client_requests[client_id] -= 1
+            if self._client_requests[client_id] <= 0:
+                del self._client_requests[client_id]
+    
+    async def _acquire(
+        self,
+        deadline: float,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]]
+    ) -> None:
+        """Wait for a free slot, giving up on deadline or client disconnect"""
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            return
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["expired_in_queue"] += 1
+                    raise AdmissionRejected(
+                        503,
+                        "Request deadline exceeded while waiting for inference",
+                        self.retry_after()
+                    )
+                
+                try:
+                    # _release hands the slot over by resolving the waiter
+                    await asyncio.wait_for(
+                        asyncio.shield(waiter),
+                        timeout=min(self.disconnect_poll_seconds, remaining)
+                    )
+                    return
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        self.stats["cancelled_disconnected"] += 1
+                        raise ClientDisconnected("Client disconnected before inference started")
+        
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed to us just as we gave up, pass it on
+                self._release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+    
+    def _release(self) -> None:
+        """Hand the slot to the next queued request, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+    
+    def _record_service_time(self, seconds: float) -> None:
+        if self._avg_service_seconds is None:
+            self._avg_service_seconds = seconds
+        else:
+            self._avg_service_seconds = 0.8 * self._avg_service_seconds + 0.2 * seconds
+    
+    def retry_after(self) -> int:
+        """Estimate seconds until the current queue drains"""
+        if self._avg_service_seconds is None:
+            return settings.RETRY_AFTER_SECONDS
+        
+        queued_batches = (len(self._waiters) + self._active) / max(1, self.max_concurrent)
+        return max(1, math.ceil(queued_batches * self._avg_service_seconds))
+    
+    def get_stats(self) -> Dict[str, any]:
+        """Current queue depth and admission counters"""
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue_size": self.max_queue_size,
+            "avg_service_ms": (self._avg_service_seconds or 0.0) * 1000,
+            **self.stats
+        }
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    "created", "endpoint", "trace_id", "filename", "input_sha256", "input_bytes", "model_version",
+    "prediction", "confidence", "probabilities", "stage", "latency_ms", "error"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    endpoint TEXT NOT NULL,
+    trace_id TEXT,
+    filename TEXT,
+    input_sha256 TEXT,
+    input_bytes INTEGER,
+    model_version TEXT,
+    prediction TEXT,
+    confidence REAL,
+    probabilities TEXT,
+    stage TEXT,
+    latency_ms REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_input_sha256 ON predictions (input_sha256);
+CREATE INDEX IF NOT EXISTS idx_predictions_created ON predictions (created);
+"""
+
+INSERT = (
+    f"INSERT INTO predictions ({', '.join(COLUMNS)}) "
+    f"VALUES ({', '.join(':' + column for column in COLUMNS)})"
+)
+
+
+def hash_input(contents: bytes) -> str:
+    """SHA-256 of the uploaded bytes, the key prediction records are looked up by"""
+    return hashlib.sha256(contents).hexdigest()
+
+
+class AuditLog:
+    """
+    Persistent record of every prediction in a local SQLite database
+    
+    Request threads only put a record on a bounded in-memory queue; a
+    background writer drains it and inserts records in one transaction
+    per batch, flushing when AUDIT_FLUSH_SIZE records are waiting or the
+    oldest has waited AUDIT_FLUSH_INTERVAL_MS. The database runs in WAL
+    mode so lookups never block the writer. When the queue is full,
+    records are dropped and counted rather than slowing requests down.
+    """
+    
+    def __init__(self):
+        self.enabled = settings.AUDIT_ENABLED
+        self.db_path = settings.AUDIT_DB_PATH
+        self.flush_size = settings.AUDIT_FLUSH_SIZE
+        self.flush_interval = settings.AUDIT_FLUSH_INTERVAL_MS / 1000.0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {
+            "recorded": 0,
+            "written": 0,
+            "dropped": 0,
+            "write_errors": 0,
+            "flushes": 0,
+            "last_flush_size": 0,
+            "last_flush_ms": 0.0,
+            "max_queue_depth": 0,
+        }
+    
+    def start(self) -> None:
+        """Create the database and start the background writer"""
+        if not self.enabled or self._writer is not None:
+            return
+        
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+        
+        self._writer = threading.Thread(target=self._write_loop, name="audit-writer", daemon=True)
+        self._writer.start()
+        logger.info(f"Audit log writing to {self.db_path}")
+    
+    def close(self) -> None:
+        """Flush everything still queued and stop the writer"""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join(timeout=10)
+        self._writer = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, timeout=5.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL survives application crashes; only an OS crash can lose the last commits
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+    
+    def record(self, endpoint: str, input_sha256: Optional[str], input_bytes: int, model_version: Optional[str],
+               result: Optional[Dict[str, any]], latency_ms: float, trace_id: Optional[str] = None,
+               filename: Optional[str] = None, error: Optional[str] = None) -> None:
+        """
+        Queue one prediction for the audit log without blocking
+        
+        Args:
+            endpoint: Endpoint that served the prediction
+            input_sha256: hash_input() of the uploaded bytes
+            input_bytes: Upload size
+            model_version: ModelService.model_version of the model that answered
+            result: Prediction dictionary, or None if the image failed
+            latency_ms: Time from request start to result
+            trace_id: Trace the request belongs to
+            filename: Uploaded filename
+            error: Error message if the image failed
+        """
+        if not self.enabled or self._writer is None:
+            return
+        
+        result = result or {}
+        entry = {
+            "created": time.time(),
+            "endpoint": endpoint,
+            "trace_id": trace_id,
+            "filename": filename,
+            "input_sha256": input_sha256,
+            "input_bytes": input_bytes,
+            "model_version": model_version,
+            "prediction": result.get("prediction"),
+            "confidence": result.get("confidence"),
+            "probabilities": json.dumps(result["probabilities"]) if "probabilities" in result else None,
+            "stage": result.get("stage"),
+            "latency_ms": round(latency_ms, 3),
+            "error": error,
+        }
+        
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped"] += 1
+            return
+        
+        with self._lock:
+            self.stats["recorded"] += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self._queue.qsize())
+    
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        stopping = False
+        
+        while not stopping:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            batch = [entry]
+            
+            # Collect until the batch is full or the first record has waited long enough
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            
+            self._flush(connection, batch)
+        
+        connection.close()
+    
+    def _flush(self, connection: sqlite3.Connection, batch: List[Dict[str, any]]) -> None:
+        start = time.perf_counter()
+        try:
+            with connection:
+                connection.executemany(INSERT, batch)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to write {len(batch)} audit records: {str(e)}")
+            with self._lock:
+                self.stats["write_errors"] += len(batch)
+            return
+        
+        with self._lock:
+            self.stats["written"] += len(batch)
+            self.stats["flushes"] += 1
+            self.stats["last_flush_size"] = len(batch)
+            self.stats["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    
+    def get_stats(self) -> Dict[str, any]:
+        """Queue depth and writer counters; a growing queue or dropped records mean the writer lags"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update({
+            "enabled": self.enabled,
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "mean_flush_size": round(stats["written"] / stats["flushes"], 2) if stats["flushes"] else 0.0,
+        })
+        return stats
+    
+    def find(self, input_sha256: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None, limit: int = 100) -> List[Dict[str, any]]:
+        """
+        Look up written records, newest first
+        
+        Args:
+            input_sha256: Only records of this input
+            since: Only records created at or after this Unix time
+            until: Only records created before this Unix time
+            limit: Max records returned
+        
+        Returns:
+            List of record dictionaries
+        """
+        if not self.enabled or not os.path.exists(self.db_path):
+            return []
+        
+        conditions, params = [], []
+        if input_sha256 is not None:
+            conditions.append("input_sha256 = ?")
+            params.append(input_sha256.lower())
+        if since is not None:
+            conditions.append("created >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        # Readers get their own connection; in WAL mode they never wait on the writer
+        connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=5.0)
+        connection.row_factory = sqlite3.Row
+        try:
+            rows = connection.execute(
+                f"SELECT * FROM predictions {where} ORDER BY created DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        finally:
+            connection.close()
+        
+        records = []
+        for row in rows:
+            record = dict(row)
+            if record["probabilities"] is not None:
+                record["probabilities"] = json.loads(record["probabilities"])
+            records.append(record)
+        return records
@@ -0,0 +1,112 @@
+import numpy as np
+import logging
+import os
+from typing import Dict, List
+
+from app.core.config import settings
+from app.services.model_service import ModelService
+
+logger = logging.getLogger(__name__)
+
+STAGE_SCREENING = "screening"
+STAGE_FULL = "full"
+
+
+class CascadeService:
+    """
+    Two-stage inference: a cheap screening model answers confident images
+    and only images inside the uncertainty band are escalated to the full model
+    
+    An image is escalated when the screening model's malignant probability
+    falls inside [CASCADE_LOWER_THRESHOLD, CASCADE_UPPER_THRESHOLD]. Both
+    models must be binary (Benign vs Malignant). Use calibrate_cascade.py to
+    pick band limits that keep sensitivity unchanged on test_data.
+    """
+    
+    def __init__(self, full_model: ModelService):
+        self.full_model = full_model
+        self.screening_model = ModelService(model_path=settings.SCREENING_MODEL_PATH)
+        self.lower_threshold = settings.CASCADE_LOWER_THRESHOLD
+        self.upper_threshold = settings.CASCADE_UPPER_THRESHOLD
+        self.enabled = False
+        self.stats = {STAGE_SCREENING: 0, STAGE_FULL: 0}
+    
+    def load_model(self) -> None:
+        """Load the screening model if the cascade is enabled"""
+        if not settings.CASCADE_ENABLED:
+            return
+        
+        if not os.path.exists(settings.SCREENING_MODEL_PATH):
+            logger.warning(f"Screening model not found at {settings.SCREENING_MODEL_PATH}, cascade disabled")
+            return
+        
+        if not 0.0 <= self.lower_threshold <= 0.5 <= self.upper_threshold <= 1.0:
+            logger.error(
+                f"Invalid cascade band [{self.lower_threshold}, {self.upper_threshold}]: "
+                "it must contain the 0.5 decision threshold. Cascade disabled"
+            )
+            return
+        
+        self.screening_model.load_model()
+        if self.screening_model.output_dim != 1:
+            logger.error("Cascade requires a binary screening model, cascade disabled")
+            return
+        
+        self.enabled = True
+        logger.info(f"Cascade enabled, escalating band [{self.lower_threshold}, {self.upper_threshold}]")
+    
+    def predict(self, image_array: np.ndarray) -> Dict[str, any]:
+        """
+        Make a cascaded prediction on a preprocessed image
+        
+        Args:
+            image_array: Preprocessed image array (batch_size, height, width, channels)
+        
+        Returns:
+            Dictionary containing prediction, confidence, probabilities and stage
+        """
+        return self.predict_batch(image_array)[0]
+    
+    def predict_batch(self, image_array: np.ndarray) -> List[Dict[str, any]]:
+        """
+        Make cascaded predictions on a batch of preprocessed images
+        
+        Args:
+            image_array: Preprocessed image array (batch_size, height, width, channels)
+        
+        Returns:
+            List with one prediction dictionary per image, each tagged with its stage
+        """
+        if not self.enabled:
+            results = self.full_model.predict_batch(image_array)
+            self.stats[STAGE_FULL] += len(results)
+            return [{**result, "stage": STAGE_FULL} for result in results]
+        
+        results = self.screening_model.predict_batch(image_array)
+        malignant_probs = np.array([result["probabilities"]["Malignant"] for result in results])
+        escalate = np.flatnonzero(
+            (malignant_probs >= self.lower_threshold) & (malignant_probs <= self.upper_threshold)
+        )
+        
+        results = [{**result, "stage": STAGE_SCREENING} for result in results]
+        
+        if len(escalate) > 0:
+            full_results = self.full_model.predict_batch(image_array[escalate])
+            for i, result in zip(escalate, full_results):
+                results[i] = {**result, "stage": STAGE_FULL}
+        
+        self.stats[STAGE_FULL] += len(escalate)
+        self.stats[STAGE_SCREENING] += len(results) - len(escalate)
+        
+        return results
+    
+    def get_stats(self) -> Dict[str, any]:
+        """How many images each stage answered"""
+        total = sum(self.stats.values())
+        return {
+            "enabled": self.enabled,
+            "lower_threshold": self.lower_threshold,
+            "upper_threshold": self.upper_threshold,
+            **self.stats,
+            "screening_fraction": self.stats[STAGE_SCREENING] / total if total else 0.0
+        }
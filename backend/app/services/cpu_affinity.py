@@ -0,0 +1,69 @@
+import logging
+import os
+from typing import List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores() -> List[int]:
+    """Cores this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def partition_cores(instances: int, cores_per_instance: int = 0) -> List[List[int]]:
+    """
+    Split the available cores into disjoint blocks, one per inference instance
+    
+    Args:
+        instances: Number of blocks
+        cores_per_instance: Cores in each block (0 = divide all available cores evenly)
+    
+    Returns:
+        List of core id lists; neighbouring ids stay together so a block tends to share caches
+    """
+    cores = available_cores()
+    per_instance = cores_per_instance or len(cores) // instances
+    if instances < 1 or per_instance < 1 or per_instance * instances > len(cores):
+        raise ValueError(
+            f"{len(cores)} available cores cannot be split into {instances} blocks "
+            f"of {cores_per_instance or 'at least 1'} cores"
+        )
+    return [cores[i * per_instance:(i + 1) * per_instance] for i in range(instances)]
+
+
+def size_thread_pools(cores: int, inter_op_threads: Optional[int] = None) -> None:
+    """Size TensorFlow's and OpenMP's thread pools for this many cores; call before TensorFlow is imported"""
+    settings.TF_INTRA_OP_THREADS = cores
+    settings.TF_INTER_OP_THREADS = inter_op_threads or settings.TF_INTER_OP_THREADS or 1
+    os.environ["OMP_NUM_THREADS"] = str(cores)
+
+
+def pin_current_process(cores: List[int], inter_op_threads: Optional[int] = None) -> bool:
+    """
+    Restrict this process to the given cores and size TensorFlow's thread pools to match
+    
+    Must run before TensorFlow is imported: Linux applies the affinity to the
+    calling thread and the threads it starts later, so threads that already
+    exist keep running everywhere, and oversized pools would time-slice on the
+    pinned cores.
+    
+    Args:
+        cores: Core ids from partition_cores
+        inter_op_threads: Independent ops run concurrently (default: TF_INTER_OP_THREADS, or 1)
+    
+    Returns:
+        True if the affinity was applied, False where the platform does not support it
+    """
+    # Thread pools follow the block size even where pinning itself is unavailable
+    size_thread_pools(len(cores), inter_op_threads)
+    
+    if not hasattr(os, "sched_setaffinity"):
+        logger.warning("CPU pinning is not supported on this platform; only thread counts were set")
+        return False
+    os.sched_setaffinity(0, cores)
+    logger.info(f"Pinned process {os.getpid()} to cores {cores}")
+    return True
@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Longest side of the uploaded image, in pixels
+SIZE_BIN_EDGES = [0, 256, 512, 768, 1024, 1536, 2048, 3072, 4096]
+# Confidence of the predicted class
+CONFIDENCE_BIN_EDGES = [round(0.5 + 0.05 * i, 2) for i in range(11)]
+# Every PIXEL_STRIDE-th row and column of the model input feeds the pixel statistics
+PIXEL_STRIDE = 4
+# Added to empty histogram bins so PSI stays finite
+PSI_EPSILON = 1e-4
+
+
+class ImageSummary:
+    """Everything DriftStats needs from one image, computed once outside the monitor's lock"""
+    
+    __slots__ = ("pixels", "mean", "m2", "size_bin", "confidence_bin", "prediction")
+    
+    def __init__(self, image_size: Optional[Tuple[int, int]], image_array: np.ndarray, result: Dict[str, any]):
+        """
+        Args:
+            image_size: (width, height) of the upload, or None when the original size is unknown
+                (pre-resized frames); the image then stays out of the size histogram
+            image_array: Model input, float in [0, 1] or uint8, (height, width, 3) or (1, height, width, 3)
+            result: Prediction dictionary for the image
+        """
+        image_array = np.asarray(image_array)
+        if image_array.ndim == 4:
+            image_array = image_array[0]
+        sample = np.ascontiguousarray(image_array[::PIXEL_STRIDE, ::PIXEL_STRIDE])
+        mean, std = cv2.meanStdDev(sample)
+        scale = 1.0 / 255.0 if sample.dtype == np.uint8 else 1.0
+        
+        self.pixels = sample.shape[0] * sample.shape[1]
+        self.mean = mean.ravel() * scale
+        self.m2 = (std.ravel() * scale) ** 2 * self.pixels
+        self.size_bin = (
+            int(np.searchsorted(SIZE_BIN_EDGES, max(image_size), side="right") - 1) if image_size is not None else None
+        )
+        confidence_bin = int(np.searchsorted(CONFIDENCE_BIN_EDGES, result["confidence"], side="right") - 1)
+        self.confidence_bin = min(max(confidence_bin, 0), len(CONFIDENCE_BIN_EDGES) - 2)
+        self.prediction = result["prediction"]
+
+
+class DriftStats:
+    """
+    Running input and prediction statistics, updated in O(1) per image
+    
+    Pixel statistics are per-channel mean and variance of the model input
+    (scaled to [0, 1]), kept as Welford moments and merged image by image
+    with Chan's parallel update. Upload sizes, prediction confidences and
+    predicted classes are fixed-bin histograms, so nothing about the
+    individual images is kept.
+    """
+    
+    def __init__(self):
+        self.images = 0
+        self.pixels = 0
+        self.mean = np.zeros(3)
+        self.m2 = np.zeros(3)
+        self.size_counts = np.zeros(len(SIZE_BIN_EDGES), dtype=np.int64)
+        self.confidence_counts = np.zeros(len(CONFIDENCE_BIN_EDGES) - 1, dtype=np.int64)
+        self.class_counts: Dict[str, int] = {}
+    
+    def update(self, summary: "ImageSummary") -> None:
+        """Fold one summarized image into the statistics"""
+        # Chan et al.: merge the image's moments into the running ones
+        total = self.pixels + summary.pixels
+        delta = summary.mean - self.mean
+        self.mean += delta * summary.pixels / total
+        self.m2 += summary.m2 + delta ** 2 * self.pixels * summary.pixels / total
+        self.pixels = total
+        self.images += 1
+        
+        if summary.size_bin is not None:
+            self.size_counts[summary.size_bin] += 1
+        self.confidence_counts[summary.confidence_bin] += 1
+        self.class_counts[summary.prediction] = self.class_counts.get(summary.prediction, 0) + 1
+    
+    @property
+    def variance(self) -> np.ndarray:
+        return self.m2 / self.pixels if self.pixels else np.zeros(3)
+    
+    def to_dict(self) -> Dict[str, any]:
+        return {
+            "images": self.images,
+            "pixels": self.pixels,
+            "channel_mean": self.mean.tolist(),
+            "channel_variance": self.variance.tolist(),
+            "size_bin_edges": SIZE_BIN_EDGES,
+            "size_counts": self.size_counts.tolist(),
+            "confidence_bin_edges": CONFIDENCE_BIN_EDGES,
+            "confidence_counts": self.confidence_counts.tolist(),
+            "class_counts": dict(self.class_counts),
+        }
+
+
+def population_stability_index(expected: List[float], actual: List[float]) -> float:
+    """PSI between two histograms over the same bins; > 0.25 is usually read as a significant shift"""
+    expected = np.asarray(expected, dtype=np.float64) + PSI_EPSILON
+    actual = np.asarray(actual, dtype=np.float64) + PSI_EPSILON
+    expected /= expected.sum()
+    actual /= actual.sum()
+    return float(((actual - expected) * np.log(actual / expected)).sum())
+
+
+class DriftMonitor:
+    """
+    Compares live traffic against a reference profile of the training set
+    
+    Three DriftStats are kept: since startup, the current window of
+    DRIFT_WINDOW_SIZE images and the last completed window, so a shift
+    that started recently is not diluted by a long uptime. The reference
+    is written by build_drift_reference.py in the same format.
+    """
+    
+    def __init__(self):
+        self.enabled = settings.DRIFT_MONITOR_ENABLED
+        self.window_size = settings.DRIFT_WINDOW_SIZE
+        self.reference: Optional[Dict[str, any]] = None
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self.lifetime = DriftStats()
+            self.current = DriftStats()
+            self.previous: Optional[DriftStats] = None
+    
+    def load_reference(self, path: str) -> None:
+        if not os.path.exists(path):
+            logger.warning(f"Drift reference not found at {path}, run build_drift_reference.py to enable drift scores")
+            return
+        with open(path) as f:
+            self.reference = json.load(f)
+        logger.info(f"Drift reference loaded ({self.reference['images']} images)")
+    
+    def observe(self, image_size: Optional[Tuple[int, int]], image_array: np.ndarray, result: Dict[str, any]) -> None:
+        """Fold one served prediction into the running statistics"""
+        if not self.enabled:
+            return
+        summary = ImageSummary(image_size, image_array, result)
+        with self._lock:
+            self.lifetime.update(summary)
+            self.current.update(summary)
+            if self.current.images >= self.window_size:
+                self.previous = self.current
+                self.current = DriftStats()
+    
+    def compare(self, stats: DriftStats) -> Dict[str, any]:
+        """Drift scores of one DriftStats against the reference"""
+        reference = self.reference
+        reference_std = np.sqrt(np.maximum(reference["channel_variance"], 1e-12))
+        mean_shift = np.abs(stats.mean - np.asarray(reference["channel_mean"])) / reference_std
+        variance_ratio = stats.variance / np.maximum(reference["channel_variance"], 1e-12)
+        
+        classes = sorted(set(reference["class_counts"]) | set(stats.class_counts))
+        # Images of unknown upload size (raw frames) are not in the size histogram
+        sized_images = int(stats.size_counts.sum())
+        scores = {
+            "pixel_mean_shift": dict(zip("RGB", np.round(mean_shift, 4).tolist())),
+            "pixel_variance_ratio": dict(zip("RGB", np.round(variance_ratio, 4).tolist())),
+            "image_size_psi": (
+                round(population_stability_index(reference["size_counts"], stats.size_counts), 4)
+                if sized_images >= settings.DRIFT_MIN_IMAGES else None
+            ),
+            "confidence_psi": round(population_stability_index(reference["confidence_counts"], stats.confidence_counts), 4),
+            "predicted_class_psi": round(population_stability_index(
+                [reference["class_counts"].get(name, 0) for name in classes],
+                [stats.class_counts.get(name, 0) for name in classes]
+            ), 4),
+        }
+        
+        psi_scores = [name for name in ("image_size_psi", "confidence_psi", "predicted_class_psi")
+                      if scores[name] is not None]
+        alerts = [name for name in psi_scores if scores[name] >= settings.DRIFT_PSI_ALERT]
+        if mean_shift.max() >= settings.DRIFT_MEAN_SHIFT_ALERT:
+            alerts.append("pixel_mean_shift")
+        if np.any(np.abs(np.log(np.maximum(variance_ratio, 1e-12))) >= np.log(settings.DRIFT_VARIANCE_RATIO_ALERT)):
+            alerts.append("pixel_variance_ratio")
+        
+        warnings = [name for name in psi_scores if settings.DRIFT_PSI_WARNING <= scores[name] < settings.DRIFT_PSI_ALERT]
+        status = "drift" if alerts else ("warning" if warnings else "ok")
+        return {"status": status, "alerts": alerts, "warnings": warnings, "scores": scores}
+    
+    def get_report(self) -> Dict[str, any]:
+        """Running statistics and, when a reference is loaded, drift scores per window"""
+        with self._lock:
+            windows = {"lifetime": self.lifetime, "current_window": self.current, "previous_window": self.previous}
+            windows = {name: stats for name, stats in windows.items() if stats is not None}
+            report = {
+                "enabled": self.enabled,
+                "since": self.started,
+                "window_size": self.window_size,
+                "reference_images": self.reference["images"] if self.reference else None,
+                "windows": {}
+            }
+            for name, stats in windows.items():
+                entry = {"statistics": stats.to_dict()}
+                if self.reference is not None and stats.images >= settings.DRIFT_MIN_IMAGES:
+                    entry["drift"] = self.compare(stats)
+                report["windows"][name] = entry
+        return report
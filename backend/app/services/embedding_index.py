@@ -0,0 +1,197 @@
+import numpy as np
+import logging
+import os
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per block so float16/int8 vectors are widened to float32 a slice at a time
+SEARCH_BLOCK_SIZE = 8192
+
+
+class EmbeddingIndex:
+    """
+    Compact in-memory nearest-neighbour index over labeled reference embeddings
+    
+    Vectors are L2-normalized, so the dot product is the cosine similarity.
+    They are stored as float16, or as int8 with one scale per vector. Search
+    is a vectorized brute-force scan with argpartition top-k; when
+    `ivf_lists` > 0 the vectors are also partitioned by spherical k-means and
+    only the `ivf_probe` closest lists are scanned.
+    """
+    
+    def __init__(self, dtype: str = "float16", ivf_lists: int = 0, ivf_probe: int = 8):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported index dtype: {dtype}. Use float16 or int8")
+        
+        self.dtype = dtype
+        self.ivf_lists = ivf_lists
+        self.ivf_probe = ivf_probe
+        
+        self.vectors: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.labels: np.ndarray = np.array([], dtype=str)
+        self.paths: np.ndarray = np.array([], dtype=str)
+        
+        # IVF partitioning: vectors are stored sorted by list, list i spans offsets[i]:offsets[i + 1]
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+    
+    def __len__(self) -> int:
+        return 0 if self.vectors is None else len(self.vectors)
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+    
+    def build(self, embeddings: np.ndarray, labels: List[str], paths: List[str]) -> None:
+        """
+        Build the index from reference embeddings
+        
+        Args:
+            embeddings: Array of shape (num_references, embedding_dim)
+            labels: Confirmed label of each reference image
+            paths: Source path of each reference image
+        """
+        vectors = self._normalize(embeddings)
+        labels = np.asarray(labels, dtype=str)
+        paths = np.asarray(paths, dtype=str)
+        
+        if self.ivf_lists > 0 and len(vectors) > self.ivf_lists:
+            self.centroids, assignments = self._train_ivf(vectors)
+            order = np.argsort(assignments, kind="stable")
+            vectors, labels, paths = vectors[order], labels[order], paths[order]
+            counts = np.bincount(assignments, minlength=len(self.centroids))
+            self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        else:
+            self.centroids = None
+            self.list_offsets = None
+        
+        self._store(vectors)
+        self.labels = labels
+        self.paths = paths
+        logger.info(f"Built {self.dtype} index with {len(self)} references"
+                    + (f" in {len(self.centroids)} IVF lists" if self.centroids is not None else ""))
+    
+    def _store(self, vectors: np.ndarray) -> None:
+        """Quantize normalized float32 vectors to the storage dtype"""
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1, keepdims=True) / 127.0
+            scales = np.maximum(scales, 1e-12)
+            self.vectors = np.round(vectors / scales).astype(np.int8)
+            self.scales = scales[:, 0].astype(np.float32)
+        else:
+            self.vectors = vectors.astype(np.float16)
+            self.scales = None
+    
+    def _train_ivf(self, vectors: np.ndarray, iterations: int = 20):
+        """Spherical k-means: returns (unit-norm centroids, list assignment per vector)"""
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(len(vectors), self.ivf_lists, replace=False)]
+        
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            
+            # Keep the previous centroid for lists that ended up empty
+            empty = np.bincount(assignments, minlength=self.ivf_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = self._normalize(sums)
+        
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        return centroids, assignments
+    
+    def _score(self, query: np.ndarray, start: int, end: int) -> np.ndarray:
+        """Cosine similarity of the query against stored rows start:end"""
+        scores = np.empty(end - start, dtype=np.float32)
+        for block_start in range(start, end, SEARCH_BLOCK_SIZE):
+            block_end = min(block_start + SEARCH_BLOCK_SIZE, end)
+            block = self.vectors[block_start:block_end].astype(np.float32)
+            block_scores = block @ query
+            if self.scales is not None:
+                block_scores *= self.scales[block_start:block_end]
+            scores[block_start - start:block_end - start] = block_scores
+        return scores
+    
+    def search(self, query: np.ndarray, k: int) -> List[Dict[str, any]]:
+        """
+        Find the k most similar reference images
+        
+        Args:
+            query: Embedding of shape (embedding_dim,)
+            k: Number of neighbours to return
+        
+        Returns:
+            List of dictionaries with label, path and similarity, most similar first
+        """
+        if len(self) == 0:
+            return []
+        
+        query = self._normalize(query.reshape(-1))
+        
+        if self.centroids is not None:
+            probe = min(self.ivf_probe, len(self.centroids))
+            closest_lists = np.argpartition(-(self.centroids @ query), probe - 1)[:probe]
+            ranges = [(self.list_offsets[i], self.list_offsets[i + 1]) for i in closest_lists]
+            candidate_ids = np.concatenate([np.arange(start, end) for start, end in ranges])
+            scores = np.concatenate([self._score(query, start, end) for start, end in ranges])
+        else:
+            candidate_ids = None
+            scores = self._score(query, 0, len(self))
+        
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        ids = candidate_ids[top] if candidate_ids is not None else top
+        
+        return [
+            {
+                "label": str(self.labels[i]),
+                "path": str(self.paths[i]),
+                "similarity": float(np.clip(score, -1.0, 1.0))
+            }
+            for i, score in zip(ids, scores[top])
+        ]
+    
+    def save(self, path: str) -> None:
+        """Save the index as a compressed .npz file"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        arrays = {
+            "dtype": np.array(self.dtype),
+            "vectors": self.vectors,
+            "labels": self.labels,
+            "paths": self.paths,
+        }
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        if self.centroids is not None:
+            arrays["centroids"] = self.centroids
+            arrays["list_offsets"] = self.list_offsets
+        np.savez_compressed(path, **arrays)
+    
+    @classmethod
+    def load(cls, path: str, ivf_probe: Optional[int] = None) -> "EmbeddingIndex":
+        """Load an index written by save()"""
+        with np.load(path) as data:
+            index = cls(
+                dtype=str(data["dtype"]),
+                ivf_lists=len(data["centroids"]) if "centroids" in data else 0,
+                ivf_probe=ivf_probe if ivf_probe is not None else settings.INDEX_IVF_PROBE
+            )
+            index.vectors = data["vectors"]
+            index.labels = data["labels"]
+            index.paths = data["paths"]
+            index.scales = data["scales"] if "scales" in data else None
+            index.centroids = data["centroids"] if "centroids" in data else None
+            index.list_offsets = data["list_offsets"] if "list_offsets" in data else None
+        
+        logger.info(f"Loaded {index.dtype} reference index with {len(index)} vectors from {path}")
+        return index
@@ -2,14 +2,24 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
-from typing import Union
+from typing import Dict, List, Optional, Tuple, Union
 import logging
 
 from app.core.config import settings
+from app.services.profiler import stage_timer
 
 logger = logging.getLogger(__name__)
 
 
+class ImageQualityError(ValueError):
+    """Raised when a photo is too blurry, dark, bright or washed out to classify"""
+    
+    def __init__(self, reasons: List[str], metrics: Dict[str, float]):
+        super().__init__("Image rejected by quality check: " + "; ".join(reasons))
+        self.reasons = reasons
+        self.metrics = metrics
+
+
 class ImageProcessor:
     """Handles image preprocessing for model inference"""
     
@@ -17,37 +27,31 @@ class ImageProcessor:
         self.image_size = settings.IMAGE_SIZE
         self.normalize_mean = np.array(settings.NORMALIZE_MEAN)
         self.normalize_std = np.array(settings.NORMALIZE_STD)
+        # Off when the model rescales uint8 pixels itself (exported serving graph)
+        self.scale_pixels = True
     
-    def process_image(self, image_data: bytes) -> np.ndarray:
+    def process_image(self, image_data: bytes, timings: Optional[Dict[str, float]] = None,
+                      quality_gate: bool = False) -> np.ndarray:
         """
         Process uploaded image for model inference
         
         Args:
             image_data: Raw image bytes
+            timings: Optional dict that receives per-stage durations in milliseconds
+            quality_gate: Reject unusable photos with ImageQualityError (see decode_pixels)
         
         Returns:
             Preprocessed image as numpy array ready for model inference
         """
         try:
-            # Convert bytes to PIL Image
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Convert to RGB if needed (handles RGBA, grayscale, etc.)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Validate image
-            self._validate_image(image)
-            
-            # Resize image - using default method to match training preprocessing
-            image = image.resize(self.image_size)
-            
-            # Convert to numpy array
-            image_array = np.array(image, dtype=np.float32)
+            # Decode, validate and resize
+            image_array = self.decode_pixels(image_data, timings, quality_gate)
             
             # Normalize pixel values to [0, 1] - matching training preprocessing
             # Training used: ImageDataGenerator(rescale=1./255) with NO ImageNet normalization
-            image_array = image_array / 255.0
+            if self.scale_pixels:
+                with stage_timer(timings, "normalize"):
+                    image_array = image_array.astype(np.float32) / 255.0
             
             # Add batch dimension
             image_array = np.expand_dims(image_array, axis=0)
@@ -56,10 +60,311 @@ class ImageProcessor:
             
             return image_array
         
+        except ImageQualityError:
+            raise
+        
         except Exception as e:
             logger.error(f"Error processing image: {str(e)}")
             raise ValueError(f"Failed to process image: {str(e)}")
     
+    @staticmethod
+    def read_size(image_data: bytes) -> Tuple[int, int]:
+        """(width, height) from the image header, without decoding pixels"""
+        return Image.open(io.BytesIO(image_data)).size
+    
+    def decode_pixels(self, image_data: bytes, timings: Optional[Dict[str, float]] = None,
+                      quality_gate: bool = False) -> np.ndarray:
+        """
+        Decode, validate and resize an image without scaling it
+        
+        Args:
+            image_data: Raw image bytes
+            timings: Optional dict that receives per-stage durations in milliseconds
+            quality_gate: Run check_quality first (when QUALITY_GATE_ENABLED); off by default
+                so offline tools classify every readable image, on in the API endpoints
+        
+        Returns:
+            uint8 RGB pixels of shape (height, width, 3)
+        """
+        # Convert bytes to PIL Image (reads the header only)
+        with stage_timer(timings, "open"):
+            image = Image.open(io.BytesIO(image_data))
+        
+        # Validate image dimensions before paying for the decode
+        self._validate_image(image)
+        
+        # Reject unusable JPEGs from a draft-mode thumbnail before the full decode;
+        # other formats have no reduced decode, so they are checked on the decoded pixels
+        quality_gate = quality_gate and settings.QUALITY_GATE_ENABLED
+        check_before_decode = image.format == "JPEG"
+        if quality_gate and check_before_decode:
+            with stage_timer(timings, "quality"):
+                self.check_quality(image_data)
+        
+        with stage_timer(timings, "decode"):
+            image.load()
+        
+        # Convert to RGB if needed (handles RGBA, grayscale, etc.)
+        with stage_timer(timings, "convert"):
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+        
+        if quality_gate and not check_before_decode:
+            with stage_timer(timings, "quality"):
+                self.check_quality(image)
+        
+        # Resize image - using default method to match training preprocessing
+        with stage_timer(timings, "resize"):
+            image = image.resize(self.image_size)
+        
+        return np.asarray(image, dtype=np.uint8)
+    
+    def extract_tiles(self, image_data: bytes, timings: Optional[Dict[str, float]] = None,
+                      quality_gate: bool = False) -> Dict[str, any]:
+        """
+        Cut an image into overlapping model-sized tiles and flag the background ones
+        
+        The image is scaled so its longest side is at most TILED_MAX_SIDE
+        (JPEGs decode straight at the reduced scale) and never below one
+        tile. Tile statistics come from integral images, so marking
+        background tiles costs the same whatever the tile count.
+        
+        Args:
+            image_data: Raw image bytes
+            timings: Optional dict that receives per-stage durations in milliseconds
+            quality_gate: Reject unusable photos with ImageQualityError (see decode_pixels)
+        
+        Returns:
+            Dictionary with "tiles" (uint8, (num_tiles, height, width, 3)),
+            "positions" ((row, col) grid index per tile), "grid" ((rows, cols)),
+            "foreground" (bool per tile), "content" (texture score per tile),
+            "scale" (tile pixels per original pixel), "size" ((width, height) tiled)
+            and "overview" (the whole image at IMAGE_SIZE, uint8, for the drift monitor)
+        """
+        try:
+            with stage_timer(timings, "open"):
+                image = Image.open(io.BytesIO(image_data))
+        except OSError as e:
+            raise ValueError(f"Failed to process image: {str(e)}")
+        self._validate_image(image)
+        
+        quality_gate = quality_gate and settings.QUALITY_GATE_ENABLED
+        check_before_decode = image.format == "JPEG"
+        if quality_gate and check_before_decode:
+            with stage_timer(timings, "quality"):
+                self.check_quality(image_data)
+        
+        tile_height, tile_width = self.image_size
+        original_width = image.width
+        scale = min(1.0, settings.TILED_MAX_SIDE / max(image.size))
+        target = (
+            max(tile_width, round(image.width * scale)),
+            max(tile_height, round(image.height * scale))
+        )
+        
+        with stage_timer(timings, "decode"):
+            image.draft("RGB", target)
+            image = image.convert("RGB")
+        
+        if quality_gate and not check_before_decode:
+            with stage_timer(timings, "quality"):
+                self.check_quality(image)
+        
+        with stage_timer(timings, "resize"):
+            if image.size != target:
+                image = image.resize(target, Image.BILINEAR)
+            pixels = np.asarray(image, dtype=np.uint8)
+        
+        with stage_timer(timings, "tile"):
+            stride_y = max(1, int(tile_height * (1 - settings.TILE_OVERLAP)))
+            stride_x = max(1, int(tile_width * (1 - settings.TILE_OVERLAP)))
+            ys = self._tile_offsets(target[1], tile_height, stride_y)
+            xs = self._tile_offsets(target[0], tile_width, stride_x)
+            grid_y, grid_x = np.meshgrid(ys, xs, indexing="ij")
+            top, left = grid_y.ravel(), grid_x.ravel()
+            bottom, right = top + tile_height, left + tile_width
+            
+            # Per-tile sums from integral images: sum = I[b, r] - I[t, r] - I[b, l] + I[t, l]
+            gray = cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY)
+            exposed = ((gray > settings.QUALITY_DARK_LEVEL) & (gray < settings.QUALITY_BRIGHT_LEVEL)).astype(np.uint8)
+            gray_sum, gray_sq_sum = cv2.integral2(gray, sdepth=cv2.CV_64F)
+            exposed_sum = cv2.integral(exposed, sdepth=cv2.CV_64F)
+            
+            def box(integral):
+                return integral[bottom, right] - integral[top, right] - integral[bottom, left] + integral[top, left]
+            
+            area = float(tile_height * tile_width)
+            mean = box(gray_sum) / area
+            std = np.sqrt(np.maximum(box(gray_sq_sum) / area - mean ** 2, 0.0))
+            foreground_fraction = box(exposed_sum) / area
+            
+            tiles = np.stack([pixels[t:t + tile_height, l:l + tile_width] for t, l in zip(top, left)])
+            overview = cv2.resize(pixels, (tile_width, tile_height), interpolation=cv2.INTER_AREA)
+        
+        return {
+            "tiles": tiles,
+            "positions": [(i // len(xs), i % len(xs)) for i in range(len(tiles))],
+            "grid": (len(ys), len(xs)),
+            "foreground": (foreground_fraction >= settings.TILE_MIN_FOREGROUND) & (std >= settings.TILE_MIN_STD),
+            "content": std * foreground_fraction,
+            "scale": target[0] / original_width,
+            "size": target,
+            "overview": overview
+        }
+    
+    @staticmethod
+    def _tile_offsets(length: int, tile: int, stride: int) -> List[int]:
+        """Tile start offsets along one axis; the last tile is aligned to the edge"""
+        if length <= tile:
+            return [0]
+        offsets = list(range(0, length - tile, stride))
+        return offsets + [length - tile]
+    
+    def assess_quality(self, image: Union[bytes, Image.Image]) -> Dict[str, float]:
+        """
+        Measure sharpness, exposure and coverage on a small grayscale thumbnail
+        
+        JPEG bytes are decoded directly at reduced scale (PIL draft mode), so
+        this costs a fraction of the full decode. Draft mode does nothing for
+        other formats (PNG, WebP, ...), so callers that decode those anyway
+        pass the decoded image, which is only box-reduced here, not decoded again.
+        
+        Args:
+            image: Raw image bytes, or an already decoded RGB or grayscale image
+        
+        Returns:
+            Dictionary with sharpness (Laplacian variance as a percentage of
+            the gray-level variance), brightness (mean gray level) and
+            coverage (fraction of well-exposed pixels)
+        """
+        size = settings.QUALITY_THUMBNAIL_SIZE
+        if isinstance(image, bytes):
+            thumbnail = Image.open(io.BytesIO(image))
+            thumbnail.draft("L", (size, size))
+        else:
+            # Same integer reduction Image.thumbnail applies (reducing_gap=2), done before
+            # the gray conversion so only the small copy is converted
+            factor = max(1, max(image.size) // (2 * size))
+            thumbnail = image.reduce(factor) if factor > 1 else image
+        thumbnail = thumbnail.convert("L")
+        thumbnail.thumbnail((size, size))
+        gray = np.asarray(thumbnail, dtype=np.float32)
+        
+        # Laplacian energy relative to overall contrast, so dim or flat photos are not mistaken for blur
+        sharpness = 100.0 * cv2.Laplacian(gray, cv2.CV_32F).var() / (gray.var() + 1.0)
+        exposed = (gray > settings.QUALITY_DARK_LEVEL) & (gray < settings.QUALITY_BRIGHT_LEVEL)
+        return {
+            "sharpness": float(sharpness),
+            "brightness": float(gray.mean()),
+            "coverage": float(exposed.mean())
+        }
+    
+    def check_quality(self, image: Union[bytes, Image.Image]) -> Dict[str, float]:
+        """
+        Reject photos that would only produce a meaningless prediction
+        
+        Args:
+            image: Raw image bytes, or an already decoded image (see assess_quality)
+        
+        Returns:
+            The quality metrics from assess_quality
+        
+        Raises:
+            ImageQualityError: If any metric is outside the thresholds in settings
+        """
+        metrics = self.assess_quality(image)
+        reasons = []
+        
+        if metrics["sharpness"] < settings.QUALITY_MIN_SHARPNESS:
+            reasons.append(
+                f"Image is blurry (sharpness {metrics['sharpness']:.2f}, minimum {settings.QUALITY_MIN_SHARPNESS:g}). "
+                "Hold the camera steady and focus on the lesion"
+            )
+        if metrics["brightness"] < settings.QUALITY_MIN_BRIGHTNESS:
+            reasons.append(
+                f"Image is too dark (brightness {metrics['brightness']:.0f}, minimum {settings.QUALITY_MIN_BRIGHTNESS:g}). "
+                "Add light or use the flash"
+            )
+        elif metrics["brightness"] > settings.QUALITY_MAX_BRIGHTNESS:
+            reasons.append(
+                f"Image is overexposed (brightness {metrics['brightness']:.0f}, maximum {settings.QUALITY_MAX_BRIGHTNESS:g}). "
+                "Reduce the light or avoid pointing the flash straight at the lesion"
+            )
+        if metrics["coverage"] < settings.QUALITY_MIN_COVERAGE:
+            reasons.append(
+                f"Only {metrics['coverage']:.0%} of the image is well exposed (minimum {settings.QUALITY_MIN_COVERAGE:.0%}). "
+                "Avoid glare and deep shadows and fill the frame with the mouth"
+            )
+        
+        if reasons:
+            logger.info(f"Image rejected by quality check: {metrics}")
+            raise ImageQualityError(reasons, metrics)
+        
+        return metrics
+    
+    def parse_tensor_shape(self, shape_header: str) -> Tuple[int, ...]:
+        """
+        Parse and validate an "N,H,W,C" or "H,W,C" shape header for raw pixel uploads
+        
+        Args:
+            shape_header: Comma-separated dimensions
+        
+        Returns:
+            Shape as (batch_size, height, width, channels)
+        
+        Raises:
+            ValueError: If the shape is malformed or does not match the model input
+        """
+        try:
+            shape = tuple(int(dim) for dim in shape_header.split(","))
+        except (AttributeError, ValueError):
+            raise ValueError(f"Invalid tensor shape header: {shape_header!r}. Expected 'N,H,W,C' or 'H,W,C'")
+        
+        if len(shape) == 3:
+            shape = (1, *shape)
+        if len(shape) != 4:
+            raise ValueError(f"Tensor must have 3 or 4 dimensions, got {len(shape)}")
+        
+        expected = (*self.image_size, settings.IMAGE_CHANNELS)
+        if shape[1:] != expected:
+            raise ValueError(
+                f"Tensor shape {shape[1:]} does not match model input {expected}. "
+                "Resize frames before sending them"
+            )
+        
+        if not 1 <= shape[0] <= settings.MAX_RAW_BATCH_SIZE:
+            raise ValueError(f"Batch size must be between 1 and {settings.MAX_RAW_BATCH_SIZE}")
+        
+        return shape
+    
+    def process_pixel_buffer(self, buffer: bytes, shape: Tuple[int, ...]) -> np.ndarray:
+        """
+        Wrap raw uint8 RGB pixels and scale them like process_image does
+        
+        The buffer is viewed in place (no decode, no copy); the only work is
+        the [0, 1] rescale the model expects, skipped entirely when the
+        serving graph takes pixels.
+        
+        Args:
+            buffer: Raw pixel bytes in (N, H, W, C) order
+            shape: Validated shape from parse_tensor_shape
+        
+        Returns:
+            Preprocessed image batch ready for model inference
+        """
+        expected_bytes = int(np.prod(shape))
+        if len(buffer) != expected_bytes:
+            raise ValueError(f"Pixel buffer has {len(buffer)} bytes, shape {shape} needs {expected_bytes}")
+        
+        pixels = np.frombuffer(buffer, dtype=np.uint8).reshape(shape)
+        if not self.scale_pixels:
+            return pixels
+        
+        # Same [0, 1] scaling as process_image, in place on the float copy
+        image_array = pixels.astype(np.float32)
+        image_array *= 1.0 / 255.0
+        return image_array
+    
     def _validate_image(self, image: Image.Image) -> None:
         """
         Validate image dimensions and format
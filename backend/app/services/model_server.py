@@ -0,0 +1,477 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.model_service import ModelService
+
+logger = logging.getLogger(__name__)
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """Split a 'host:port' string"""
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to a segment owned by another process without tracking it here
+    
+    Otherwise this process's resource tracker would unlink the client's
+    segment when the server exits.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track argument
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+
+class TensorRing:
+    """
+    Fixed-size slots in one shared-memory segment
+    
+    Slot i holds one preprocessed image (H, W, C float32) and a result row
+    (class outputs followed by the pooled embedding). The client writes
+    images and reads results; the server does the opposite. Only slot
+    numbers travel over the control channel, tensors are never pickled.
+    """
+    
+    def __init__(self, segment: shared_memory.SharedMemory, num_slots: int,
+                 image_shape: Tuple[int, ...], result_width: int):
+        self.segment = segment
+        self.num_slots = num_slots
+        self.images = np.ndarray((num_slots, *image_shape), dtype=np.float32, buffer=segment.buf)
+        self.results = np.ndarray(
+            (num_slots, result_width),
+            dtype=np.float32,
+            buffer=segment.buf,
+            offset=self.images.nbytes
+        )
+    
+    @staticmethod
+    def required_bytes(num_slots: int, image_shape: Tuple[int, ...], result_width: int) -> int:
+        return num_slots * (int(np.prod(image_shape)) + result_width) * np.dtype(np.float32).itemsize
+    
+    def close(self) -> None:
+        # Views must be dropped before the segment can be closed
+        self.images = None
+        self.results = None
+        self.segment.close()
+
+
+class ModelServer:
+    """
+    Runs one ModelService in a dedicated process and serves API workers
+    
+    Clients connect over a local authenticated socket, attach their own
+    shared-memory TensorRing and submit ("infer", request_id, slots)
+    messages. A single inference thread drains the queue into batches of
+    up to MODEL_SERVER_MAX_BATCH images (waiting at most
+    MODEL_SERVER_BATCH_TIMEOUT_MS for stragglers), runs the model once per
+    batch and answers each request with ("done", request_id).
+    
+    The number of images queued or in the model is published in a small
+    shared-memory counter, so every API worker can see how busy each
+    server is, not just how much of its own work is outstanding.
+    """
+    
+    def __init__(self, address: str, noop: bool = False):
+        self.address = parse_address(address)
+        self.noop = noop
+        self.model_service = ModelService()
+        self.max_batch = settings.MODEL_SERVER_MAX_BATCH
+        self.batch_timeout = settings.MODEL_SERVER_BATCH_TIMEOUT_MS / 1000.0
+        self._requests: "queue.Queue" = queue.Queue()
+        self._running = False
+        self.output_dim = 0
+        self.embedding_dim = 0
+        self._load_segment: Optional[shared_memory.SharedMemory] = None
+        self._load: Optional[np.ndarray] = None
+        self._load_lock = threading.Lock()
+        # Requests queued or in the model per client ring; a disconnected client's ring closes when it drains
+        self._ring_requests: Dict[TensorRing, int] = {}
+        self._draining_rings: Set[TensorRing] = set()
+        self._ring_lock = threading.Lock()
+    
+    def serve_forever(self) -> None:
+        """Load the model and serve connections until the process is stopped"""
+        authkey = settings.model_server_authkey()
+        self.model_service.load_model()
+        self.output_dim = int(self.model_service.output_dim)
+        self.embedding_dim = int(self.model_service.embedding_dim or 0)
+        self._running = True
+        
+        self._load_segment = shared_memory.SharedMemory(create=True, size=np.dtype(np.int64).itemsize)
+        self._load = np.ndarray((1,), dtype=np.int64, buffer=self._load_segment.buf)
+        self._load[0] = 0
+        
+        threading.Thread(target=self._inference_loop, name="model-server-inference", daemon=True).start()
+        
+        try:
+            with Listener(self.address, authkey=authkey) as listener:
+                logger.info(f"Model server listening on {self.address[0]}:{self.address[1]}"
+                            + (" (noop mode)" if self.noop else ""))
+                while self._running:
+                    try:
+                        connection = listener.accept()
+                    except Exception as e:
+                        logger.error(f"Rejected model server connection: {str(e)}")
+                        continue
+                    threading.Thread(
+                        target=self._serve_connection,
+                        args=(connection,),
+                        name="model-server-connection",
+                        daemon=True
+                    ).start()
+        finally:
+            self._load = None
+            self._load_segment.close()
+            self._load_segment.unlink()
+    
+    def _add_load(self, images: int) -> None:
+        with self._load_lock:
+            self._load[0] += images
+    
+    def _ring_submitted(self, ring: TensorRing) -> None:
+        with self._ring_lock:
+            self._ring_requests[ring] = self._ring_requests.get(ring, 0) + 1
+    
+    def _ring_finished(self, ring: TensorRing) -> None:
+        with self._ring_lock:
+            self._ring_requests[ring] -= 1
+            drained = self._ring_requests[ring] == 0 and ring in self._draining_rings
+            if drained:
+                del self._ring_requests[ring]
+                self._draining_rings.discard(ring)
+        if drained:
+            ring.close()
+    
+    def _release_ring(self, ring: TensorRing) -> None:
+        """Close a disconnected client's ring now, or after its last queued request when some are left"""
+        with self._ring_lock:
+            idle = self._ring_requests.get(ring, 0) == 0
+            if idle:
+                self._ring_requests.pop(ring, None)
+            else:
+                self._draining_rings.add(ring)
+        if idle:
+            ring.close()
+    
+    def _serve_connection(self, connection) -> None:
+        """Handshake, attach the client's ring, then forward its requests to the batcher"""
+        ring = None
+        send_lock = threading.Lock()
+        try:
+            message = connection.recv()
+            if message[0] != "hello":
+                raise ValueError(f"Unexpected handshake message: {message[0]}")
+            
+            connection.send((
+                "hello",
+                (*settings.IMAGE_SIZE, settings.IMAGE_CHANNELS),
+                self.output_dim,
+                self.embedding_dim,
+                self.model_service.get_model_info(),
+                self._load_segment.name
+            ))
+            
+            kind, segment_name, num_slots = connection.recv()
+            if kind != "attach":
+                raise ValueError(f"Expected attach message, got {kind}")
+            ring = TensorRing(
+                attach_shared_memory(segment_name),
+                num_slots,
+                (*settings.IMAGE_SIZE, settings.IMAGE_CHANNELS),
+                self.output_dim + self.embedding_dim
+            )
+            connection.send(("attached",))
+            
+            while True:
+                kind, request_id, slots = connection.recv()
+                if kind == "infer":
+                    self._add_load(len(slots))
+                    self._ring_submitted(ring)
+                    self._requests.put((connection, send_lock, ring, request_id, slots))
+        
+        except (EOFError, ConnectionResetError, OSError):
+            logger.info("Model server client disconnected")
+        except Exception as e:
+            logger.error(f"Model server connection error: {str(e)}")
+        finally:
+            # Its requests may still be queued or batched with other clients' work
+            if ring is not None:
+                self._release_ring(ring)
+            connection.close()
+    
+    def _next_batch(self) -> List[tuple]:
+        """Block for one request, then collect more until the batch is full or the timeout passes"""
+        batch = [self._requests.get()]
+        count = len(batch[0][4])
+        deadline = time.perf_counter() + self.batch_timeout
+        
+        while count < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            count += len(request[4])
+        
+        return batch
+    
+    def _inference_loop(self) -> None:
+        while self._running:
+            batch = self._next_batch()
+            try:
+                images = np.concatenate([ring.images[slots] for _, _, ring, _, slots in batch], axis=0)
+                
+                if self.noop:
+                    outputs = np.zeros((len(images), self.output_dim), dtype=np.float32)
+                    embeddings = None
+                else:
+                    outputs, embeddings = self.model_service._run_model(images)
+                
+                offset = 0
+                for connection, send_lock, ring, request_id, slots in batch:
+                    rows = slice(offset, offset + len(slots))
+                    ring.results[slots, :self.output_dim] = outputs[rows]
+                    if embeddings is not None and self.embedding_dim:
+                        ring.results[slots, self.output_dim:] = embeddings[rows]
+                    offset += len(slots)
+                    self._reply(connection, send_lock, ("done", request_id, None))
+            
+            except Exception as e:
+                logger.error(f"Model server batch failed: {str(e)}")
+                for connection, send_lock, _, request_id, _ in batch:
+                    self._reply(connection, send_lock, ("error", request_id, str(e)))
+            
+            finally:
+                self._add_load(-sum(len(slots) for *_, slots in batch))
+                for _, _, ring, _, _ in batch:
+                    self._ring_finished(ring)
+    
+    @staticmethod
+    def _reply(connection, send_lock, message) -> None:
+        try:
+            with send_lock:
+                connection.send(message)
+        except (OSError, ValueError):
+            pass  # Client went away; its connection thread cleans up
+
+
+class _ServerConnection:
+    """Client side of one model server: control channel plus a private TensorRing"""
+    
+    def __init__(self, address: str, num_slots: int):
+        self.address = address
+        self.connection = Client(parse_address(address), authkey=settings.model_server_authkey())
+        
+        self.connection.send(("hello",))
+        _, image_shape, self.output_dim, self.embedding_dim, self.model_info, load_name = self.connection.recv()
+        self.image_shape = tuple(image_shape)
+        self._load_segment = attach_shared_memory(load_name)
+        self._server_load = np.ndarray((1,), dtype=np.int64, buffer=self._load_segment.buf)
+        
+        result_width = self.output_dim + self.embedding_dim
+        segment = shared_memory.SharedMemory(
+            create=True,
+            size=TensorRing.required_bytes(num_slots, self.image_shape, result_width)
+        )
+        self.ring = TensorRing(segment, num_slots, self.image_shape, result_width)
+        self.connection.send(("attach", segment.name, num_slots))
+        self.connection.recv()
+        
+        self._send_lock = threading.Lock()
+        self._slots_available = threading.Condition()
+        self._free_slots = list(range(num_slots))
+        self._pending: Dict[int, list] = {}
+        self._request_ids = itertools.count()
+        self.in_flight = 0
+        self.alive = True  # False once the server is gone; the connection is then skipped
+        self._closed = False
+        
+        threading.Thread(target=self._receive_loop, name="model-client-receiver", daemon=True).start()
+    
+    def _receive_loop(self) -> None:
+        try:
+            while True:
+                kind, request_id, error = self.connection.recv()
+                waiter = self._pending.pop(request_id, None)
+                if waiter is not None:
+                    waiter[1] = error if kind == "error" else None
+                    waiter[0].set()
+        except (EOFError, OSError, TypeError):  # TypeError: close() dropped the handle mid-read
+            # Set before the waiters are released, so a run() registering now fails fast instead of timing out
+            self.alive = False
+            if not self._closed:
+                logger.error(f"Lost connection to model server {self.address}")
+            for waiter in list(self._pending.values()):
+                waiter[1] = "Model server connection lost"
+                waiter[0].set()
+            self._pending.clear()
+    
+    @property
+    def load(self) -> int:
+        """Images queued or in the model on this server, from all API workers"""
+        # Our own requests may not have reached the server's counter yet
+        return max(int(self._server_load[0]), self.in_flight)
+    
+    def _acquire_slots(self, count: int, timeout: float) -> List[int]:
+        deadline = time.monotonic() + timeout
+        with self._slots_available:
+            while len(self._free_slots) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._slots_available.wait(remaining):
+                    raise RuntimeError("Timed out waiting for a free model server slot")
+            slots, self._free_slots = self._free_slots[:count], self._free_slots[count:]
+            return slots
+    
+    def _release_slots(self, slots: List[int]) -> None:
+        with self._slots_available:
+            self._free_slots.extend(slots)
+            self._slots_available.notify_all()
+    
+    def run(self, image_array: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Send up to num_slots images through the ring and wait for the results"""
+        timeout = settings.MODEL_SERVER_TIMEOUT_SECONDS
+        slots = self._acquire_slots(len(image_array), timeout)
+        self.in_flight += len(slots)
+        try:
+            self.ring.images[slots] = image_array
+            
+            request_id = next(self._request_ids)
+            waiter = [threading.Event(), None]
+            self._pending[request_id] = waiter
+            if not self.alive:
+                self._pending.pop(request_id, None)
+                raise RuntimeError(f"Lost connection to model server {self.address}")
+            with self._send_lock:
+                self.connection.send(("infer", request_id, slots))
+            
+            if not waiter[0].wait(timeout):
+                self._pending.pop(request_id, None)
+                raise RuntimeError("Model server did not answer in time")
+            if waiter[1] is not None:
+                raise RuntimeError(f"Model server error: {waiter[1]}")
+            
+            results = self.ring.results[slots]
+            outputs = results[:, :self.output_dim]
+            embeddings = results[:, self.output_dim:] if self.embedding_dim else None
+            return outputs, embeddings
+        finally:
+            self.in_flight -= len(slots)
+            self._release_slots(slots)
+    
+    def close(self) -> None:
+        self._closed = True
+        try:
+            self.connection.close()
+        finally:
+            self._server_load = None
+            self._load_segment.close()
+            segment = self.ring.segment
+            self.ring.close()
+            segment.unlink()
+
+
+class RemoteModelService(ModelService):
+    """
+    Drop-in ModelService that runs inference in separate model server processes
+    
+    Each API worker connects to every address in MODEL_SERVER_ADDRESSES
+    and sends each call to the least-loaded server, counting the images
+    every API worker has queued there; ties rotate so idle servers share
+    the work.
+    Prediction formatting stays in ModelService; only _run_model crosses
+    the process boundary.
+    """
+    
+    def __init__(self, addresses: Optional[List[str]] = None):
+        super().__init__()
+        self.addresses = addresses or settings.MODEL_SERVER_ADDRESSES
+        self.num_slots = settings.MODEL_SERVER_SLOTS
+        self._servers: List[_ServerConnection] = []
+        self._model_info: Dict[str, any] = {}
+        self._rotation = itertools.count()
+    
+    def load_model(self) -> None:
+        """Connect to the model servers, retrying while they start up"""
+        deadline = time.monotonic() + settings.MODEL_SERVER_CONNECT_TIMEOUT_SECONDS
+        for address in self.addresses:
+            while True:
+                try:
+                    self._servers.append(_ServerConnection(address, self.num_slots))
+                    logger.info(f"Connected to model server {address}")
+                    break
+                except (ConnectionRefusedError, FileNotFoundError):
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Model server {address} is not reachable")
+                    time.sleep(0.5)
+        
+        first = self._servers[0]
+        self.embedding_dim = first.embedding_dim or None
+        self.model_version = first.model_info.get("model_version")
+        self._model_info = {**first.model_info, "model_servers": self.addresses}
+    
+    def is_model_loaded(self) -> bool:
+        """Check if at least one model server is connected"""
+        return any(server.alive for server in self._servers)
+    
+    def get_model_info(self) -> Dict[str, any]:
+        """Get information about the remotely loaded model"""
+        if not self._servers:
+            return {"status": "not_loaded"}
+        return self._model_info
+    
+    def _run_model(self, image_array: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if not self._servers:
+            raise RuntimeError("Not connected to a model server")
+        
+        # The tensor ring carries float32 images in [0, 1]
+        if image_array.dtype == np.uint8:
+            image_array = image_array.astype(np.float32)
+            image_array *= 1.0 / 255.0
+        image_array = np.asarray(image_array, dtype=np.float32)
+        outputs, embeddings = [], []
+        
+        for start in range(0, len(image_array), self.num_slots):
+            chunk = image_array[start:start + self.num_slots]
+            server = self._least_loaded()
+            chunk_outputs, chunk_embeddings = server.run(chunk)
+            outputs.append(chunk_outputs)
+            if chunk_embeddings is not None:
+                embeddings.append(chunk_embeddings)
+        
+        return (
+            np.concatenate(outputs, axis=0),
+            np.concatenate(embeddings, axis=0) if embeddings else None
+        )
+    
+    def _least_loaded(self) -> _ServerConnection:
+        # A dead server's shared load counter is frozen at its last value, so skip it explicitly
+        servers = [server for server in self._servers if server.alive]
+        if not servers:
+            raise RuntimeError("No model server is reachable")
+        # Start the scan at a rotating position; min() keeps the first of equally loaded servers
+        start = next(self._rotation) % len(servers)
+        return min(servers[start:] + servers[:start], key=lambda s: s.load)
+    
+    def close(self) -> None:
+        """Disconnect and free this worker's shared-memory rings"""
+        for server in self._servers:
+            server.close()
+        self._servers = []
@@ -1,7 +1,10 @@
 import numpy as np
+import hashlib
+import json
 import logging
 import os
-from typing import Dict, Optional
+import time
+from typing import Dict, List, Optional, Tuple
 import tensorflow as tf
 
 from app.core.config import settings
@@ -12,13 +15,148 @@ logger = logging.getLogger(__name__)
 class ModelService:
     """Handles ML model loading and inference"""
     
-    def __init__(self):
+    def __init__(self, model_path: Optional[str] = None):
         self.model: Optional[tf.keras.Model] = None
         self.class_names = settings.CLASS_NAMES
-        self.model_path = settings.MODEL_PATH
+        self.model_path = model_path or settings.MODEL_PATH
+        # Short content hash of the model file, stored with every audited prediction
+        self.model_version: Optional[str] = None
+        self.batch_buckets = sorted(settings.INFERENCE_BATCH_BUCKETS)
+        self._bucket_functions: Dict[int, any] = {}
+        
+        # Model returning [class outputs, pooled backbone embedding] from one forward pass
+        self.serving_model: Optional[tf.keras.Model] = None
+        self.embedding_dim: Optional[int] = None
+        self.output_dim: Optional[int] = None
+        
+        # Frozen graph from export_serving_model.py, only used for the main model
+        self.serving_artifact_path = settings.SERVING_MODEL_PATH if model_path is None else None
+        self.serving_function = None
+        self._artifact_info: Dict[str, any] = {}
+        
+        # Classification head alone with dropout active, for Monte-Carlo uncertainty
+        self.mc_head_function = None
+    
+    def configure_threading(self) -> None:
+        """
+        Apply TensorFlow thread pool sizes from settings
+        
+        Must run before TensorFlow executes its first op; afterwards the
+        runtime is initialized and the pool sizes can no longer change.
+        """
+        intra_op = settings.TF_INTRA_OP_THREADS
+        inter_op = settings.TF_INTER_OP_THREADS
+        
+        try:
+            # Skip values already in effect, e.g. when a second model is loaded
+            if intra_op > 0 and tf.config.threading.get_intra_op_parallelism_threads() != intra_op:
+                tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+            if inter_op > 0 and tf.config.threading.get_inter_op_parallelism_threads() != inter_op:
+                tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+            logger.info(
+                f"TensorFlow threads: intra_op={tf.config.threading.get_intra_op_parallelism_threads()}, "
+                f"inter_op={tf.config.threading.get_inter_op_parallelism_threads()}"
+            )
+        except RuntimeError as e:
+            logger.warning(f"Could not configure TensorFlow threads (runtime already initialized): {str(e)}")
     
     def load_model(self) -> None:
-        """Load the trained ML model"""
+        """Load the trained ML model and prepare the compiled inference path"""
+        self.configure_threading()
+        self.model_version = self._file_version(self.model_path)
+        if self._load_serving_artifact():
+            return
+        self._load_model_file()
+        self.output_dim = int(self.model.output_shape[-1])
+        self._build_inference_functions()
+    
+    @staticmethod
+    def _file_version(path: str) -> str:
+        """First 12 hex digits of the file's SHA-256, or "dummy" when there is no model file"""
+        if not os.path.exists(path):
+            return "dummy"
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()[:12]
+    
+    def _load_serving_artifact(self) -> bool:
+        """
+        Load the frozen serving graph if one was exported from the current model
+        
+        The graph already contains resizing, the [0, 1] rescale and the
+        inference-mode network with its weights as constants, so loading it
+        is a GraphDef import: no Keras model is rebuilt and nothing is
+        compiled or traced per batch size.
+        
+        Returns:
+            True if the artifact is loaded, False to fall back to the .h5 model
+        """
+        path = self.serving_artifact_path
+        if not settings.USE_SERVING_ARTIFACT or not path or not os.path.exists(path):
+            return False
+        
+        try:
+            with open(path + ".json") as f:
+                metadata = json.load(f)
+            
+            # An artifact exported from an older model file would serve stale weights
+            if os.path.exists(self.model_path):
+                source = os.stat(self.model_path)
+                if (metadata["source_size"], metadata["source_mtime"]) != (source.st_size, source.st_mtime):
+                    logger.warning(
+                        f"Serving artifact {path} is older than {self.model_path}, "
+                        "re-run export_serving_model.py. Loading the .h5 model instead"
+                    )
+                    return False
+            
+            start = time.perf_counter()
+            self.serving_function = self._import_frozen_graph(path, metadata["input"], metadata["outputs"])
+            self.output_dim = metadata["output_dim"]
+            self.embedding_dim = metadata["embedding_dim"]
+            self._artifact_info = metadata
+            
+            mc_head = metadata.get("mc_head")
+            if mc_head:
+                head_path = os.path.join(os.path.dirname(path), mc_head["path"])
+                head_function = self._import_frozen_graph(head_path, mc_head["input"], mc_head["outputs"])
+                self.mc_head_function = lambda embeddings: head_function(embeddings)[0]
+            
+            # First call allocates the runtime's buffers
+            self.serving_function(tf.zeros((1, *settings.IMAGE_SIZE, settings.IMAGE_CHANNELS), dtype=tf.uint8))
+            logger.info(f"Serving artifact loaded from {path} in {time.perf_counter() - start:.2f}s")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error loading serving artifact: {str(e)}")
+            logger.warning("Loading the .h5 model instead")
+            self.serving_function = None
+            self.mc_head_function = None
+            return False
+    
+    @staticmethod
+    def _import_frozen_graph(path: str, input_name: str, output_names: List[str]):
+        """Import a frozen GraphDef as a callable returning the listed output tensors"""
+        graph_def = tf.compat.v1.GraphDef()
+        with open(path, "rb") as f:
+            graph_def.ParseFromString(f.read())
+        
+        wrapped = tf.compat.v1.wrap_function(
+            lambda: tf.compat.v1.import_graph_def(graph_def, name=""), []
+        )
+        return wrapped.prune(
+            wrapped.graph.as_graph_element(input_name),
+            [wrapped.graph.as_graph_element(name) for name in output_names]
+        )
+    
+    @property
+    def accepts_pixels(self) -> bool:
+        """True when the loaded model does its own rescaling, so callers can send uint8 pixels"""
+        return self.serving_function is not None
+    
+    def _load_model_file(self) -> None:
+        """Load the model from MODEL_PATH, falling back to a dummy model"""
         try:
             if not os.path.exists(self.model_path):
                 logger.warning(f"Model file not found at {self.model_path}")
@@ -75,9 +213,189 @@ class ModelService:
         self.model = tf.keras.Model(inputs=input_layer, outputs=output_layer)
         logger.info("Dummy model created")
     
+    def _build_inference_functions(self) -> None:
+        """
+        Trace and warm one compiled forward pass per batch-size bucket
+        
+        Calling a concrete function skips the data adapter and predict loop
+        that model.predict builds on every call, and since inputs are padded
+        to a fixed bucket size, no request can trigger a retrace.
+        """
+        self._bucket_functions = {}
+        if self.model is None:
+            return
+        
+        self._build_serving_model()
+        self._build_mc_head()
+        if not settings.USE_COMPILED_INFERENCE:
+            return
+        
+        try:
+            serving_model = self.serving_model
+            forward = tf.function(lambda x: serving_model(x, training=False))
+            
+            for bucket in self.batch_buckets:
+                spec = tf.TensorSpec(
+                    (bucket, *settings.IMAGE_SIZE, settings.IMAGE_CHANNELS),
+                    dtype=tf.float32
+                )
+                concrete_function = forward.get_concrete_function(spec)
+                concrete_function(tf.zeros(spec.shape, dtype=tf.float32))
+                self._bucket_functions[bucket] = concrete_function
+            
+            logger.info(f"Compiled inference ready for batch buckets {self.batch_buckets}")
+        
+        except Exception as e:
+            logger.error(f"Error building compiled inference functions: {str(e)}")
+            logger.warning("Falling back to model.predict")
+            self._bucket_functions = {}
+    
+    def _build_serving_model(self) -> None:
+        """
+        Expose the pooled backbone embedding next to the class outputs
+        
+        The embedding is the output of the last GlobalAveragePooling2D layer
+        (the layer before the dense head in train_model.build_model), so it
+        comes out of the same forward pass as the prediction at no extra cost.
+        """
+        pooling_layers = [
+            layer for layer in self.model.layers
+            if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D)
+        ]
+        
+        if not pooling_layers:
+            logger.warning("No pooling layer found, similar-case embeddings are unavailable")
+            self.serving_model = tf.keras.Model(inputs=self.model.inputs, outputs=[self.model.output])
+            self.embedding_dim = None
+            return
+        
+        embedding = pooling_layers[-1].output
+        self.serving_model = tf.keras.Model(
+            inputs=self.model.inputs,
+            outputs=[self.model.output, embedding]
+        )
+        self.embedding_dim = int(embedding.shape[-1])
+        logger.info(f"Embedding layer: {pooling_layers[-1].name} ({self.embedding_dim} dims)")
+    
+    def _build_mc_head(self) -> None:
+        """
+        Trace the layers after the pooled embedding with their dropout always on
+        
+        Uncertainty samples only need the head, so the backbone runs once
+        per image and its embedding is replicated across the samples. Dropout
+        is applied with tf.nn.dropout rather than the Keras layers, whose
+        random state lives in a variable and cannot be frozen into the
+        serving artifact.
+        """
+        self.mc_head_function = None
+        if self.embedding_dim is None:
+            return
+        
+        layers = self.model.layers
+        pooling_index = max(
+            i for i, layer in enumerate(layers) if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D)
+        )
+        head_layers = layers[pooling_index + 1:]
+        if not any(isinstance(layer, tf.keras.layers.Dropout) for layer in head_layers):
+            logger.warning("Model head has no dropout layers, uncertainty estimates are unavailable")
+            return
+        
+        def mc_head(embeddings):
+            x = embeddings
+            for layer in head_layers:
+                if isinstance(layer, tf.keras.layers.Dropout):
+                    x = tf.nn.dropout(x, rate=layer.rate)
+                else:
+                    x = layer(x, training=False)
+            return x
+        
+        try:
+            # The head must be a plain chain from the embedding for this to match the model
+            check = tf.random.uniform((2, *settings.IMAGE_SIZE, settings.IMAGE_CHANNELS))
+            outputs, embeddings = self.serving_model(check, training=False)
+            chained = embeddings
+            for layer in head_layers:
+                chained = layer(chained, training=False)
+            if not np.allclose(chained.numpy(), outputs.numpy(), atol=1e-5):
+                raise ValueError("head is not a sequential chain after the pooling layer")
+            
+            self.mc_head_function = tf.function(
+                mc_head,
+                input_signature=[tf.TensorSpec([None, self.embedding_dim], tf.float32)]
+            )
+            logger.info(f"Monte-Carlo dropout head ready ({len(head_layers)} layers)")
+        
+        except Exception as e:
+            logger.warning(f"Uncertainty estimates are unavailable: {str(e)}")
+    
+    @property
+    def supports_uncertainty(self) -> bool:
+        return self.mc_head_function is not None
+    
+    def _run_model(self, image_array: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Run the forward pass, padding to the nearest traced batch bucket
+        
+        Args:
+            image_array: Preprocessed image array (batch_size, height, width, channels),
+                either float in [0, 1] or uint8 pixels
+        
+        Returns:
+            Tuple of (model outputs, pooled embeddings or None), one row per input image
+        """
+        image_array = np.asarray(image_array)
+        if self.serving_function is not None:
+            return self._run_serving_artifact(image_array)
+        
+        if image_array.dtype == np.uint8:
+            # Same [0, 1] scaling as ImageProcessor.process_image
+            image_array = image_array.astype(np.float32)
+            image_array *= 1.0 / 255.0
+        
+        if not self._bucket_functions:
+            results = self.serving_model.predict(
+                image_array,
+                batch_size=settings.INFERENCE_BATCH_SIZE,
+                verbose=0
+            )
+            results = results if isinstance(results, (list, tuple)) else [results]
+            return results[0], (results[1] if len(results) > 1 else None)
+        
+        image_array = np.asarray(image_array, dtype=np.float32)
+        max_bucket = self.batch_buckets[-1]
+        outputs = []
+        embeddings = []
+        
+        for start in range(0, len(image_array), max_bucket):
+            chunk = image_array[start:start + max_bucket]
+            num_images = len(chunk)
+            bucket = next(b for b in self.batch_buckets if b >= num_images)
+            
+            if bucket > num_images:
+                padding = np.zeros((bucket - num_images, *chunk.shape[1:]), dtype=np.float32)
+                chunk = np.concatenate([chunk, padding], axis=0)
+            
+            results = self._bucket_functions[bucket](tf.constant(chunk))
+            outputs.append(results[0].numpy()[:num_images])
+            if len(results) > 1:
+                embeddings.append(results[1].numpy()[:num_images])
+        
+        return (
+            np.concatenate(outputs, axis=0),
+            np.concatenate(embeddings, axis=0) if embeddings else None
+        )
+    
+    def _run_serving_artifact(self, image_array: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Run the frozen graph; it takes any batch size, so no padding is needed"""
+        if image_array.dtype != np.uint8:
+            image_array = np.rint(np.clip(image_array, 0.0, 1.0) * 255.0).astype(np.uint8)
+        
+        results = self.serving_function(tf.constant(image_array))
+        return results[0].numpy(), (results[1].numpy() if len(results) > 1 else None)
+    
     def is_model_loaded(self) -> bool:
         """Check if model is loaded"""
-        return self.model is not None
+        return self.model is not None or self.serving_function is not None
     
     def predict(self, image_array: np.ndarray) -> Dict[str, any]:
         """
@@ -89,76 +407,200 @@ class ModelService:
         Returns:
             Dictionary containing prediction, confidence, and probabilities
         """
+        return self.predict_batch(image_array)[0]
+    
+    def predict_batch(self, image_array: np.ndarray) -> List[Dict[str, any]]:
+        """
+        Make predictions on a batch of preprocessed images in one model call
+        
+        Args:
+            image_array: Preprocessed image array (batch_size, height, width, channels)
+        
+        Returns:
+            List with one prediction dictionary per image, in input order
+        """
         try:
-            if self.model is None:
+            if not self.is_model_loaded():
                 raise RuntimeError("Model not loaded. Please load the model first.")
             
             # Make prediction
-            predictions = self.model.predict(image_array, verbose=0)
+            predictions, _ = self._run_model(image_array)
             
-            # Check if binary classification (output shape is (1,) or (1, 1))
-            if predictions.shape[-1] == 1 or len(predictions.shape) == 2 and predictions.shape[1] == 1:
-                # Binary classification model (Benign vs Malignant)
-                malignant_prob = float(predictions[0][0] if len(predictions.shape) > 1 else predictions[0])
-                benign_prob = 1.0 - malignant_prob
-                
-                # Determine predicted class
-                if malignant_prob > 0.5:
-                    predicted_class = "Malignant"
-                    confidence = malignant_prob
-                else:
-                    predicted_class = "Benign"
-                    confidence = benign_prob
-                
-                # Binary classification probabilities
-                class_probabilities = {
-                    "Benign": benign_prob,
-                    "Malignant": malignant_prob
-                }
-                
-                logger.info(f"Binary prediction: {predicted_class} ({confidence:.2%})")
+            return [self._format_prediction(probabilities) for probabilities in predictions]
+        
+        except Exception as e:
+            logger.error(f"Error during prediction: {str(e)}")
+            raise RuntimeError(f"Prediction failed: {str(e)}")
+    
+    def predict_with_embeddings(self, image_array: np.ndarray) -> Tuple[List[Dict[str, any]], np.ndarray]:
+        """
+        Make predictions and return the pooled backbone embeddings of the same forward pass
+        
+        Args:
+            image_array: Preprocessed image array (batch_size, height, width, channels)
+        
+        Returns:
+            Tuple of (prediction dictionaries, embeddings of shape (batch_size, embedding_dim))
+        """
+        try:
+            if not self.is_model_loaded():
+                raise RuntimeError("Model not loaded. Please load the model first.")
+            if self.embedding_dim is None:
+                raise RuntimeError("Loaded model has no pooled embedding layer")
+            
+            predictions, embeddings = self._run_model(image_array)
+            
+            return [self._format_prediction(probabilities) for probabilities in predictions], embeddings
+        
+        except Exception as e:
+            logger.error(f"Error during prediction: {str(e)}")
+            raise RuntimeError(f"Prediction failed: {str(e)}")
+    
+    def predict_with_uncertainty(self, image_array: np.ndarray, samples: Optional[int] = None) -> List[Dict[str, any]]:
+        """
+        Make predictions with a Monte-Carlo dropout uncertainty estimate
+        
+        The prediction itself comes from the usual deterministic forward
+        pass. Its embedding is then run through the dropout-active head
+        `samples` times in a single batched call.
+        
+        Args:
+            image_array: Preprocessed image array (batch_size, height, width, channels)
+            samples: Number of stochastic head passes (default MC_DROPOUT_SAMPLES)
+        
+        Returns:
+            List of prediction dictionaries, each with an "uncertainty" entry holding
+            the mean probabilities, their variance, the predictive entropy and the
+            mutual information (the part of the entropy due to model uncertainty), in nats
+        """
+        try:
+            if not self.is_model_loaded():
+                raise RuntimeError("Model not loaded. Please load the model first.")
+            if self.mc_head_function is None:
+                raise RuntimeError("Loaded model does not support uncertainty estimates")
+            
+            samples = samples or settings.MC_DROPOUT_SAMPLES
+            predictions, embeddings = self._run_model(image_array)
             
+            replicated = np.repeat(np.asarray(embeddings, dtype=np.float32), samples, axis=0)
+            draws = np.asarray(self.mc_head_function(tf.constant(replicated)))
+            draws = draws.reshape(len(embeddings), samples, -1)
+            
+            # Per-sample class distributions: (batch_size, samples, classes)
+            if draws.shape[-1] == 1:
+                class_names = ["Benign", "Malignant"]
+                draws = np.concatenate([1.0 - draws, draws], axis=-1)
             else:
-                # Multi-class classification model
-                probabilities = predictions[0]
-                
-                # Get predicted class index
-                predicted_idx = np.argmax(probabilities)
-                
-                # Get predicted class name
-                predicted_class = self.class_names[predicted_idx]
-                
-                # Get confidence score
-                confidence = float(probabilities[predicted_idx])
-                
-                # Create probabilities dictionary
-                class_probabilities = {
-                    class_name: float(prob)
-                    for class_name, prob in zip(self.class_names, probabilities)
-                }
-                
-                logger.info(f"Multi-class prediction: {predicted_class} ({confidence:.2%})")
+                class_names = self.class_names
             
-            return {
-                "prediction": predicted_class,
-                "confidence": confidence,
-                "probabilities": class_probabilities
-            }
+            eps = 1e-12
+            mean = draws.mean(axis=1)
+            variance = draws.var(axis=1)
+            entropy = -(mean * np.log(mean + eps)).sum(axis=-1)
+            expected_entropy = -(draws * np.log(draws + eps)).sum(axis=-1).mean(axis=1)
+            
+            results = []
+            for i, probabilities in enumerate(predictions):
+                result = self._format_prediction(probabilities)
+                result["uncertainty"] = {
+                    "samples": samples,
+                    "mean_probabilities": dict(zip(class_names, mean[i].tolist())),
+                    "variance": dict(zip(class_names, variance[i].tolist())),
+                    "predictive_entropy": float(entropy[i]),
+                    "mutual_information": float(max(entropy[i] - expected_entropy[i], 0.0))
+                }
+                results.append(result)
+            return results
         
         except Exception as e:
             logger.error(f"Error during prediction: {str(e)}")
             raise RuntimeError(f"Prediction failed: {str(e)}")
     
+    def _format_prediction(self, probabilities: np.ndarray) -> Dict[str, any]:
+        """
+        Turn the model output for a single image into a prediction dictionary
+        
+        Args:
+            probabilities: Model output for one image
+        
+        Returns:
+            Dictionary containing prediction, confidence, and probabilities
+        """
+        # Check if binary classification (single sigmoid output)
+        if probabilities.shape[-1] == 1:
+            # Binary classification model (Benign vs Malignant)
+            malignant_prob = float(probabilities[0])
+            benign_prob = 1.0 - malignant_prob
+            
+            # Determine predicted class
+            if malignant_prob > 0.5:
+                predicted_class = "Malignant"
+                confidence = malignant_prob
+            else:
+                predicted_class = "Benign"
+                confidence = benign_prob
+            
+            # Binary classification probabilities
+            class_probabilities = {
+                "Benign": benign_prob,
+                "Malignant": malignant_prob
+            }
+            
+            logger.info(f"Binary prediction: {predicted_class} ({confidence:.2%})")
+        
+        else:
+            # Multi-class classification model
+            # Get predicted class index
+            predicted_idx = np.argmax(probabilities)
+            
+            # Get predicted class name
+            predicted_class = self.class_names[predicted_idx]
+            
+            # Get confidence score
+            confidence = float(probabilities[predicted_idx])
+            
+            # Create probabilities dictionary
+            class_probabilities = {
+                class_name: float(prob)
+                for class_name, prob in zip(self.class_names, probabilities)
+            }
+            
+            logger.info(f"Multi-class prediction: {predicted_class} ({confidence:.2%})")
+        
+        return {
+            "prediction": predicted_class,
+            "confidence": confidence,
+            "probabilities": class_probabilities
+        }
+    
     def get_model_info(self) -> Dict[str, any]:
         """Get information about the loaded model"""
+        if self.serving_function is not None:
+            return {
+                "status": "loaded",
+                "model_version": self.model_version,
+                "input_shape": (None, None, None, settings.IMAGE_CHANNELS),
+                "output_shape": (None, self.output_dim),
+                "num_classes": len(self.class_names),
+                "classes": self.class_names,
+                "serving_artifact": self.serving_artifact_path,
+                "exported_at": self._artifact_info.get("exported_at"),
+                "embedding_dim": self.embedding_dim,
+                "uncertainty": self.supports_uncertainty
+            }
+        
         if self.model is None:
             return {"status": "not_loaded"}
         
         return {
             "status": "loaded",
+            "model_version": self.model_version,
             "input_shape": self.model.input_shape,
             "output_shape": self.model.output_shape,
             "num_classes": len(self.class_names),
-            "classes": self.class_names
+            "classes": self.class_names,
+            "compiled_batch_buckets": sorted(self._bucket_functions),
+            "embedding_dim": self.embedding_dim,
+            "uncertainty": self.supports_uncertainty
         }
 
@@ -0,0 +1,308 @@
+import copy
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# How often blocked workers check whether the run was aborted
+POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+
+class PipelineItem:
+    """One input travelling through the pipeline; once a stage fails, later stages pass it through untouched"""
+    
+    __slots__ = ("index", "value", "error")
+    
+    def __init__(self, index: int, value: any):
+        self.index = index
+        self.value = value
+        self.error: Optional[Exception] = None
+
+
+class Stage:
+    """
+    One step of a Pipeline
+    
+    fn is called with one item's value and returns the value handed to the
+    next stage. A stage with batch_size > 1 assembles batches instead: fn
+    gets a list of up to batch_size values and returns a list of results of
+    the same length. A batch is dispatched when it is full, when the input
+    is exhausted, or max_wait_ms after its first item arrived, so a slow
+    upstream stage never holds finished work back for long.
+    """
+    
+    def __init__(self, name: str, fn: Callable, workers: int = 1, batch_size: int = 1,
+                 max_wait_ms: float = 0.0):
+        if workers < 1 or batch_size < 1:
+            raise ValueError(f"Stage {name} needs at least one worker and a batch size of at least 1")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+
+class StageStats:
+    """Time one stage's workers spent working, waiting for input and waiting for room downstream"""
+    
+    def __init__(self, stage: Stage):
+        self.workers = stage.workers
+        self.items = 0
+        self.errors = 0
+        self.batches = 0
+        self.busy = 0.0
+        self.assemble = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+    
+    def merge(self, other: "StageStats") -> None:
+        self.items += other.items
+        self.errors += other.errors
+        self.batches += other.batches
+        self.busy += other.busy
+        self.assemble += other.assemble
+        self.starved += other.starved
+        self.blocked += other.blocked
+    
+    def to_dict(self, wall: float) -> Dict[str, any]:
+        capacity = wall * self.workers
+        stats = {
+            "workers": self.workers,
+            "items": self.items,
+            "errors": self.errors,
+            "busy_ms": round(self.busy * 1000, 3),
+            "utilization": round(self.busy / capacity, 4) if capacity > 0 else 0.0,
+            "starved_ms": round(self.starved * 1000, 3),
+            "blocked_ms": round(self.blocked * 1000, 3),
+        }
+        if self.batches:
+            stats["batches"] = self.batches
+            stats["mean_batch_size"] = round(self.items / self.batches, 2)
+            stats["assemble_ms"] = round(self.assemble * 1000, 3)
+        return stats
+
+
+class PipelineStats:
+    """Utilization summed over many pipeline runs, e.g. every /batch-predict request"""
+    
+    def __init__(self):
+        self.runs = 0
+        self.items = 0
+        self.wall = 0.0
+        self.stages: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+    
+    def add(self, items: int, wall: float, stages: Dict[str, StageStats]) -> None:
+        with self._lock:
+            self.runs += 1
+            self.items += items
+            self.wall += wall
+            for name, stage_stats in stages.items():
+                if name in self.stages:
+                    self.stages[name].merge(stage_stats)
+                else:
+                    self.stages[name] = copy.copy(stage_stats)
+    
+    def get_stats(self) -> Dict[str, any]:
+        with self._lock:
+            return summarize(self.items, self.wall, self.stages, runs=self.runs)
+
+
+def summarize(items: int, wall: float, stages: Dict[str, StageStats], **extra) -> Dict[str, any]:
+    """Report for one run or a PipelineStats total; the bottleneck is the stage with the highest utilization"""
+    report = dict(extra)
+    report.update({
+        "items": items,
+        "wall_ms": round(wall * 1000, 3),
+        "items_per_sec": round(items / wall, 2) if wall > 0 else 0.0,
+        "stages": {name: stage_stats.to_dict(wall) for name, stage_stats in stages.items()},
+    })
+    if stages:
+        report["bottleneck"] = max(stages, key=lambda name: report["stages"][name]["utilization"])
+    return report
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages, each with its own worker threads
+    
+    Stages are connected by bounded queues of queue_size items, so a fast
+    stage blocks instead of buffering the whole input, and all stages work
+    at once: while one batch is in the model the decode workers are already
+    preparing the next. Items can leave a multi-worker stage out of order;
+    each carries its input index. Worker threads are started per run(), so
+    one Pipeline can serve concurrent runs.
+    """
+    
+    def __init__(self, stages: List[Stage], queue_size: int = 16, stats: Optional[PipelineStats] = None):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats = stats
+    
+    def run(self, values: Iterable, sink: Optional[Callable[[PipelineItem], None]] = None) -> Dict[str, any]:
+        """
+        Feed values through every stage and wait until all of them came out
+        
+        Args:
+            values: Inputs of the first stage; consumed lazily, so it can be a generator
+            sink: Called in the calling thread with every item leaving the last stage
+        
+        Returns:
+            Run report with per-stage utilization (see summarize)
+        """
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        stage_stats = {stage.name: StageStats(stage) for stage in self.stages}
+        fed = [0]
+        threads = [threading.Thread(target=self._feed, args=(values, queues[0], stop, fed),
+                                    name="pipeline-feed", daemon=True)]
+        
+        for position, stage in enumerate(self.stages):
+            # The last worker of a stage to finish hands one end marker to each worker downstream
+            downstream = self.stages[position + 1].workers if position + 1 < len(self.stages) else 1
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            for worker in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(stage, queues[position], queues[position + 1], stop, StageStats(stage),
+                          stage_stats[stage.name], remaining, lock, downstream),
+                    name=f"pipeline-{stage.name}-{worker}",
+                    daemon=True
+                ))
+        
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _DONE:
+                    break
+                if sink is not None:
+                    sink(item)
+        finally:
+            # Unblocks every worker if the sink or the caller failed
+            stop.set()
+            for thread in threads:
+                thread.join()
+        
+        wall = time.perf_counter() - start
+        if self.stats is not None:
+            self.stats.add(fed[0], wall, stage_stats)
+        return summarize(fed[0], wall, stage_stats)
+    
+    def _feed(self, values: Iterable, outbox: queue.Queue, stop: threading.Event, fed: List[int]) -> None:
+        try:
+            for index, value in enumerate(values):
+                if not self._put(outbox, PipelineItem(index, value), stop):
+                    return
+                fed[0] += 1
+        except Exception as e:
+            logger.error(f"Pipeline input failed after {fed[0]} items: {str(e)}")
+        for _ in range(self.stages[0].workers):
+            self._put(outbox, _DONE, stop)
+    
+    def _work(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue, stop: threading.Event,
+              local: StageStats, total: StageStats, remaining: List[int], lock: threading.Lock,
+              downstream: int) -> None:
+        # Counted in thread-local stats and merged once at the end
+        try:
+            finished = False
+            while not finished:
+                wait_start = time.perf_counter()
+                first = self._get(inbox, stop)
+                local.starved += time.perf_counter() - wait_start
+                if first is None or first is _DONE:
+                    break
+                
+                items = [first]
+                if stage.batch_size > 1:
+                    finished = self._assemble(stage, inbox, stop, items, local)
+                
+                self._process(stage, items, local)
+                
+                wait_start = time.perf_counter()
+                for item in items:
+                    if not self._put(outbox, item, stop):
+                        return
+                local.blocked += time.perf_counter() - wait_start
+        finally:
+            with lock:
+                total.merge(local)
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                for _ in range(downstream):
+                    self._put(outbox, _DONE, stop)
+    
+    def _assemble(self, stage: Stage, inbox: queue.Queue, stop: threading.Event, items: List[PipelineItem],
+                  local: StageStats) -> bool:
+        """Add items to the batch until it is full or max_wait ran out; True if the input ended"""
+        assemble_start = time.perf_counter()
+        deadline = assemble_start + stage.max_wait
+        try:
+            while len(items) < stage.batch_size and not stop.is_set():
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = inbox.get(timeout=min(timeout, POLL_INTERVAL)) if timeout > 0 else inbox.get_nowait()
+                except queue.Empty:
+                    if timeout > POLL_INTERVAL:
+                        continue
+                    return False
+                if item is _DONE:
+                    return True
+                items.append(item)
+            return False
+        finally:
+            local.assemble += time.perf_counter() - assemble_start
+    
+    def _process(self, stage: Stage, items: List[PipelineItem], local: StageStats) -> None:
+        pending = [item for item in items if item.error is None]
+        local.items += len(pending)
+        if not pending:
+            return
+        
+        busy_start = time.perf_counter()
+        try:
+            if stage.batch_size > 1:
+                local.batches += 1
+                results = stage.fn([item.value for item in pending])
+                if len(results) != len(pending):
+                    raise RuntimeError(f"Stage {stage.name} returned {len(results)} results for {len(pending)} items")
+                for item, result in zip(pending, results):
+                    item.value = result
+            else:
+                pending[0].value = stage.fn(pending[0].value)
+        except Exception as e:
+            for item in pending:
+                item.error = e
+            local.errors += len(pending)
+        local.busy += time.perf_counter() - busy_start
+    
+    @staticmethod
+    def _get(inbox: queue.Queue, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                return inbox.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return None
+    
+    @staticmethod
+    def _put(outbox: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                outbox.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
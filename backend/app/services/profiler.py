@@ -0,0 +1,265 @@
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Flame graph layout
+FLAME_WIDTH = 1200
+FLAME_ROW_HEIGHT = 16
+FLAME_CHAR_WIDTH = 7
+
+
+@contextmanager
+def stage_timer(timings: Optional[Dict[str, float]], stage: str):
+    """Add the block's duration in milliseconds to timings[stage]; no-op when timings is None"""
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack at a fixed interval
+    
+    Runs in its own thread and reads the target's current frame through
+    sys._current_frames, so the profiled code is not instrumented at all.
+    Stacks are stored folded ("root;child;leaf" -> sample count), the input
+    format of flamegraph.pl and speedscope.
+    """
+    
+    def __init__(self, thread_id: int, interval: float, root_depth: int = 0):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root_depth = root_depth
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+    
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = self._fold(frame)
+                if stack:
+                    self.samples[stack] += 1
+    
+    def _fold(self, frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+            frame = frame.f_back
+        names.reverse()
+        # Drop the thread pool frames above the profiled function
+        return ";".join(names[self.root_depth:])
+
+
+def render_flame_graph(samples: Dict[str, int], title: str) -> str:
+    """Render folded stacks as a standalone SVG flame graph (root at the bottom)"""
+    root = {"count": 0, "children": {}}
+    for stack, count in samples.items():
+        node = root
+        node["count"] += count
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"count": 0, "children": {}})
+            node["count"] += count
+    
+    def depth_of(node):
+        return 1 + max((depth_of(child) for child in node["children"].values()), default=0)
+    
+    total = max(root["count"], 1)
+    rows = depth_of(root) - 1
+    height = (rows + 2) * FLAME_ROW_HEIGHT
+    rects = []
+    
+    def draw(node, name, x, depth):
+        width = node["count"] / total * FLAME_WIDTH
+        if width < 0.5:
+            return
+        y = height - (depth + 1) * FLAME_ROW_HEIGHT
+        # Stable warm colour per function name
+        hue = zlib.crc32(name.encode()) % 60
+        label = name if len(name) * FLAME_CHAR_WIDTH < width else name[:max(int(width / FLAME_CHAR_WIDTH) - 2, 0)] + ".."
+        tooltip = f"{name}: {node['count']} samples ({node['count'] / total:.1%})"
+        rects.append(
+            f'<g><title>{escape(tooltip)}</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{width:.1f}" height="{FLAME_ROW_HEIGHT - 1}" '
+            f'fill="hsl({hue},85%,60%)"/>'
+            + (f'<text x="{x + 2:.1f}" y="{y + 11}">{escape(label)}</text>' if len(label) > 2 else "")
+            + '</g>'
+        )
+        child_x = x
+        for child_name, child in sorted(node["children"].items()):
+            draw(child, child_name, child_x, depth + 1)
+            child_x += child["count"] / total * FLAME_WIDTH
+    
+    x = 0.0
+    for name, child in sorted(root["children"].items()):
+        draw(child, name, x, 0)
+        x += child["count"] / total * FLAME_WIDTH
+    
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{FLAME_WIDTH}" height="{height}" '
+        f'font-family="monospace" font-size="11">'
+        f'<text x="4" y="12">{escape(title)}</text>'
+        + "".join(rects)
+        + "</svg>"
+    )
+
+
+class RequestProfiler:
+    """
+    Opt-in per-request profiling for the prediction pipeline
+    
+    A request is profiled when it carries `X-Profile: <ADMIN_TOKEN>` or is
+    picked by PROFILE_SAMPLE_RATE. Profiled requests run under a
+    SamplingProfiler and record per-stage timings; each profile is stored in
+    PROFILE_DIR as JSON (metadata, timings, folded stacks) plus an SVG flame
+    graph. Unprofiled requests only pay for the should_profile check.
+    """
+    
+    def __init__(self):
+        self.profile_dir = settings.PROFILE_DIR
+        self.interval = settings.PROFILE_INTERVAL_MS / 1000.0
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE
+        self.max_stored = settings.PROFILE_MAX_STORED
+        self._lock = threading.Lock()
+    
+    def should_profile(self, token: Optional[str]) -> bool:
+        """Decide whether to profile a request from its X-Profile header and the sample rate"""
+        if token and settings.ADMIN_TOKEN and hmac.compare_digest(token, settings.ADMIN_TOKEN):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+    
+    def run(self, fn: Callable[[Dict[str, float]], any], endpoint: str, label: str) -> Tuple[any, str]:
+        """
+        Call fn(timings) under the sampling profiler and store the result
+        
+        Args:
+            fn: Pipeline to profile; receives the dict its stages record timings into
+            endpoint: Endpoint name stored with the profile
+            label: Free-form label, e.g. the uploaded filename
+        
+        Returns:
+            Tuple of (fn's return value, profile id)
+        """
+        # Frames from the thread root down to this one are thread pool plumbing
+        root_depth = 0
+        frame = sys._getframe()
+        while frame is not None:
+            root_depth += 1
+            frame = frame.f_back
+        
+        timings: Dict[str, float] = {}
+        sampler = SamplingProfiler(threading.get_ident(), self.interval, root_depth)
+        error = None
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            result = fn(timings)
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            sampler.stop()
+            total_ms = (time.perf_counter() - start) * 1000
+            profile_id = self._save(endpoint, label, total_ms, timings, sampler.samples, error)
+        return result, profile_id
+    
+    def _save(self, endpoint: str, label: str, total_ms: float, timings: Dict[str, float],
+              samples: Counter, error: Optional[str]) -> str:
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        profile = {
+            "id": profile_id,
+            "created": time.time(),
+            "endpoint": endpoint,
+            "label": label,
+            "total_ms": round(total_ms, 3),
+            "stages_ms": {stage: round(ms, 3) for stage, ms in timings.items()},
+            "samples": sum(samples.values()),
+            "interval_ms": self.interval * 1000,
+            "error": error,
+            "folded_stacks": dict(samples.most_common()),
+        }
+        
+        try:
+            with self._lock:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                with open(os.path.join(self.profile_dir, f"{profile_id}.json"), "w") as f:
+                    json.dump(profile, f)
+                title = f"{endpoint} {label} - {total_ms:.1f} ms, {profile['samples']} samples"
+                with open(os.path.join(self.profile_dir, f"{profile_id}.svg"), "w") as f:
+                    f.write(render_flame_graph(samples, title))
+                self._prune()
+            logger.info(f"Stored profile {profile_id} ({total_ms:.1f} ms, {profile['samples']} samples)")
+        except OSError as e:
+            logger.error(f"Failed to store profile: {str(e)}")
+        return profile_id
+    
+    def _prune(self) -> None:
+        """Keep only the newest max_stored profiles"""
+        ids = sorted(name[:-5] for name in os.listdir(self.profile_dir) if name.endswith(".json"))
+        for profile_id in ids[:-self.max_stored]:
+            for extension in (".json", ".svg"):
+                path = os.path.join(self.profile_dir, profile_id + extension)
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def list_profiles(self) -> List[Dict[str, any]]:
+        """Summaries of stored profiles, newest first"""
+        if not os.path.isdir(self.profile_dir):
+            return []
+        summaries = []
+        for name in sorted(os.listdir(self.profile_dir), reverse=True):
+            if not name.endswith(".json"):
+                continue
+            profile = self.get_profile(name[:-5])
+            if profile is not None:
+                profile.pop("folded_stacks", None)
+                summaries.append(profile)
+        return summaries
+    
+    def get_profile(self, profile_id: str) -> Optional[Dict[str, any]]:
+        """Full stored profile, or None if it does not exist"""
+        path = self._path(profile_id, ".json")
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+    
+    def flame_graph_path(self, profile_id: str) -> Optional[str]:
+        path = self._path(profile_id, ".svg")
+        return path if path is not None and os.path.exists(path) else None
+    
+    def _path(self, profile_id: str, extension: str) -> Optional[str]:
+        # Profile ids come from the URL; refuse anything that could leave the directory
+        if not profile_id or os.path.basename(profile_id) != profile_id or profile_id.startswith("."):
+            return None
+        return os.path.join(self.profile_dir, profile_id + extension)
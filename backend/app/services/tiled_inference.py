@@ -0,0 +1,110 @@
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.image_processor import ImageProcessor
+from app.services.model_service import ModelService
+from app.services.profiler import stage_timer
+
+logger = logging.getLogger(__name__)
+
+AGGREGATIONS = ("max", "topk")
+
+
+class TiledInference:
+    """
+    Classify large photos from overlapping model-sized tiles instead of one downscaled view
+    
+    Resizing a 4096x4096 intraoral shot to 224x224 can shrink a small
+    lesion to a few pixels. Here the image is only scaled to
+    TILED_MAX_SIDE, cut into overlapping tiles, and the tiles that look
+    like tissue (see ImageProcessor.extract_tiles) are classified in
+    batched model calls, at most TILE_BUDGET of them, most textured first.
+    
+    A tile's lesion score is its malignant probability for binary models,
+    or one minus the first class ("Normal") for multi-class models. The
+    image-level output is the output of the highest-scoring tile ("max")
+    or the mean output of the TILED_TOP_K highest-scoring tiles ("topk").
+    """
+    
+    def __init__(self, image_processor: ImageProcessor, model_service: ModelService):
+        self.image_processor = image_processor
+        self.model_service = model_service
+        self.budget = settings.TILE_BUDGET
+        self.aggregation = settings.TILED_AGGREGATION
+        self.top_k = settings.TILED_TOP_K
+        
+        if self.aggregation not in AGGREGATIONS:
+            raise ValueError(f"TILED_AGGREGATION must be one of {AGGREGATIONS}, got {self.aggregation!r}")
+    
+    def predict(self, image_data: bytes, timings: Optional[Dict[str, float]] = None,
+                quality_gate: bool = False) -> Dict[str, any]:
+        """
+        Tile, classify and aggregate one image
+        
+        Args:
+            image_data: Raw image bytes
+            timings: Optional dict that receives per-stage durations in milliseconds
+            quality_gate: Reject unusable photos with ImageQualityError
+        
+        Returns:
+            Prediction dictionary plus "tiles" (grid and tile counts),
+            "heatmap" (lesion score per grid cell, None where the tile was skipped)
+            and "overview" (the whole image at model input size, for the drift monitor)
+        """
+        extracted = self.image_processor.extract_tiles(image_data, timings, quality_gate)
+        tiles = extracted["tiles"]
+        foreground = extracted["foreground"]
+        
+        # Tissue tiles, most textured first, cut to the budget
+        candidates = np.flatnonzero(foreground)
+        if len(candidates) == 0:
+            # Nothing passed the background filter: still answer from the best tile
+            candidates = np.array([int(np.argmax(extracted["content"]))])
+        candidates = candidates[np.argsort(-extracted["content"][candidates], kind="stable")]
+        selected = np.sort(candidates[:self.budget])
+        
+        with stage_timer(timings, "predict"):
+            # One call; the model service splits it into its own batch sizes
+            outputs, _ = self.model_service._run_model(tiles[selected])
+        
+        scores = self._lesion_scores(outputs)
+        order = np.argsort(-scores)
+        if self.aggregation == "max":
+            image_output = outputs[order[0]]
+        else:
+            image_output = outputs[order[:self.top_k]].mean(axis=0)
+        
+        rows, cols = extracted["grid"]
+        heatmap: List[List[Optional[float]]] = [[None] * cols for _ in range(rows)]
+        for tile_index, score in zip(selected, scores):
+            row, col = extracted["positions"][tile_index]
+            heatmap[row][col] = round(float(score), 4)
+        
+        result = self.model_service._format_prediction(image_output)
+        result["tiles"] = {
+            "grid": [rows, cols],
+            "total": len(tiles),
+            "evaluated": len(selected),
+            "skipped_background": int(len(tiles) - foreground.sum()),
+            "skipped_budget": int(max(foreground.sum() - self.budget, 0)),
+            "tiled_size": list(extracted["size"]),
+            "scale": round(extracted["scale"], 4),
+            "aggregation": self.aggregation,
+        }
+        result["heatmap"] = heatmap
+        result["overview"] = extracted["overview"]
+        
+        logger.info(
+            f"Tiled prediction over {len(selected)}/{len(tiles)} tiles "
+            f"({rows}x{cols} grid): {result['prediction']} ({result['confidence']:.2%})"
+        )
+        return result
+    
+    @staticmethod
+    def _lesion_scores(outputs: np.ndarray) -> np.ndarray:
+        if outputs.shape[-1] == 1:
+            return outputs[:, 0]
+        return 1.0 - outputs[:, 0]
@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TRACE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class Span:
+    """One timed stage of a request, identified by trace id and span id"""
+    
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_time", "_start", "duration_ms",
+                 "attributes", "links", "error")
+    
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 links: Optional[List["Span"]] = None, attributes: Optional[Dict[str, any]] = None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.attributes = dict(attributes or {})
+        self.links = [{"trace_id": span.trace_id, "span_id": span.span_id} for span in links or []]
+        self.error: Optional[str] = None
+    
+    def set_attribute(self, key: str, value: any) -> None:
+        self.attributes[key] = value
+    
+    def to_dict(self) -> Dict[str, any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "links": self.links,
+            "error": self.error,
+        }
+
+
+class Tracer:
+    """
+    Records request spans into an in-process ring buffer and optionally a JSONL file
+    
+    Spans form a tree through parent_id; a span that batches work from
+    several others (e.g. one model call over many images) lists them in
+    `links`. The most recent TRACE_BUFFER_SIZE spans stay queryable through
+    find(); with TRACE_EXPORT_PATH set, every finished span is also appended
+    to that file by a background thread so request threads never wait on I/O.
+    """
+    
+    def __init__(self):
+        self.enabled = settings.TRACING_ENABLED
+        self.export_path = settings.TRACE_EXPORT_PATH
+        self._buffer: deque = deque(maxlen=settings.TRACE_BUFFER_SIZE)
+        self._lock = threading.Lock()
+        self._export_queue: Optional[queue.Queue] = None
+        
+        if self.enabled and self.export_path:
+            self._export_queue = queue.Queue()
+            threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True).start()
+    
+    @staticmethod
+    def new_trace_id(requested: Optional[str] = None) -> str:
+        """Use the caller's trace id if it is well formed, otherwise start a new trace"""
+        if requested and TRACE_ID_PATTERN.match(requested):
+            return requested
+        return uuid.uuid4().hex
+    
+    def start_span(self, name: str, trace_id: str, parent: Optional[Span] = None,
+                   links: Optional[List[Span]] = None, **attributes) -> Span:
+        return Span(name, trace_id, parent.span_id if parent is not None else None, links, attributes)
+    
+    def end_span(self, span: Span, error: Optional[str] = None) -> None:
+        """Finish a span and record it; ending a span twice is a no-op"""
+        if span.duration_ms is not None:
+            return
+        span.duration_ms = round((time.perf_counter() - span._start) * 1000, 3)
+        span.error = error
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            self._buffer.append(span)
+        if self._export_queue is not None:
+            self._export_queue.put(span)
+    
+    @contextmanager
+    def span(self, name: str, trace_id: str, parent: Optional[Span] = None,
+             links: Optional[List[Span]] = None, **attributes):
+        """Time the block as a span; exceptions are recorded on the span and re-raised"""
+        span = self.start_span(name, trace_id, parent, links, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, error=f"{type(e).__name__}: {str(e)}")
+            raise
+        self.end_span(span)
+    
+    def _export_loop(self) -> None:
+        os.makedirs(os.path.dirname(self.export_path) or ".", exist_ok=True)
+        with open(self.export_path, "a") as f:
+            while True:
+                spans = [self._export_queue.get()]
+                # Drain whatever else finished meanwhile and write it in one go
+                while not self._export_queue.empty() and len(spans) < 1000:
+                    spans.append(self._export_queue.get_nowait())
+                try:
+                    f.write("".join(json.dumps(span.to_dict()) + "\n" for span in spans))
+                    f.flush()
+                except (OSError, TypeError, ValueError) as e:
+                    logger.error(f"Failed to export spans: {str(e)}")
+    
+    def find(self, trace_id: Optional[str] = None, name: Optional[str] = None,
+             min_duration_ms: float = 0.0, limit: int = 100) -> List[Dict[str, any]]:
+        """
+        Query the ring buffer
+        
+        Args:
+            trace_id: Only spans of this trace (returned in start order)
+            name: Only spans with this name
+            min_duration_ms: Only spans at least this slow
+            limit: Max spans returned, most recent first unless trace_id is given
+        
+        Returns:
+            List of span dictionaries
+        """
+        with self._lock:
+            spans = list(self._buffer)
+        
+        matches = [
+            span for span in spans
+            if (trace_id is None or span.trace_id == trace_id)
+            and (name is None or span.name == name)
+            and span.duration_ms >= min_duration_ms
+        ]
+        if trace_id is not None:
+            matches.sort(key=lambda span: span.start_time)
+            return [span.to_dict() for span in matches[:limit]]
+        return [span.to_dict() for span in reversed(matches[-limit:])]
@@ -0,0 +1,133 @@
+"""
+Batched Image Augmentation
+Vectorized replacement for the per-image scipy transforms of
+ImageDataGenerator, used by train_model.py's tf.data pipeline
+
+One random affine matrix per image (rotation, shifts, shear, zoom and
+flips, composed like ImageDataGenerator.apply_transform) is built with
+tensor ops and the whole batch is resampled by a single
+ImageProjectiveTransformV3 call (bilinear, nearest fill). Brightness is a
+per-image multiplier. Parameters use the same units and distributions as
+ImageDataGenerator:
+  - rotation_range: degrees, uniform in [-r, r]
+  - width/height_shift_range: fraction of the image size, uniform in [-s, s]
+  - shear_range: degrees (as in Keras), uniform in [-s, s]
+  - zoom_range: x and y zoom drawn independently from [1 - z, 1 + z]
+  - brightness_range: multiplier drawn from [low, high]
+
+Usage:
+    from augmentation import augment_batch
+    dataset = dataset.batch(BATCH_SIZE).map(lambda x, y: (augment_batch(x), y),
+                                            num_parallel_calls=tf.data.AUTOTUNE)
+"""
+
+import math
+import tensorflow as tf
+
+# Same settings as create_data_generators in train_model.py
+AUGMENTATION = {
+    "rotation_range": 40,
+    "width_shift_range": 0.2,
+    "height_shift_range": 0.2,
+    "shear_range": 0.2,
+    "zoom_range": 0.3,
+    "horizontal_flip": True,
+    "vertical_flip": True,
+    "brightness_range": (0.8, 1.2),
+}
+
+
+def _uniform(batch_size, low, high):
+    return tf.random.uniform([batch_size], low, high)
+
+
+def _flip_signs(batch_size, enabled):
+    if not enabled:
+        return tf.ones([batch_size])
+    return tf.where(tf.random.uniform([batch_size]) < 0.5, -1.0, 1.0)
+
+
+def random_affine_transforms(batch_size, height, width, params=AUGMENTATION):
+    """
+    One random output-to-input transform per image, in ImageProjectiveTransform format
+    
+    Returns:
+        float32 tensor of shape (batch_size, 8)
+    """
+    height = tf.cast(height, tf.float32)
+    width = tf.cast(width, tf.float32)
+    zeros = tf.zeros([batch_size])
+    ones = tf.ones([batch_size])
+    
+    def matrices(rows):
+        return tf.reshape(tf.stack([value for row in rows for value in row], axis=1), [batch_size, 3, 3])
+    
+    theta = _uniform(batch_size, -params["rotation_range"], params["rotation_range"]) * (math.pi / 180)
+    tx = _uniform(batch_size, -params["width_shift_range"], params["width_shift_range"]) * width
+    ty = _uniform(batch_size, -params["height_shift_range"], params["height_shift_range"]) * height
+    shear = _uniform(batch_size, -params["shear_range"], params["shear_range"]) * (math.pi / 180)
+    zoom = params["zoom_range"]
+    zx = _uniform(batch_size, 1 - zoom, 1 + zoom)
+    zy = _uniform(batch_size, 1 - zoom, 1 + zoom)
+    fx = _flip_signs(batch_size, params["horizontal_flip"])
+    fy = _flip_signs(batch_size, params["vertical_flip"])
+    
+    rotation = matrices([[tf.cos(theta), -tf.sin(theta), zeros],
+                         [tf.sin(theta), tf.cos(theta), zeros],
+                         [zeros, zeros, ones]])
+    shift = matrices([[ones, zeros, tx], [zeros, ones, ty], [zeros, zeros, ones]])
+    shearing = matrices([[ones, -tf.sin(shear), zeros], [zeros, tf.cos(shear), zeros], [zeros, zeros, ones]])
+    zooming = matrices([[zx, zeros, zeros], [zeros, zy, zeros], [zeros, zeros, ones]])
+    flipping = matrices([[fx, zeros, zeros], [zeros, fy, zeros], [zeros, zeros, ones]])
+    
+    # Composed in ImageDataGenerator's order around the image centre; flips act on the output
+    cx, cy = (width - 1) / 2, (height - 1) / 2
+    to_center = matrices([[ones, zeros, ones * cx], [zeros, ones, ones * cy], [zeros, zeros, ones]])
+    from_center = matrices([[ones, zeros, -ones * cx], [zeros, ones, -ones * cy], [zeros, zeros, ones]])
+    transform = to_center @ rotation @ shift @ shearing @ zooming @ flipping @ from_center
+    
+    return tf.reshape(transform, [batch_size, 9])[:, :8]
+
+
+def augment_batch(images, params=AUGMENTATION):
+    """
+    Randomly augment a batch of images scaled to [0, 1]
+    
+    Args:
+        images: float32 tensor of shape (batch, height, width, channels)
+        params: Augmentation ranges, ImageDataGenerator units
+    
+    Returns:
+        Augmented batch with the same shape
+    """
+    shape = tf.shape(images)
+    batch_size, height, width = shape[0], shape[1], shape[2]
+    
+    images = tf.raw_ops.ImageProjectiveTransformV3(
+        images=images,
+        transforms=random_affine_transforms(batch_size, height, width, params),
+        output_shape=tf.stack([height, width]),
+        fill_value=0.0,
+        interpolation="BILINEAR",
+        fill_mode="NEAREST"
+    )
+    
+    low, high = params["brightness_range"]
+    brightness = tf.random.uniform([batch_size, 1, 1, 1], low, high)
+    return tf.clip_by_value(images * brightness, 0.0, 1.0)
+
+
+class BatchedAugmentation(tf.keras.layers.Layer):
+    """Keras layer form of augment_batch; only active while training"""
+    
+    def __init__(self, params=None, **kwargs):
+        super().__init__(**kwargs)
+        self.params = dict(params or AUGMENTATION)
+    
+    def call(self, images, training=None):
+        if not training:
+            return images
+        return augment_batch(images, self.params)
+    
+    def get_config(self):
+        return {**super().get_config(), "params": self.params}
@@ -0,0 +1,228 @@
+"""
+Inference Auto-Tuner
+Benchmarks workers x TensorFlow threads x batch size on the current machine
+and writes out the fastest configuration
+
+Every combination runs in fresh processes (TensorFlow thread pools can only
+be sized once per process), one process per simulated API worker, each with
+its own model instance - exactly like `INFERENCE_WORKERS` uvicorn workers.
+
+Usage:
+    python autotune.py
+    python autotune.py --workers 1 2 4 --threads 1 2 4 8 --batch-sizes 1 4 8 --duration 15
+"""
+
+import os
+import json
+import time
+import queue
+import argparse
+import itertools
+import multiprocessing as mp
+
+# Output files
+RESULTS_PATH = "autotune_results.json"
+ENV_OUTPUT_PATH = "autotune.env"
+
+# Time a worker may take to load the model and warm up, on top of --duration
+WORKER_STARTUP_TIMEOUT_SECONDS = 300.0
+
+
+def benchmark_worker(intra_op_threads, inter_op_threads, batch_size, duration, barrier, result_queue):
+    """Load the model in this process and run inference for `duration` seconds"""
+    # Imported here so TensorFlow initializes inside the worker process
+    import numpy as np
+    from app.core.config import settings
+    from app.services.model_service import ModelService
+    
+    settings.TF_INTRA_OP_THREADS = intra_op_threads
+    settings.TF_INTER_OP_THREADS = inter_op_threads
+    settings.INFERENCE_BATCH_SIZE = batch_size
+    
+    model_service = ModelService()
+    model_service.load_model()
+    
+    batch = np.random.rand(batch_size, *settings.IMAGE_SIZE, settings.IMAGE_CHANNELS).astype(np.float32)
+    
+    # Warm up so one-time graph building is not measured
+    for _ in range(3):
+        model_service.predict_batch(batch)
+    
+    # Start all workers together so they compete for cores like real traffic
+    barrier.wait()
+    
+    latencies = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        call_start = time.perf_counter()
+        model_service.predict_batch(batch)
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    
+    result_queue.put({
+        "images": len(latencies) * batch_size,
+        "elapsed": elapsed,
+        "latencies": latencies
+    })
+
+
+def collect_results(processes, result_queue, timeout):
+    """
+    One result per worker process, or None if a worker crashed or the configuration timed out
+    
+    A crashed worker never reports, and the others then wait at the barrier
+    for ever, so the remaining processes are terminated.
+    """
+    deadline = time.monotonic() + timeout
+    worker_results = []
+    while len(worker_results) < len(processes):
+        try:
+            worker_results.append(result_queue.get(timeout=1.0))
+        except queue.Empty:
+            if time.monotonic() > deadline or any(process.exitcode not in (None, 0) for process in processes):
+                for process in processes:
+                    if process.is_alive():
+                        process.terminate()
+                worker_results = None
+                break
+    
+    for process in processes:
+        process.join()
+    return worker_results
+
+
+def run_configuration(workers, intra_op_threads, inter_op_threads, batch_size, duration):
+    """Benchmark one configuration and return its throughput and latency (None if it failed)"""
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    result_queue = ctx.Queue()
+    
+    processes = [
+        ctx.Process(
+            target=benchmark_worker,
+            args=(intra_op_threads, inter_op_threads, batch_size, duration, barrier, result_queue)
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    
+    worker_results = collect_results(processes, result_queue, duration + WORKER_STARTUP_TIMEOUT_SECONDS)
+    if worker_results is None:
+        return None
+    
+    total_images = sum(r["images"] for r in worker_results)
+    wall_time = max(r["elapsed"] for r in worker_results)
+    latencies = sorted(l for r in worker_results for l in r["latencies"])
+    p50 = latencies[len(latencies) // 2] if latencies else float("nan")
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else float("nan")
+    
+    return {
+        "workers": workers,
+        "intra_op_threads": intra_op_threads,
+        "inter_op_threads": inter_op_threads,
+        "batch_size": batch_size,
+        "images_per_sec": total_images / wall_time if wall_time > 0 else 0.0,
+        "p50_batch_latency_ms": p50 * 1000,
+        "p95_batch_latency_ms": p95 * 1000,
+    }
+
+
+def write_best_configuration(best):
+    """Write the winning configuration in .env format so Settings can pick it up"""
+    with open(ENV_OUTPUT_PATH, "w") as f:
+        f.write(f"# Generated by autotune.py for {os.cpu_count()} CPUs\n")
+        f.write(f"# {best['images_per_sec']:.1f} images/sec, p95 batch latency {best['p95_batch_latency_ms']:.1f} ms\n")
+        f.write(f"INFERENCE_WORKERS={best['workers']}\n")
+        f.write(f"TF_INTRA_OP_THREADS={best['intra_op_threads']}\n")
+        f.write(f"TF_INTER_OP_THREADS={best['inter_op_threads']}\n")
+        f.write(f"INFERENCE_BATCH_SIZE={best['batch_size']}\n")
+
+
+def parse_args():
+    cpu_count = os.cpu_count() or 1
+    default_threads = sorted({1, 2, 4, cpu_count} & set(range(1, cpu_count + 1)))
+    default_workers = sorted({1, 2, 4} & set(range(1, cpu_count + 1)))
+    
+    parser = argparse.ArgumentParser(description="Auto-tune inference workers, threads and batch size")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers,
+                        help="Worker process counts to try")
+    parser.add_argument("--threads", type=int, nargs="+", default=default_threads,
+                        help="TensorFlow intra-op thread counts to try")
+    parser.add_argument("--inter-op-threads", type=int, nargs="+", default=[1],
+                        help="TensorFlow inter-op thread counts to try")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8],
+                        help="Batch sizes to try")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="Seconds to benchmark each configuration")
+    parser.add_argument("--max-p95-ms", type=float, default=None,
+                        help="Only accept configurations whose p95 batch latency stays below this budget")
+    parser.add_argument("--allow-oversubscription", action="store_true",
+                        help="Also try combinations where workers x threads exceeds the CPU count")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    cpu_count = os.cpu_count() or 1
+    
+    print("=" * 70)
+    print("⚙️  INFERENCE AUTO-TUNER")
+    print("=" * 70)
+    print(f"\n🖥️  CPUs available: {cpu_count}")
+    
+    combinations = [
+        combo for combo in itertools.product(args.workers, args.threads, args.inter_op_threads, args.batch_sizes)
+        if args.allow_oversubscription or combo[0] * combo[1] <= cpu_count
+    ]
+    if not combinations:
+        print("\n❌ No configurations to try. Use --allow-oversubscription or smaller values.")
+        return
+    
+    print(f"   Configurations to try: {len(combinations)} ({args.duration:.0f}s each)\n")
+    print(f"   {'workers':>7} {'threads':>7} {'inter':>5} {'batch':>5} {'img/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    
+    results, failed = [], []
+    for workers, intra_op, inter_op, batch_size in combinations:
+        result = run_configuration(workers, intra_op, inter_op, batch_size, args.duration)
+        if result is None:
+            failed.append({"workers": workers, "intra_op_threads": intra_op,
+                           "inter_op_threads": inter_op, "batch_size": batch_size})
+            print(f"   {workers:>7} {intra_op:>7} {inter_op:>5} {batch_size:>5}    ❌ failed (worker crashed or timed out)")
+            continue
+        results.append(result)
+        print(f"   {workers:>7} {intra_op:>7} {inter_op:>5} {batch_size:>5} "
+              f"{result['images_per_sec']:>9.1f} {result['p50_batch_latency_ms']:>9.1f} "
+              f"{result['p95_batch_latency_ms']:>9.1f}")
+    
+    if not results:
+        print("\n❌ Every configuration failed")
+        return
+    
+    candidates = results
+    if args.max_p95_ms is not None:
+        candidates = [r for r in results if r["p95_batch_latency_ms"] <= args.max_p95_ms]
+        if not candidates:
+            print(f"\n⚠️  No configuration met the p95 budget of {args.max_p95_ms} ms; using the fastest overall")
+            candidates = results
+    
+    best = max(candidates, key=lambda r: r["images_per_sec"])
+    
+    with open(RESULTS_PATH, "w") as f:
+        json.dump({"cpu_count": cpu_count, "best": best, "results": results, "failed": failed}, f, indent=2)
+    write_best_configuration(best)
+    
+    print("\n" + "=" * 70)
+    print("🏆 BEST CONFIGURATION")
+    print("=" * 70)
+    print(f"   INFERENCE_WORKERS={best['workers']}")
+    print(f"   TF_INTRA_OP_THREADS={best['intra_op_threads']}")
+    print(f"   TF_INTER_OP_THREADS={best['inter_op_threads']}")
+    print(f"   INFERENCE_BATCH_SIZE={best['batch_size']}")
+    print(f"   Throughput: {best['images_per_sec']:.1f} images/sec")
+    print(f"\n💾 All results saved to '{RESULTS_PATH}'")
+    print(f"💾 Best configuration saved to '{ENV_OUTPUT_PATH}' (copy into .env to apply)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Augmentation Benchmark
+Compares augmented training images/sec of the ImageDataGenerator pipeline
+against the batched tf.data pipeline (augmentation.py)
+
+Two measurements per pipeline:
+  - end to end: read + decode + resize + augment, as model.fit sees it
+  - augment only: the same in-memory batch, so decoding is factored out
+
+Usage:
+    python benchmark_augmentation.py
+    python benchmark_augmentation.py --data path/to/dataset --batches 50
+"""
+
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+
+from augmentation import augment_batch
+from train_model import create_data_generators, create_datasets, DATASET_PATH, BATCH_SIZE, IMG_SIZE
+
+
+def images_per_second(next_batch, batches):
+    """Pull `batches` batches after one warm-up batch"""
+    next_batch()
+    images = 0
+    start = time.perf_counter()
+    for _ in range(batches):
+        images += len(next_batch()[0])
+    return images / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-image vs batched augmentation")
+    parser.add_argument("--data", default=DATASET_PATH, help="Folder with Benign/ and Malignant/ sub-folders")
+    parser.add_argument("--batches", type=int, default=30)
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("🎨 AUGMENTATION BENCHMARK")
+    print("=" * 70)
+    
+    train_gen, _ = create_data_generators(args.data)
+    train_ds, _ = create_datasets(args.data)
+    dataset_iterator = iter(train_ds.repeat())
+    
+    print("\n⏱️  End to end (decode + resize + augment)...")
+    generator_e2e = images_per_second(lambda: next(train_gen), args.batches)
+    batched_e2e = images_per_second(lambda: next(dataset_iterator), args.batches)
+    
+    print("⏱️  Augmentation only (same in-memory batch)...")
+    batch = np.random.rand(BATCH_SIZE, *IMG_SIZE, 3).astype(np.float32)
+    datagen = train_gen.image_data_generator
+    
+    def generator_augment():
+        # What ImageDataGenerator does per image: random_transform + standardize
+        return np.stack([datagen.standardize(datagen.random_transform(image)) for image in batch]), None
+    
+    augment = tf.function(augment_batch)
+    batch_tensor = tf.constant(batch)
+    generator_only = images_per_second(generator_augment, args.batches)
+    batched_only = images_per_second(lambda: (augment(batch_tensor).numpy(), None), args.batches)
+    
+    print("\n" + "=" * 70)
+    print(f"📊 RESULTS (batch size {BATCH_SIZE}, {args.batches} batches)")
+    print("=" * 70)
+    print(f"{'':<26} {'ImageDataGenerator':>20} {'Batched tf.data':>18} {'Speedup':>9}")
+    print(f"{'End to end (images/sec)':<26} {generator_e2e:>20.1f} {batched_e2e:>18.1f} "
+          f"{batched_e2e / generator_e2e:>8.1f}x")
+    print(f"{'Augment only (images/sec)':<26} {generator_only:>20.1f} {batched_only:>18.1f} "
+          f"{batched_only / generator_only:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
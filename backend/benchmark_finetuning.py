@@ -0,0 +1,178 @@
+"""
+Fine-Tuning Memory Benchmark
+Peak memory and step time of phase 2 of train_model.py (whole network
+trainable) for each micro-batch size, with and without activation
+recomputation
+
+Every setting reaches the same effective batch: gradients of
+effective / micro-batch batches are accumulated before each update, as
+with train_model.py --micro-batch-size M --accumulation-steps K. Each
+setting trains in its own process on synthetic images with random weights,
+so its peak resident memory (ru_maxrss) is not inflated by the settings
+before it. "training MB" is the growth of the peak over the process after
+the model was built, i.e. activations, gradients and optimizer state.
+
+Usage:
+    python benchmark_finetuning.py
+    python benchmark_finetuning.py --micro-batch-sizes 16 8 4 2 --effective-batch-size 32
+    python benchmark_finetuning.py --architecture mobilenet --memory-budget-mb 2048
+"""
+
+import sys
+import json
+import time
+import argparse
+import resource
+import multiprocessing as mp
+
+RESULTS_PATH = "finetuning_memory.json"
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def benchmark_setting(architecture, micro_batch_size, accumulation_steps, recompute, updates, result_queue):
+    """Run `updates` optimizer updates of phase 2 in this process"""
+    import tensorflow as tf
+    import train_model
+    
+    # Random weights: step time and memory do not depend on them, and nothing is downloaded
+    model, base_model = train_model.build_model(architecture, weights=None)
+    base_model.trainable = True
+    fit_model = model
+    if recompute:
+        from activation_recompute import with_recomputation
+        fit_model = with_recomputation(model)
+    fit_model.compile(
+        optimizer=train_model.make_optimizer(train_model.LEARNING_RATE / 10, accumulation_steps),
+        loss='binary_crossentropy',
+        metrics=['accuracy']
+    )
+    
+    images = tf.random.uniform((micro_batch_size, *train_model.IMG_SIZE, 3))
+    labels = tf.cast(tf.range(micro_batch_size)[:, None] % 2, tf.float32)
+    dataset = tf.data.Dataset.from_tensors((images, labels)).repeat()
+    model_mb = peak_rss_mb()
+    
+    # One update to build the graph, then the timed ones; the median ignores outliers
+    fit_model.fit(dataset, steps_per_epoch=accumulation_steps, epochs=1, verbose=0)
+    timings = []
+    for _ in range(updates):
+        start = time.perf_counter()
+        fit_model.fit(dataset, steps_per_epoch=accumulation_steps, epochs=1, verbose=0)
+        timings.append(time.perf_counter() - start)
+    update_seconds = sorted(timings)[len(timings) // 2]
+    
+    peak_mb = peak_rss_mb()
+    result_queue.put({
+        "micro_batch_size": micro_batch_size,
+        "accumulation_steps": accumulation_steps,
+        "effective_batch_size": micro_batch_size * accumulation_steps,
+        "recompute": recompute,
+        "peak_rss_mb": peak_mb,
+        "training_mb": peak_mb - model_mb,
+        "update_seconds": update_seconds,
+        "images_per_sec": micro_batch_size * accumulation_steps / update_seconds,
+    })
+
+
+def run_setting(architecture, micro_batch_size, accumulation_steps, recompute, updates):
+    """Benchmark one setting in a fresh process; None if it crashed (e.g. killed for running out of memory)"""
+    ctx = mp.get_context("spawn")
+    result_queue = ctx.Queue()
+    process = ctx.Process(target=benchmark_setting,
+                          args=(architecture, micro_batch_size, accumulation_steps, recompute, updates, result_queue))
+    process.start()
+    process.join()
+    return result_queue.get(timeout=10) if process.exitcode == 0 else None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure fine-tuning memory and speed per micro-batch size")
+    parser.add_argument("--architecture", choices=["efficientnet", "mobilenet"], default="efficientnet",
+                        help="Backbone to fine-tune")
+    parser.add_argument("--effective-batch-size", type=int, default=None,
+                        help="Images per optimizer update (default: BATCH_SIZE from train_model.py)")
+    parser.add_argument("--micro-batch-sizes", type=int, nargs="+", default=None,
+                        help="Micro-batch sizes to try; each must divide the effective batch "
+                             "(default: the effective batch, halved down to 2)")
+    parser.add_argument("--updates", type=int, default=5,
+                        help="Timed optimizer updates per setting (the median is reported)")
+    parser.add_argument("--skip-recompute", action="store_true", help="Only run without activation recomputation")
+    parser.add_argument("--memory-budget-mb", type=float, default=None,
+                        help="Recommend the fastest setting whose peak memory fits this budget")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    
+    from train_model import BATCH_SIZE, KERAS_3
+    if not KERAS_3:
+        print("❌ Gradient accumulation and activation recomputation need Keras 3 (TensorFlow >= 2.16)")
+        return
+    effective = args.effective_batch_size or BATCH_SIZE
+    micro_batch_sizes = args.micro_batch_sizes
+    if micro_batch_sizes is None:
+        micro_batch_sizes = []
+        size = effective
+        while size >= 2 and effective % size == 0:
+            micro_batch_sizes.append(size)
+            size //= 2
+    
+    print("=" * 70)
+    print("🧮 FINE-TUNING MEMORY BENCHMARK")
+    print("=" * 70)
+    print(f"\n   {args.architecture}, whole network trainable, effective batch {effective}, "
+          f"{args.updates} timed updates per setting\n")
+    print(f"   {'micro':>5} {'accum':>5} {'recompute':>9} {'peak MB':>9} {'training MB':>11} "
+          f"{'s/update':>9} {'img/s':>7}")
+    
+    results = []
+    for micro_batch_size in sorted(set(micro_batch_sizes), reverse=True):
+        if effective % micro_batch_size != 0:
+            print(f"   ⚠️  Skipping micro-batch {micro_batch_size}: does not divide the effective batch {effective}")
+            continue
+        accumulation_steps = effective // micro_batch_size
+        for recompute in ([False] if args.skip_recompute else [False, True]):
+            result = run_setting(args.architecture, micro_batch_size, accumulation_steps, recompute, args.updates)
+            if result is None:
+                print(f"   {micro_batch_size:>5} {accumulation_steps:>5} {'yes' if recompute else 'no':>9} "
+                      f"   ❌ failed (out of memory?)")
+                continue
+            results.append(result)
+            print(f"   {micro_batch_size:>5} {accumulation_steps:>5} {'yes' if recompute else 'no':>9} "
+                  f"{result['peak_rss_mb']:>9.0f} {result['training_mb']:>11.0f} "
+                  f"{result['update_seconds']:>9.2f} {result['images_per_sec']:>7.1f}")
+    
+    if not results:
+        print("\n❌ No setting completed")
+        return
+    
+    with open(RESULTS_PATH, "w") as f:
+        json.dump({"architecture": args.architecture, "effective_batch_size": effective, "results": results}, f, indent=2)
+    
+    if args.memory_budget_mb:
+        fitting = [r for r in results if r["peak_rss_mb"] <= args.memory_budget_mb]
+        print("\n" + "=" * 70)
+        print(f"🏆 FASTEST WITHIN {args.memory_budget_mb:.0f} MB")
+        print("=" * 70)
+        if not fitting:
+            print("   No setting fits; try smaller micro-batches or --recompute")
+        else:
+            best = max(fitting, key=lambda r: r["images_per_sec"])
+            print(f"   Micro-batch {best['micro_batch_size']} x {best['accumulation_steps']} steps"
+                  f"{' with recomputation' if best['recompute'] else ''}: "
+                  f"{best['peak_rss_mb']:.0f} MB peak, {best['images_per_sec']:.1f} images/sec")
+            print(f"\n💡 Train with: python train_model.py --micro-batch-size {best['micro_batch_size']} "
+                  f"--accumulation-steps {best['accumulation_steps']}" + (" --recompute" if best["recompute"] else ""))
+    
+    print(f"\n💾 All results saved to '{RESULTS_PATH}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Multi-Instance Inference Benchmark
+Compares one large TensorFlow instance using every core against several
+smaller instances, each pinned to its own block of cores
+
+Every configuration runs M processes in parallel, each loading its own model
+and running batches in a closed loop for the same duration:
+  - pinned:   each process is pinned to cores/M cores (os.sched_setaffinity)
+              with intra-op threads = cores/M, like run_model_server.py --pin-cores
+  - unpinned: same thread counts, but the scheduler moves processes freely
+The M=1 configuration is the single-large-instance baseline. Throughput is
+reported per core so configurations using different core counts compare.
+
+Usage:
+    python benchmark_instances.py
+    python benchmark_instances.py --instances 1 2 4 8 --batch-size 8 --duration 20
+    python benchmark_instances.py --instances 1 4 --cores-per-instance 4 --skip-unpinned
+"""
+
+import json
+import time
+import argparse
+import multiprocessing as mp
+
+from app.services.cpu_affinity import available_cores, partition_cores
+from autotune import WORKER_STARTUP_TIMEOUT_SECONDS, collect_results
+
+RESULTS_PATH = "benchmark_instances.json"
+
+
+def benchmark_instance(cores, pin, batch_size, duration, barrier, result_queue):
+    """Load the model in this process and run inference for `duration` seconds"""
+    from app.core.config import settings
+    from app.services.cpu_affinity import pin_current_process, size_thread_pools
+    
+    if pin:
+        pin_current_process(cores)
+    else:
+        size_thread_pools(len(cores))
+    
+    # Imported here so TensorFlow initializes after the affinity is set
+    import numpy as np
+    from app.services.model_service import ModelService
+    
+    model_service = ModelService()
+    model_service.load_model()
+    batch = np.random.randint(0, 256, (batch_size, *settings.IMAGE_SIZE, settings.IMAGE_CHANNELS), dtype=np.uint8)
+    
+    # Warm up so one-time graph building is not measured
+    for _ in range(3):
+        model_service.predict_batch(batch)
+    
+    # Start all instances together so they compete for memory bandwidth like real traffic
+    barrier.wait()
+    
+    latencies = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        call_start = time.perf_counter()
+        model_service.predict_batch(batch)
+        latencies.append(time.perf_counter() - call_start)
+    
+    result_queue.put({
+        "images": len(latencies) * batch_size,
+        "elapsed": time.perf_counter() - start,
+        "latencies": latencies,
+    })
+
+
+def run_configuration(core_blocks, pin, batch_size, duration):
+    """Run one process per core block and combine their throughput and latency (None if an instance failed)"""
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(len(core_blocks))
+    result_queue = ctx.Queue()
+    
+    processes = [
+        ctx.Process(target=benchmark_instance, args=(cores, pin, batch_size, duration, barrier, result_queue))
+        for cores in core_blocks
+    ]
+    for process in processes:
+        process.start()
+    # A crashed instance (out of memory, failed pinning) never reports; don't wait for it for ever
+    instance_results = collect_results(processes, result_queue, duration + WORKER_STARTUP_TIMEOUT_SECONDS)
+    if instance_results is None:
+        return None
+    
+    cores_used = sum(len(cores) for cores in core_blocks)
+    images_per_sec = sum(r["images"] / r["elapsed"] for r in instance_results)
+    latencies = sorted(latency for r in instance_results for latency in r["latencies"])
+    
+    return {
+        "instances": len(core_blocks),
+        "cores_per_instance": len(core_blocks[0]),
+        "pinned": pin,
+        "batch_size": batch_size,
+        "images_per_sec": images_per_sec,
+        "images_per_sec_per_core": images_per_sec / cores_used,
+        "p50_batch_latency_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_batch_latency_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+    }
+
+
+def parse_args():
+    cores = len(available_cores())
+    parser = argparse.ArgumentParser(description="Compare pinned inference instances against one large instance")
+    parser.add_argument("--instances", type=int, nargs="+",
+                        default=[m for m in (1, 2, 4, 8, 16) if m <= cores],
+                        help="Instance counts to try; 1 is the single-instance baseline")
+    parser.add_argument("--cores-per-instance", type=int, default=0,
+                        help="Cores per instance (0 = split all available cores evenly)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per model call")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds to benchmark each configuration")
+    parser.add_argument("--skip-unpinned", action="store_true", help="Only run the pinned configurations")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    
+    print("=" * 70)
+    print("🧩 MULTI-INSTANCE INFERENCE BENCHMARK")
+    print("=" * 70)
+    print(f"\n🖥️  Cores available: {len(available_cores())}")
+    print(f"   Batch size: {args.batch_size}, {args.duration:.0f}s per configuration\n")
+    print(f"   {'instances':>9} {'cores':>5} {'pinned':>6} {'img/s':>9} {'img/s/core':>10} "
+          f"{'speedup':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    
+    results, failed = [], []
+    baseline = None
+    for instances in sorted(set(args.instances)):
+        try:
+            core_blocks = partition_cores(instances, args.cores_per_instance)
+        except ValueError as e:
+            print(f"   ⚠️  Skipping {instances} instances: {str(e)}")
+            continue
+        
+        # A single instance cannot interfere with itself, so only its pinned run is needed
+        for pin in ([True] if args.skip_unpinned or instances == 1 else [True, False]):
+            result = run_configuration(core_blocks, pin, args.batch_size, args.duration)
+            if result is None:
+                failed.append({"instances": instances, "cores_per_instance": len(core_blocks[0]), "pinned": pin})
+                print(f"   {instances:>9} {len(core_blocks[0]):>5} {'yes' if pin else 'no':>6}    "
+                      f"❌ failed (instance crashed or timed out)")
+                continue
+            results.append(result)
+            if instances == 1:
+                baseline = result
+            speedup = result["images_per_sec"] / baseline["images_per_sec"] if baseline else float("nan")
+            print(f"   {instances:>9} {result['cores_per_instance']:>5} {'yes' if pin else 'no':>6} "
+                  f"{result['images_per_sec']:>9.1f} {result['images_per_sec_per_core']:>10.2f} "
+                  f"{speedup:>6.2f}x {result['p50_batch_latency_ms']:>8.1f} {result['p95_batch_latency_ms']:>8.1f}")
+    
+    if not results:
+        print("\n❌ No configuration " + ("completed" if failed else "fits the available cores"))
+        return
+    
+    best = max(results, key=lambda r: r["images_per_sec_per_core"])
+    with open(RESULTS_PATH, "w") as f:
+        json.dump({"cores": len(available_cores()), "best": best, "results": results, "failed": failed}, f, indent=2)
+    
+    print("\n" + "=" * 70)
+    print("🏆 BEST THROUGHPUT PER CORE")
+    print("=" * 70)
+    print(f"   {best['instances']} instance(s) x {best['cores_per_instance']} cores, "
+          f"{'pinned' if best['pinned'] else 'unpinned'}: {best['images_per_sec']:.1f} images/sec "
+          f"({best['images_per_sec_per_core']:.2f} per core)")
+    if best["pinned"] and best["instances"] > 1:
+        print(f"\n💡 Serve it with: python run_model_server.py --instances {best['instances']} --pin-cores"
+              + (f" --cores-per-instance {args.cores_per_instance}" if args.cores_per_instance else ""))
+    print(f"\n💾 All results saved to '{RESULTS_PATH}'")
+
+
+if __name__ == "__main__":
+    main()
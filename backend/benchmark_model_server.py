@@ -0,0 +1,127 @@
+"""
+Model Server Protocol Benchmark
+Measures what the shared-memory slot protocol adds on top of inference
+
+Three paths are timed per batch size:
+  - slots:   RemoteModelService against a model server in noop mode, i.e.
+             copy into shared memory, control message, server batching
+             thread, result read-back - everything except the model
+  - pickle:  the same tensors sent through a multiprocessing Pipe to an echo
+             process, the naive alternative the slot ring avoids
+  - model:   in-process ModelService.predict_batch, for scale
+
+Usage:
+    python benchmark_model_server.py
+    python benchmark_model_server.py --batch-sizes 1 8 32 --repeats 200
+    python benchmark_model_server.py --batch-timeout-ms 2   # include server-side batching wait
+"""
+
+import os
+import sys
+import time
+import secrets
+import argparse
+import subprocess
+import multiprocessing as mp
+import numpy as np
+
+from app.core.config import settings
+
+BENCHMARK_ADDRESS = "127.0.0.1:8799"
+
+
+def echo_worker(connection):
+    """Receive pickled tensors and send them straight back"""
+    while True:
+        try:
+            connection.send(connection.recv())
+        except EOFError:
+            return
+
+
+def time_call(fn, repeats):
+    """Median seconds per call after a short warm-up"""
+    for _ in range(5):
+        fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the model server slot protocol")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--batch-timeout-ms", type=float, default=0.0,
+                        help="Server batching wait; 0 isolates the protocol cost")
+    parser.add_argument("--skip-model", action="store_true", help="Do not time in-process inference")
+    args = parser.parse_args()
+    
+    from app.services.model_server import RemoteModelService
+    from app.services.model_service import ModelService
+    
+    print("=" * 70)
+    print("⏱️  MODEL SERVER PROTOCOL BENCHMARK")
+    print("=" * 70)
+    
+    # A separate interpreter, like a real deployment, so the server does not
+    # share this process's shared-memory resource tracker; a one-off key protects it
+    settings.MODEL_SERVER_AUTHKEY = secrets.token_hex(32)
+    server = subprocess.Popen(
+        [sys.executable, "run_model_server.py", "--noop", "--addresses", BENCHMARK_ADDRESS],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "MODEL_SERVER_BATCH_TIMEOUT_MS": str(args.batch_timeout_ms),
+             "MODEL_SERVER_AUTHKEY": settings.MODEL_SERVER_AUTHKEY},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    
+    ctx = mp.get_context("spawn")
+    parent_end, child_end = ctx.Pipe()
+    echo = ctx.Process(target=echo_worker, args=(child_end,), daemon=True)
+    echo.start()
+    
+    settings.MODEL_SERVER_SLOTS = max(args.batch_sizes)
+    remote = RemoteModelService(addresses=[BENCHMARK_ADDRESS])
+    remote.load_model()
+    print(f"✅ Connected to noop model server on {BENCHMARK_ADDRESS}")
+    
+    local = None
+    if not args.skip_model:
+        local = ModelService()
+        local.load_model()
+    
+    def pickle_round_trip(batch):
+        parent_end.send(batch)
+        parent_end.recv()
+    
+    print(f"\n{'Batch':>6} {'Slots (ms)':>11} {'Pickle (ms)':>12} {'Model (ms)':>11} {'Slots/image (µs)':>17}")
+    print("-" * 62)
+    
+    try:
+        for batch_size in args.batch_sizes:
+            batch = np.random.rand(batch_size, *settings.IMAGE_SIZE, settings.IMAGE_CHANNELS).astype(np.float32)
+            
+            slots = time_call(lambda: remote._run_model(batch), args.repeats)
+            pickled = time_call(lambda: pickle_round_trip(batch), args.repeats)
+            model = time_call(lambda: local.predict_batch(batch), max(args.repeats // 10, 5)) if local else None
+            
+            model_text = f"{model * 1000:>11.2f}" if model is not None else f"{'-':>11}"
+            print(f"{batch_size:>6} {slots * 1000:>11.3f} {pickled * 1000:>12.3f} {model_text} "
+                  f"{slots / batch_size * 1e6:>17.1f}")
+    finally:
+        remote.close()
+        parent_end.close()
+        server.terminate()
+        echo.terminate()
+    
+    if args.batch_timeout_ms:
+        print(f"\n💡 Slots time includes the {args.batch_timeout_ms} ms server batching wait "
+              "whenever a batch is not full.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Tiled Inference Benchmark
+Latency of /predict-tiled (TiledInference) as a function of image size,
+next to the standard single-view path
+
+Images are synthetic intraoral-like photos: a textured tissue region
+inside a dark border, so the background filter has something to skip.
+
+Usage:
+    python benchmark_tiled.py
+    python benchmark_tiled.py --sizes 1024 2048 4096 --repeats 5
+"""
+
+import io
+import time
+import argparse
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+
+DEFAULT_SIZES = [512, 1024, 2048, 3072, 4096]
+
+
+def synthetic_photo(size, seed=0):
+    """JPEG bytes of a size x size photo: noisy pink tissue in an elliptical field, dark outside"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.uniform(0, 1, (16, 16, 3)).astype(np.float32)
+    shading = np.asarray(Image.fromarray((coarse * 255).astype(np.uint8)).resize((size, size), Image.BICUBIC), np.float32)
+    tissue = np.array([200, 120, 120], np.float32) * 0.7 + shading * 0.3
+    image = tissue + rng.normal(0, 12, (size, size, 3))
+    
+    y, x = np.ogrid[:size, :size]
+    outside = ((x - size / 2) / (size * 0.5)) ** 2 + ((y - size / 2) / (size * 0.42)) ** 2 > 1
+    image[outside] = 8
+    
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def time_call(fn, repeats):
+    fn()
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return float(np.median(durations)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tiled inference latency against image size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Square image sides to test")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("🧩 TILED INFERENCE BENCHMARK")
+    print("=" * 70)
+    print(f"   Max side {settings.TILED_MAX_SIDE}, overlap {settings.TILE_OVERLAP}, "
+          f"budget {settings.TILE_BUDGET}, aggregation {settings.TILED_AGGREGATION}")
+    
+    from app.services.image_processor import ImageProcessor
+    from app.services.model_service import ModelService
+    from app.services.tiled_inference import TiledInference
+    
+    image_processor = ImageProcessor()
+    model_service = ModelService()
+    model_service.load_model()
+    image_processor.scale_pixels = not model_service.accepts_pixels
+    tiled_inference = TiledInference(image_processor, model_service)
+    
+    print(f"\n{'Size':>6} {'Tiles':>9} {'Single (ms)':>12} {'Tiled (ms)':>11} {'Tiling (ms)':>12} "
+          f"{'Model (ms)':>11} {'ms/tile':>8}")
+    for size in args.sizes:
+        contents = synthetic_photo(size)
+        
+        single_ms = time_call(
+            lambda: model_service.predict(image_processor.process_image(contents)), args.repeats
+        )
+        
+        tiled_ms = time_call(lambda: tiled_inference.predict(contents), args.repeats)
+        
+        stages = {}
+        result = tiled_inference.predict(contents, stages)
+        tiles = result["tiles"]
+        model_ms = stages.get("predict", 0.0)
+        tiling_ms = sum(ms for stage, ms in stages.items() if stage != "predict")
+        print(f"{size:>6} {tiles['evaluated']:>4}/{tiles['total']:<4} {single_ms:>12.1f} {tiled_ms:>11.1f} "
+              f"{tiling_ms:>12.1f} {model_ms:>11.1f} {model_ms / tiles['evaluated']:>8.2f}")
+    
+    print("\n   Tiling = decode, resize, background filter and tile cut; "
+          "Model = batched forward passes over the evaluated tiles")
+
+
+if __name__ == "__main__":
+    main()
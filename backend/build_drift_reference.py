@@ -0,0 +1,108 @@
+"""
+Drift Reference Builder
+Profiles the training images the way the drift monitor profiles live
+traffic and writes the reference that /admin/drift compares against
+
+The dataset is organized like the training data:
+    dataset/
+    ├── Benign/
+    │   └── ...
+    └── Malignant/
+        └── ...
+
+Every readable image is profiled; the API's quality gate is not applied.
+
+Usage:
+    python build_drift_reference.py --data path/to/dataset
+    python build_drift_reference.py --data path/to/dataset --output models/drift_reference.json
+"""
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+from app.core.config import settings
+from app.services.drift_monitor import DriftStats, ImageSummary
+from app.services.image_processor import ImageProcessor
+from app.services.model_service import ModelService
+from build_reference_index import find_reference_images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the drift monitor's training-set reference")
+    parser.add_argument("--data", required=True, help="Training dataset with one folder per class")
+    parser.add_argument("--output", default=settings.DRIFT_REFERENCE_PATH, help="Reference file to write")
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("📐 DRIFT REFERENCE BUILDER")
+    print("=" * 70)
+    
+    if not os.path.exists(args.data):
+        print(f"\n❌ Dataset directory not found: {args.data}")
+        return
+    
+    images = find_reference_images(args.data)
+    if not images:
+        print(f"\n❌ No images found under {args.data}")
+        return
+    print(f"\n📂 Found {len(images)} images")
+    
+    model_service = ModelService()
+    model_service.load_model()
+    image_processor = ImageProcessor()
+    image_processor.scale_pixels = not model_service.accepts_pixels
+    
+    stats = DriftStats()
+    batch, batch_sizes = [], []
+    skipped = 0
+    start = time.perf_counter()
+    
+    def flush():
+        predictions = model_service.predict_batch(np.concatenate(batch, axis=0))
+        for image_array, image_size, result in zip(batch, batch_sizes, predictions):
+            stats.update(ImageSummary(image_size, image_array, result))
+        batch.clear()
+        batch_sizes.clear()
+    
+    for relative_path, _ in images:
+        try:
+            with open(os.path.join(args.data, relative_path), "rb") as f:
+                contents = f.read()
+            batch.append(image_processor.process_image(contents))
+            batch_sizes.append(image_processor.read_size(contents))
+        except ValueError as e:
+            skipped += 1
+            print(f"   ⚠️  Skipping {relative_path}: {str(e)}")
+            continue
+        
+        if len(batch) == settings.INFERENCE_BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+    
+    if stats.images == 0:
+        print("\n❌ No images could be processed")
+        return
+    
+    reference = {
+        **stats.to_dict(),
+        "dataset": os.path.abspath(args.data),
+        "model_version": model_service.model_version,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(reference, f, indent=2)
+    
+    print(f"   Profiled {stats.images} images ({skipped} skipped) in {time.perf_counter() - start:.1f}s")
+    print(f"   Channel mean: {np.round(stats.mean, 4).tolist()}, std: {np.round(np.sqrt(stats.variance), 4).tolist()}")
+    print(f"   Predicted classes: {stats.class_counts}")
+    print(f"\n✅ Reference saved to: {args.output}")
+    print("\n🔄 Restart the backend server to load the new reference")
+
+
+if __name__ == "__main__":
+    main()
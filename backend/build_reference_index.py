@@ -0,0 +1,121 @@
+"""
+Reference Index Builder
+Embeds confirmed reference images with the served model and writes the
+index used by the /similar-cases endpoint
+
+Organize the reference images like the test dataset:
+    reference_data/
+    ├── Benign/
+    │   └── ...
+    └── Malignant/
+        └── ...
+
+Usage:
+    python build_reference_index.py
+    python build_reference_index.py --data reference_data --dtype int8 --ivf-lists 64
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+
+from app.core.config import settings
+from app.services.embedding_index import EmbeddingIndex
+from app.services.image_processor import ImageProcessor
+from app.services.model_service import ModelService
+
+
+def find_reference_images(data_path):
+    """Return (path relative to data_path, label) for every image under class folders"""
+    extensions = tuple(f".{ext}" for ext in settings.ALLOWED_EXTENSIONS)
+    references = []
+    
+    for label in sorted(os.listdir(data_path)):
+        label_path = os.path.join(data_path, label)
+        if not os.path.isdir(label_path):
+            continue
+        for root, _, filenames in os.walk(label_path):
+            for filename in sorted(filenames):
+                if filename.lower().endswith(extensions):
+                    full_path = os.path.join(root, filename)
+                    references.append((os.path.relpath(full_path, data_path), label))
+    
+    return references
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the similar-case reference index")
+    parser.add_argument("--data", default=settings.REFERENCE_DATA_PATH, help="Folder of labeled class folders")
+    parser.add_argument("--output", default=settings.REFERENCE_INDEX_PATH, help="Index file to write")
+    parser.add_argument("--dtype", default=settings.INDEX_DTYPE, choices=["float16", "int8"])
+    parser.add_argument("--ivf-lists", type=int, default=settings.INDEX_IVF_LISTS,
+                        help="IVF partitions (0 = brute force only)")
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("🗂️  REFERENCE INDEX BUILDER")
+    print("=" * 70)
+    
+    if not os.path.exists(args.data):
+        print(f"\n❌ Reference data directory not found: {args.data}")
+        print("   Create one folder per confirmed label and put the reference images inside.")
+        return
+    
+    references = find_reference_images(args.data)
+    if not references:
+        print(f"\n❌ No images found under {args.data}")
+        return
+    print(f"\n📂 Found {len(references)} reference images")
+    
+    model_service = ModelService()
+    model_service.load_model()
+    if model_service.embedding_dim is None:
+        print("\n❌ The loaded model has no pooled embedding layer")
+        return
+    
+    image_processor = ImageProcessor()
+    embeddings, labels, paths = [], [], []
+    batch, batch_refs = [], []
+    start = time.perf_counter()
+    
+    def flush():
+        _, batch_embeddings = model_service.predict_with_embeddings(np.concatenate(batch, axis=0))
+        embeddings.append(batch_embeddings)
+        labels.extend(label for _, label in batch_refs)
+        paths.extend(path for path, _ in batch_refs)
+        batch.clear()
+        batch_refs.clear()
+    
+    for relative_path, label in references:
+        try:
+            with open(os.path.join(args.data, relative_path), "rb") as f:
+                batch.append(image_processor.process_image(f.read()))
+            batch_refs.append((relative_path, label))
+        except ValueError as e:
+            print(f"   ⚠️  Skipping {relative_path}: {str(e)}")
+            continue
+        
+        if len(batch) == settings.INFERENCE_BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+    
+    if not embeddings:
+        print("\n❌ No reference images could be processed")
+        return
+    
+    print(f"   Embedded {len(paths)} images in {time.perf_counter() - start:.1f}s")
+    
+    index = EmbeddingIndex(dtype=args.dtype, ivf_lists=args.ivf_lists)
+    index.build(np.concatenate(embeddings, axis=0), labels, paths)
+    index.save(args.output)
+    
+    print(f"\n✅ Index saved to: {args.output}")
+    print(f"   Vectors: {len(index)} x {model_service.embedding_dim} ({args.dtype})")
+    print(f"   Index size in memory: {index.vectors.nbytes / 1024:.1f} KB")
+    print("\n🔄 Restart the backend server to load the new index")
+
+
+if __name__ == "__main__":
+    main()
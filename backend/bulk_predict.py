@@ -0,0 +1,302 @@
+"""
+Bulk Inference
+Classifies every image under a directory tree for retrospective studies,
+without the HTTP API and without needing class folders
+
+Four stages run concurrently with bounded queues between them (the same
+pipeline executor as /batch-predict):
+  1. read    - threads read the image files
+  2. decode  - a process pool decodes, checks and resizes images
+               (with --quality-gate it also rejects unusable photos like the API)
+  3. infer   - preprocessed images are batched through the model
+  4. write   - results are appended to a CSV file or Parquet part files
+
+Everything already in the output is skipped, so an interrupted run can be
+restarted with the same command and continues where it stopped.
+
+Usage:
+    python bulk_predict.py /data/archive
+    python bulk_predict.py /data/archive --output predictions.csv --workers 8 --batch-size 64 --readers 4
+    python bulk_predict.py /data/archive --format parquet --output predictions_parquet
+"""
+
+import os
+import csv
+import glob
+import time
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from app.core.config import settings
+from app.services.pipeline import Pipeline, Stage
+
+# Defaults
+DEFAULT_OUTPUT_CSV = "bulk_predictions.csv"
+DEFAULT_OUTPUT_PARQUET = "bulk_predictions_parquet"
+ROWS_PER_PARQUET_PART = 1000
+PROGRESS_EVERY = 500
+
+# Set in each decode worker by init_decode_worker
+_image_processor = None
+_quality_gate = False
+
+
+def find_images(root):
+    """Every image under root, as sorted paths relative to root"""
+    extensions = tuple(f".{ext}" for ext in settings.ALLOWED_EXTENSIONS)
+    paths = []
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(extensions):
+                paths.append(os.path.relpath(os.path.join(directory, filename), root))
+    return paths
+
+
+def init_decode_worker(quality_gate=False):
+    global _image_processor, _quality_gate
+    from app.services.image_processor import ImageProcessor
+    _image_processor = ImageProcessor()
+    _quality_gate = quality_gate
+
+
+def decode_image(image_data):
+    """Decode one image in a worker: returns (uint8 pixels or None, error)"""
+    # Errors travel back as text; ImageQualityError does not survive pickling
+    try:
+        return _image_processor.decode_pixels(image_data, quality_gate=_quality_gate), None
+    except Exception as e:
+        return None, str(e)
+
+
+class CsvWriter:
+    """Appends result rows to one CSV file, flushed after every batch"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.writer = None
+    
+    def completed_paths(self):
+        """Paths already in the file; a line cut off by an interrupted run is dropped"""
+        if not os.path.exists(self.path):
+            return set()
+        
+        with open(self.path, "rb+") as f:
+            content = f.read()
+            end = content.rfind(b"\n") + 1
+            if end < len(content):
+                f.truncate(end)
+        
+        with open(self.path, newline="") as f:
+            return {row["path"] for row in csv.DictReader(f)}
+    
+    def write(self, rows, columns):
+        if self.writer is None:
+            is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            if not is_new:
+                with open(self.path, newline="") as f:
+                    columns = next(csv.reader(f))
+            self.file = open(self.path, "a", newline="")
+            self.writer = csv.DictWriter(self.file, fieldnames=columns, extrasaction="ignore")
+            if is_new:
+                self.writer.writeheader()
+        self.writer.writerows(rows)
+        self.file.flush()
+    
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class ParquetWriter:
+    """Writes result rows as numbered Parquet part files of ROWS_PER_PARQUET_PART rows"""
+    
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow: pip install pyarrow")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.pending = []
+        self.columns = None
+        os.makedirs(path, exist_ok=True)
+        self.next_part = len(glob.glob(os.path.join(path, "part-*.parquet")))
+    
+    def completed_paths(self):
+        paths = set()
+        for part in glob.glob(os.path.join(self.path, "part-*.parquet")):
+            paths.update(self.pq.read_table(part, columns=["path"]).column("path").to_pylist())
+        return paths
+    
+    def write(self, rows, columns):
+        self.columns = columns
+        self.pending.extend(rows)
+        if len(self.pending) >= ROWS_PER_PARQUET_PART:
+            self._write_part()
+    
+    def _write_part(self):
+        table = self.pa.table({column: [row.get(column) for row in self.pending] for column in self.columns})
+        part_path = os.path.join(self.path, f"part-{self.next_part:05d}.parquet")
+        # Write then rename so a crash never leaves a half-written part behind
+        self.pq.write_table(table, part_path + ".tmp")
+        os.replace(part_path + ".tmp", part_path)
+        self.next_part += 1
+        self.pending = []
+    
+    def close(self):
+        if self.pending:
+            self._write_part()
+
+
+def result_columns(class_names):
+    return ["path", "prediction", "confidence"] + [f"prob_{name}" for name in class_names] + ["error"]
+
+
+def to_row(relative_path, result):
+    row = {"path": relative_path, "prediction": result["prediction"], "confidence": result["confidence"]}
+    row.update({f"prob_{name}": probability for name, probability in result["probabilities"].items()})
+    return row
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Classify every image under a directory tree")
+    parser.add_argument("input", help="Root directory to scan recursively")
+    parser.add_argument("--output", default=None, help="CSV file or Parquet directory")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--model", default=settings.MODEL_PATH, help="Model file to load")
+    parser.add_argument("--workers", type=int, default=max((os.cpu_count() or 2) - 1, 1),
+                        help="Decode processes")
+    parser.add_argument("--readers", type=int, default=2, help="File reading threads")
+    parser.add_argument("--batch-size", type=int, default=32, help="Images per model call")
+    parser.add_argument("--batch-wait-ms", type=float, default=100.0,
+                        help="Max wait for a full batch before a partial one goes to the model")
+    parser.add_argument("--queue-size", type=int, default=128,
+                        help="Max images waiting between two stages")
+    parser.add_argument("--quality-gate", action="store_true",
+                        help="Reject blurry, dark or overexposed photos like the API does; they are "
+                             "written as error rows and not retried on resume")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    output = args.output or (DEFAULT_OUTPUT_PARQUET if args.format == "parquet" else DEFAULT_OUTPUT_CSV)
+    
+    print("=" * 70)
+    print("📦 BULK INFERENCE")
+    print("=" * 70)
+    
+    if not os.path.isdir(args.input):
+        print(f"\n❌ Input directory not found: {args.input}")
+        return
+    
+    try:
+        writer = ParquetWriter(output) if args.format == "parquet" else CsvWriter(output)
+    except RuntimeError as e:
+        print(f"\n❌ {str(e)}")
+        return
+    
+    all_paths = find_images(args.input)
+    completed = writer.completed_paths()
+    todo = [path for path in all_paths if path not in completed]
+    print(f"\n📂 Found {len(all_paths)} images, {len(completed)} already done, {len(todo)} to process")
+    if not todo:
+        print("✅ Nothing to do")
+        return
+    
+    from app.services.model_service import ModelService
+    # The default model may be served from its exported graph (export_serving_model.py)
+    model_service = ModelService(model_path=None if args.model == settings.MODEL_PATH else args.model)
+    model_service.load_model()
+    
+    columns = None
+    write_lock = threading.Lock()
+    failed = []
+    processed = 0
+    undecodable = 0
+    
+    def read(relative_path):
+        with open(os.path.join(args.input, relative_path), "rb") as f:
+            return relative_path, f.read()
+    
+    def decode(read_result):
+        # Each decode thread keeps one image in flight in the process pool
+        relative_path, image_data = read_result
+        pixels, error = pool.submit(decode_image, image_data).result()
+        return relative_path, pixels, error
+    
+    def infer(decoded):
+        valid = [(relative_path, pixels) for relative_path, pixels, error in decoded if error is None]
+        results = {}
+        if valid:
+            # uint8 pixels; the model service applies the [0, 1] scaling
+            images = np.stack([pixels for _, pixels in valid])
+            results = dict(zip((relative_path for relative_path, _ in valid), model_service.predict_batch(images)))
+        return [(relative_path, results.get(relative_path), error) for relative_path, _, error in decoded]
+    
+    def write(inferred):
+        nonlocal columns, undecodable
+        if columns is None:
+            class_names = next((result["probabilities"].keys() for _, result, _ in inferred if result is not None),
+                               settings.CLASS_NAMES)
+            columns = result_columns(class_names)
+        rows = [
+            to_row(relative_path, result) if result is not None else {"path": relative_path, "error": error}
+            for relative_path, result, error in inferred
+        ]
+        with write_lock:
+            writer.write(rows, columns)
+            undecodable += sum(result is None for _, result, _ in inferred)
+        return inferred
+    
+    def track(item):
+        # Files that could not be read or a failed model call are not written, so a rerun retries them
+        nonlocal processed
+        processed += 1
+        if item.error is not None:
+            failed.append((todo[item.index], str(item.error)))
+        if processed % PROGRESS_EVERY == 0:
+            elapsed = time.perf_counter() - start
+            print(f"   ⏳ {processed}/{len(todo)} images ({processed / elapsed:.1f} images/sec)")
+    
+    pipeline = Pipeline([
+        Stage("read", read, workers=args.readers),
+        Stage("decode", decode, workers=args.workers),
+        Stage("infer", infer, batch_size=args.batch_size, max_wait_ms=args.batch_wait_ms),
+        Stage("write", write, batch_size=args.batch_size, max_wait_ms=args.batch_wait_ms),
+    ], queue_size=args.queue_size)
+    
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_decode_worker,
+                             initargs=(args.quality_gate,)) as pool:
+        report = pipeline.run(todo, sink=track)
+    writer.close()
+    
+    print("\n" + "=" * 70)
+    print("📊 STAGE UTILIZATION")
+    print("=" * 70)
+    print(f"   {'stage':<7} {'workers':>7} {'images':>8} {'busy':>9} {'starved':>9} {'blocked':>9} {'utilization':>12}")
+    for stage, stage_stats in report["stages"].items():
+        print(f"   {stage:<7} {stage_stats['workers']:>7} {stage_stats['items']:>8} "
+              f"{stage_stats['busy_ms'] / 1000:>8.1f}s {stage_stats['starved_ms'] / 1000:>8.1f}s "
+              f"{stage_stats['blocked_ms'] / 1000:>8.1f}s {stage_stats['utilization']:>12.1%}")
+    print(f"   {'overall':<7} {'':>7} {report['items']:>8} {report['wall_ms'] / 1000:>8.1f}s wall   "
+          f"{report['items_per_sec']:.1f} images/sec")
+    print(f"   Bottleneck: {report['bottleneck']}")
+    
+    if undecodable:
+        print(f"\n⚠️  {undecodable} images could not be decoded (see the error column)")
+    if failed:
+        print(f"\n⚠️  {len(failed)} images failed and were not written, rerun to retry them. First error:")
+        print(f"   {failed[0][0]}: {failed[0][1]}")
+    print(f"\n✅ Results written to: {output}")
+
+
+if __name__ == "__main__":
+    main()
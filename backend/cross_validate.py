@@ -0,0 +1,196 @@
+"""
+K-Fold Cross-Validation
+Estimates how much the validation metrics move between data splits instead
+of trusting the single 80/20 split of train_model.py
+
+The backbone runs over the dataset once (see feature_cache.py); each fold
+then trains only the classification head on the cached features, in
+parallel worker processes. The numbers therefore describe the
+frozen-backbone model (training phase 1), and a full run takes minutes on
+CPU instead of K full trainings.
+
+Usage:
+    python cross_validate.py
+    python cross_validate.py --data path/to/dataset --folds 10 --workers 4
+"""
+
+import os
+import json
+import time
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Output file
+RESULTS_PATH = "cv_results.json"
+
+# Metrics from evaluate_model.compute_metrics that are summarized across folds
+METRIC_NAMES = ["accuracy", "precision", "sensitivity", "specificity", "f1_score"]
+HEAD_EPOCHS = 100
+EARLY_STOPPING_PATIENCE = 10
+
+# Set in each worker by init_worker
+_features = None
+_labels = None
+
+
+def init_worker(features, labels, threads):
+    """Receive the cached features once per worker and size its TensorFlow thread pool"""
+    global _features, _labels
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    _features, _labels = features, labels
+
+
+def early_stopping_split(indices, labels, seed):
+    """Hold out 10% of a training fold to decide when to stop"""
+    from sklearn.model_selection import train_test_split
+    try:
+        return train_test_split(indices, test_size=0.1, stratify=labels[indices], random_state=seed)
+    except ValueError:
+        # Too few images of a class to stratify
+        return train_test_split(indices, test_size=0.1, random_state=seed)
+
+
+def train_head(train_idx, eval_idx, seed, learning_rate=None, batch_size=None, dropout_rate=None,
+               dense_units=None, epochs=HEAD_EPOCHS):
+    """
+    Train a fresh head on cached features and score it on eval_idx
+    
+    Hyperparameters left as None use train_model's values.
+    
+    Returns:
+        Tuple of (metrics dict, epochs trained, validation loss on eval_idx)
+    """
+    import tensorflow as tf
+    from tensorflow.keras.layers import Input
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.optimizers import Adam
+    from tensorflow.keras.callbacks import EarlyStopping
+    from train_model import build_head, LEARNING_RATE, BATCH_SIZE
+    from evaluate_model import compute_metrics
+    
+    tf.keras.utils.set_random_seed(seed)
+    inputs = Input(shape=(_features.shape[1],))
+    model = Model(inputs, build_head(inputs, dropout_rate=dropout_rate, dense_units=dense_units))
+    model.compile(
+        optimizer=Adam(learning_rate=learning_rate or LEARNING_RATE),
+        loss='binary_crossentropy',
+        metrics=['accuracy']
+    )
+    
+    fit_idx, stop_idx = early_stopping_split(train_idx, _labels, seed)
+    history = model.fit(
+        _features[fit_idx], _labels[fit_idx],
+        validation_data=(_features[stop_idx], _labels[stop_idx]),
+        epochs=epochs,
+        batch_size=batch_size or BATCH_SIZE,
+        callbacks=[EarlyStopping(monitor='val_loss', patience=EARLY_STOPPING_PATIENCE, restore_best_weights=True)],
+        verbose=0
+    )
+    
+    probabilities = model.predict(_features[eval_idx], batch_size=256, verbose=0).reshape(-1)
+    metrics = compute_metrics(_labels[eval_idx], (probabilities > 0.5).astype(int))
+    eval_loss = float(tf.keras.losses.binary_crossentropy(_labels[eval_idx].astype(np.float32), probabilities))
+    
+    return {name: float(metrics[name]) for name in METRIC_NAMES}, len(history.history["loss"]), eval_loss
+
+
+def run_fold(fold, train_idx, test_idx, seed):
+    start = time.perf_counter()
+    metrics, epochs, _ = train_head(train_idx, test_idx, seed + fold)
+    return {
+        "fold": fold,
+        "train_size": len(train_idx),
+        "test_size": len(test_idx),
+        "epochs": epochs,
+        "seconds": round(time.perf_counter() - start, 2),
+        **metrics
+    }
+
+
+def parse_args():
+    from train_model import DATASET_PATH
+    parser = argparse.ArgumentParser(description="K-fold cross-validation of the classification head")
+    parser.add_argument("--data", default=DATASET_PATH, help="Folder with Benign/ and Malignant/ sub-folders")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="Parallel folds (default: min(folds, CPUs))")
+    parser.add_argument("--architecture", default="efficientnet", choices=["efficientnet", "mobilenet"])
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    
+    print("=" * 70)
+    print("🔁 K-FOLD CROSS-VALIDATION")
+    print("=" * 70)
+    
+    if not os.path.exists(args.data):
+        print(f"\n❌ Dataset not found: {args.data}")
+        return
+    
+    from sklearn.model_selection import StratifiedKFold
+    from feature_cache import load_features
+    
+    features, labels, _ = load_features(args.data, args.architecture)
+    if np.bincount(labels).min() < args.folds:
+        print(f"\n❌ Every class needs at least {args.folds} images for {args.folds}-fold cross-validation")
+        return
+    
+    workers = args.workers or min(args.folds, os.cpu_count() or 1)
+    threads = max((os.cpu_count() or 1) // workers, 1)
+    print(f"\n🧮 {args.folds} folds over {len(labels)} images, {workers} workers x {threads} threads")
+    
+    splits = StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=args.seed).split(features, labels)
+    
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(features, labels, threads)
+    ) as pool:
+        futures = [pool.submit(run_fold, fold, train_idx, test_idx, args.seed)
+                   for fold, (train_idx, test_idx) in enumerate(splits, start=1)]
+        results = []
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            print(f"   ✅ Fold {result['fold']}: accuracy {result['accuracy']:.1%}, "
+                  f"sensitivity {result['sensitivity']:.1%} ({result['epochs']} epochs, {result['seconds']}s)")
+    elapsed = time.perf_counter() - start
+    
+    summary = {}
+    print("\n" + "=" * 70)
+    print(f"📊 RESULTS ({args.folds} folds, {elapsed:.1f}s)")
+    print("=" * 70)
+    for name in METRIC_NAMES:
+        values = np.array([result[name] for result in results])
+        summary[name] = {
+            "mean": float(values.mean()),
+            "std": float(values.std(ddof=1)),
+            "variance": float(values.var(ddof=1)),
+            "min": float(values.min()),
+            "max": float(values.max()),
+        }
+        print(f"   {name:<12} {values.mean():6.1%} ± {values.std(ddof=1):5.1%}   "
+              f"(min {values.min():.1%}, max {values.max():.1%})")
+    
+    with open(RESULTS_PATH, "w") as f:
+        json.dump({
+            "dataset": args.data,
+            "architecture": args.architecture,
+            "folds": args.folds,
+            "seed": args.seed,
+            "summary": summary,
+            "per_fold": results
+        }, f, indent=2)
+    print(f"\n💾 Per-fold results saved to '{RESULTS_PATH}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Multi-Worker CPU Training
+Data-parallel training across several local processes, used by
+train_model.py --workers N and --scaling-report
+
+Every worker is a separate train_model.py process with its own TF_CONFIG
+entry on localhost. MultiWorkerMirroredStrategy keeps one copy of the
+weights per worker and all-reduces the gradients after every step, so all
+copies stay identical and each step trains on workers x BATCH_SIZE images.
+Each worker is pinned to its own block of cores (when there are enough)
+and reads only its shard of the training and validation files.
+
+Keras 3's model.fit cannot run under MultiWorkerMirroredStrategy (its
+metric reduction fails across workers), so fit_distributed runs the steps
+itself and drives the same Keras callbacks model.fit would. Validation
+sums are all-reduced once per epoch, so every worker sees the same
+val_loss and the callbacks take the same decisions everywhere.
+
+Usage:
+    python train_model.py --workers 4
+    python train_model.py --scaling-report --scaling-workers 1 2 4
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import subprocess
+
+# Output of non-chief workers (the chief prints to the console)
+WORKER_LOG_DIR = os.path.join("logs", "train_workers")
+
+
+def free_ports(count):
+    """Ports the OS reports as free right now"""
+    sockets = [socket.socket() for _ in range(count)]
+    try:
+        for s in sockets:
+            s.bind(("localhost", 0))
+        return [s.getsockname()[1] for s in sockets]
+    finally:
+        for s in sockets:
+            s.close()
+
+
+def launch_workers(script, script_args, num_workers):
+    """
+    Run script in num_workers processes forming one localhost cluster
+    
+    Args:
+        script: Python file every worker runs
+        script_args: Its command-line arguments; --worker-index is appended
+        num_workers: Cluster size
+    
+    Returns:
+        0 if every worker succeeded, otherwise the first failing exit code
+    """
+    cluster = {"worker": [f"localhost:{port}" for port in free_ports(num_workers)]}
+    os.makedirs(WORKER_LOG_DIR, exist_ok=True)
+    
+    processes, logs = [], []
+    for index in range(num_workers):
+        env = dict(os.environ, TF_CONFIG=json.dumps({"cluster": cluster, "task": {"type": "worker", "index": index}}))
+        command = [sys.executable, script, *script_args, "--worker-index", str(index)]
+        if index == 0:
+            processes.append(subprocess.Popen(command, env=env))
+            continue
+        log = open(os.path.join(WORKER_LOG_DIR, f"worker_{index}.log"), "w")
+        logs.append(log)
+        processes.append(subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT))
+    
+    # One failed worker blocks the others in the next all-reduce, so stop them all
+    exit_code = 0
+    try:
+        while any(process.poll() is None for process in processes):
+            failed = [process for process in processes if process.poll() not in (None, 0)]
+            if failed:
+                exit_code = failed[0].returncode
+                for process in processes:
+                    if process.poll() is None:
+                        process.terminate()
+            time.sleep(0.5)
+        exit_code = exit_code or next((p.returncode for p in processes if p.returncode != 0), 0)
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        exit_code = 1
+    finally:
+        for process in processes:
+            process.wait()
+        for log in logs:
+            log.close()
+    
+    if exit_code != 0:
+        print(f"\n❌ A training worker failed (exit code {exit_code}), see {WORKER_LOG_DIR}/")
+    return exit_code
+
+
+def worker_context():
+    """(worker index, number of workers) from TF_CONFIG"""
+    config = json.loads(os.environ["TF_CONFIG"])
+    return config["task"]["index"], len(config["cluster"]["worker"])
+
+
+def create_strategy():
+    """
+    Pin this worker to its share of the cores and join the cluster
+    
+    Must run before TensorFlow executes its first op: both the thread pool
+    sizes and the collective ops are fixed when the runtime starts.
+    """
+    import tensorflow as tf
+    from app.services.cpu_affinity import available_cores, partition_cores, pin_current_process
+    
+    index, num_workers = worker_context()
+    try:
+        cores = partition_cores(num_workers)[index]
+        pin_current_process(cores)
+        threads = len(cores)
+    except ValueError:
+        # Fewer cores than workers: share them unpinned, one thread each
+        threads = max(len(available_cores()) // num_workers, 1)
+    
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    return tf.distribute.MultiWorkerMirroredStrategy(
+        communication_options=tf.distribute.experimental.CommunicationOptions(
+            implementation=tf.distribute.experimental.CommunicationImplementation.RING
+        )
+    )
+
+
+def batch_sums(labels, outputs):
+    """Summed binary cross-entropy, correct predictions and count of one batch"""
+    import tensorflow as tf
+    
+    per_example = tf.keras.losses.binary_crossentropy(labels[:, None], outputs)
+    predicted = tf.cast(outputs[:, 0] > 0.5, labels.dtype)
+    correct = tf.reduce_sum(tf.cast(tf.equal(predicted, labels), tf.float32))
+    return per_example, tf.stack([tf.reduce_sum(per_example), correct, tf.cast(tf.size(labels), tf.float32)])
+
+
+class DistributedSteps:
+    """Compiled train and evaluation steps of one model under a MultiWorkerMirroredStrategy"""
+    
+    def __init__(self, strategy, model, global_batch_size):
+        import tensorflow as tf
+        
+        self.strategy = strategy
+        self.model = model
+        self.global_batch_size = global_batch_size
+        
+        # Optimizer slots are created up front, not lazily inside a replica
+        with strategy.scope():
+            model.optimizer.build(model.trainable_variables)
+        
+        def replica_step(images, labels):
+            with tf.GradientTape() as tape:
+                outputs = model(images, training=True)
+                per_example, sums = batch_sums(labels, outputs)
+                # Mean over the global batch: the optimizer all-reduces gradients by summing
+                loss = tf.nn.compute_average_loss(per_example, global_batch_size=global_batch_size)
+                if model.losses:
+                    loss += tf.nn.scale_regularization_loss(tf.add_n(model.losses))
+            gradients = tape.gradient(loss, model.trainable_variables)
+            model.optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+            return sums
+        
+        @tf.function
+        def train_step(iterator):
+            images, labels = next(iterator)
+            return strategy.experimental_local_results(strategy.run(replica_step, args=(images, labels)))[0]
+        
+        @tf.function
+        def evaluate_step(images, labels):
+            return batch_sums(labels, model(images, training=False))[1]
+        
+        @tf.function
+        def all_reduce(values):
+            return strategy.reduce("SUM", strategy.run(lambda v: tf.identity(v), args=(values,)), axis=None)
+        
+        self.train_step = train_step
+        self.evaluate_step = evaluate_step
+        self.all_reduce = all_reduce
+    
+    def evaluate(self, dataset):
+        """Loss and accuracy over every worker's shard of dataset"""
+        import tensorflow as tf
+        
+        sums = tf.zeros(3)
+        for images, labels in dataset:
+            sums += self.evaluate_step(images, labels)
+        loss_sum, correct, count = self.all_reduce(sums).numpy()
+        return loss_sum / max(count, 1.0), correct / max(count, 1.0)
+
+
+def fit_distributed(strategy, model, train_dataset_fn, val_dataset, global_batch_size, epochs,
+                    steps_per_epoch, callbacks, initial_epoch=0, verbose=True):
+    """
+    Train like model.fit(train, epochs, validation_data=val, callbacks) on every worker of the cluster
+    
+    Args:
+        strategy: MultiWorkerMirroredStrategy from create_strategy
+        model: Model compiled inside strategy.scope()
+        train_dataset_fn: Returns this worker's repeated, batched training shard
+        val_dataset: This worker's batched validation shard
+        global_batch_size: Images per step across all workers
+        epochs: Index of the last epoch, as in model.fit
+        steps_per_epoch: Training steps per epoch (identical on every worker)
+        callbacks: Keras callbacks; all of them see the same logs on every worker
+        initial_epoch: Epoch to start at
+        verbose: Print one line per epoch
+    
+    Returns:
+        History callback with the per-epoch logs
+    """
+    import tensorflow as tf
+    
+    steps = DistributedSteps(strategy, model, global_batch_size)
+    iterator = iter(strategy.distribute_datasets_from_function(lambda context: train_dataset_fn()))
+    
+    history = tf.keras.callbacks.History()
+    callback_list = tf.keras.callbacks.CallbackList(list(callbacks) + [history], model=model)
+    model.stop_training = False
+    callback_list.on_train_begin()
+    
+    for epoch in range(initial_epoch, epochs):
+        callback_list.on_epoch_begin(epoch)
+        start = time.perf_counter()
+        sums = tf.zeros(3)
+        for _ in range(steps_per_epoch):
+            sums += steps.train_step(iterator)
+        elapsed = time.perf_counter() - start
+        
+        loss_sum, correct, count = steps.all_reduce(sums).numpy()
+        val_loss, val_accuracy = steps.evaluate(val_dataset)
+        logs = {
+            "loss": float(loss_sum / count),
+            "accuracy": float(correct / count),
+            "val_loss": float(val_loss),
+            "val_accuracy": float(val_accuracy),
+            "images_per_sec": steps_per_epoch * global_batch_size / elapsed,
+        }
+        if verbose:
+            print(f"Epoch {epoch + 1}/{epochs} - {elapsed:.0f}s - loss: {logs['loss']:.4f} - "
+                  f"accuracy: {logs['accuracy']:.4f} - val_loss: {logs['val_loss']:.4f} - "
+                  f"val_accuracy: {logs['val_accuracy']:.4f} - {logs['images_per_sec']:.1f} images/sec", flush=True)
+        
+        callback_list.on_epoch_end(epoch, logs)
+        if model.stop_training:
+            break
+    
+    callback_list.on_train_end()
+    return history
+
+
+def evaluate_distributed(strategy, model, val_dataset, global_batch_size):
+    """Validation loss and accuracy over all workers' shards"""
+    return DistributedSteps(strategy, model, global_batch_size).evaluate(val_dataset)
+
+
+def benchmark_throughput(strategy, model, per_worker_batch_size, steps, warmup_steps=3):
+    """Training images per second across the cluster, on synthetic images"""
+    import tensorflow as tf
+    
+    _, num_workers = worker_context()
+    global_batch_size = per_worker_batch_size * num_workers
+    image_shape = tuple(model.input_shape[1:])
+    
+    def dataset_fn(context):
+        images = tf.random.uniform((per_worker_batch_size, *image_shape))
+        labels = tf.cast(tf.range(per_worker_batch_size) % 2, tf.float32)
+        return tf.data.Dataset.from_tensors((images, labels)).repeat()
+    
+    distributed_steps = DistributedSteps(strategy, model, global_batch_size)
+    iterator = iter(strategy.distribute_datasets_from_function(dataset_fn))
+    for _ in range(warmup_steps):
+        distributed_steps.train_step(iterator).numpy()
+    
+    start = time.perf_counter()
+    for _ in range(steps):
+        sums = distributed_steps.train_step(iterator)
+    sums.numpy()
+    return steps * global_batch_size / (time.perf_counter() - start)
+
+
+def print_scaling_report(results, output_path):
+    """Throughput per worker count, relative to one worker"""
+    baseline = next((r["images_per_sec"] for r in results if r["workers"] == 1), None)
+    print("\n" + "=" * 60)
+    print("📊 TRAINING SCALING REPORT")
+    print("=" * 60)
+    print(f"   {'workers':>7} {'images/sec':>11} {'per worker':>11} {'speedup':>8} {'efficiency':>11}")
+    for result in results:
+        speedup = result["images_per_sec"] / baseline if baseline else float("nan")
+        result["speedup"] = speedup
+        result["efficiency"] = speedup / result["workers"]
+        print(f"   {result['workers']:>7} {result['images_per_sec']:>11.1f} "
+              f"{result['images_per_sec'] / result['workers']:>11.1f} {speedup:>7.2f}x {result['efficiency']:>11.0%}")
+    
+    with open(output_path, "w") as f:
+        json.dump({"cpu_count": os.cpu_count(), "results": results}, f, indent=2)
+    print(f"\n💾 Scaling report saved to '{output_path}'")
@@ -81,8 +81,12 @@ def evaluate_model(model, test_generator):
     print(f"   Predicted Benign: {np.sum(y_pred == 0)}")
     print(f"   Predicted Malignant: {np.sum(y_pred == 1)}")
     
+    return compute_metrics(y_true, y_pred)
+
+def compute_metrics(y_true, y_pred):
+    """Binary classification metrics from true and predicted labels (1 = Malignant)"""
     # Calculate confusion matrix
-    cm = confusion_matrix(y_true, y_pred)
+    cm = confusion_matrix(y_true, y_pred, labels=[0, 1])
     tn, fp, fn, tp = cm.ravel()
     
     # Calculate metrics
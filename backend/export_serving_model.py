@@ -0,0 +1,238 @@
+"""
+Serving Model Export
+Writes a frozen, inference-only graph of the trained model for the API server
+
+The exported graph takes uint8 RGB pixels, resizes them to the model input
+size when needed and applies the /255 rescale itself, then runs the
+network in inference mode (dropout gone, batch norm on its moving
+statistics). Variables are frozen into constants and the graph is run
+through Grappler (constant folding, arithmetic and dependency
+optimization) before it is written. ModelService picks the artifact up
+automatically when SERVING_MODEL_PATH exists and was exported from the
+current MODEL_PATH; no Keras model is built or compiled at load time.
+The dropout-active head used for uncertainty estimates is frozen into a
+second file next to it.
+
+Usage:
+    python export_serving_model.py
+    python export_serving_model.py --model models/oral_lesion_model.h5 --output models/oral_lesion_model_serving.pb
+    python export_serving_model.py --benchmark
+"""
+
+import os
+import json
+import time
+import argparse
+import multiprocessing as mp
+import numpy as np
+
+from app.core.config import settings
+
+INPUT_NAME = "pixels"
+
+
+def build_serving_function(service):
+    """uint8 pixels in, class outputs and pooled embedding out"""
+    import tensorflow as tf
+    
+    serving_model = service.serving_model
+    image_size = tf.constant(settings.IMAGE_SIZE, dtype=tf.int32)
+    
+    @tf.function(input_signature=[
+        tf.TensorSpec([None, None, None, settings.IMAGE_CHANNELS], tf.uint8, name=INPUT_NAME)
+    ])
+    def serve(pixels):
+        images = tf.cast(pixels, tf.float32)
+        # Resize only when the caller did not already send model-sized images
+        images = tf.cond(
+            tf.reduce_all(tf.shape(images)[1:3] == image_size),
+            lambda: images,
+            lambda: tf.image.resize(images, settings.IMAGE_SIZE, method="bilinear", antialias=True)
+        )
+        images = tf.ensure_shape(images, [None, *settings.IMAGE_SIZE, settings.IMAGE_CHANNELS])
+        images = images * (1.0 / 255.0)
+        
+        outputs = serving_model(images, training=False)
+        outputs = outputs if isinstance(outputs, (list, tuple)) else [outputs]
+        # A tuple keeps the output order ModelService expects (dicts are flattened by key)
+        names = ["probabilities", "embedding"]
+        return tuple(tf.identity(output, name=name) for output, name in zip(outputs, names))
+    
+    return serve.get_concrete_function()
+
+
+def freeze_and_optimize(concrete_function):
+    """Fold variables into constants, strip training-only nodes and run Grappler"""
+    import tensorflow as tf
+    from tensorflow.core.protobuf import config_pb2, meta_graph_pb2
+    from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+    from tensorflow.python.grappler import tf_optimizer
+    
+    frozen = convert_variables_to_constants_v2(concrete_function)
+    graph_def = frozen.graph.as_graph_def()
+    input_names = [tensor.name for tensor in frozen.inputs]
+    output_names = [tensor.name for tensor in frozen.outputs]
+    nodes_before = len(graph_def.node)
+    
+    protected = [name.split(":")[0] for name in input_names + output_names]
+    graph_def = tf.compat.v1.graph_util.remove_training_nodes(graph_def, protected_nodes=protected)
+    
+    with tf.Graph().as_default() as graph:
+        tf.compat.v1.import_graph_def(graph_def, name="")
+        meta_graph = tf.compat.v1.train.export_meta_graph(graph_def=graph_def, graph=graph)
+    
+    # Grappler keeps everything the outputs depend on
+    fetches = meta_graph_pb2.CollectionDef()
+    fetches.node_list.value.extend(output_names)
+    meta_graph.collection_def["train_op"].CopyFrom(fetches)
+    
+    config = config_pb2.ConfigProto()
+    rewrites = config.graph_options.rewrite_options
+    rewrites.optimizers.extend(["constfold", "arithmetic", "dependency", "remap", "constfold"])
+    rewrites.min_graph_nodes = -1
+    graph_def = tf_optimizer.OptimizeGraph(config, meta_graph)
+    
+    return graph_def, input_names, output_names, nodes_before
+
+
+def export(model_path, output_path):
+    from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+    from app.services.model_service import ModelService
+    
+    service = ModelService(model_path=model_path)
+    service._load_model_file()
+    service._build_serving_model()
+    service._build_mc_head()
+    
+    start = time.perf_counter()
+    graph_def, input_names, output_names, nodes_before = freeze_and_optimize(build_serving_function(service))
+    
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(graph_def.SerializeToString())
+    
+    source = os.stat(model_path)
+    metadata = {
+        "source_model": os.path.abspath(model_path),
+        "source_size": source.st_size,
+        "source_mtime": source.st_mtime,
+        "input": input_names[0],
+        "outputs": output_names,
+        "image_size": list(settings.IMAGE_SIZE),
+        "output_dim": int(service.model.output_shape[-1]),
+        "embedding_dim": service.embedding_dim,
+        "nodes": len(graph_def.node),
+        "exported_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    
+    if service.mc_head_function is not None:
+        # The uncertainty head keeps its dropout, so it is frozen without the Grappler pass
+        head_path = os.path.splitext(output_path)[0] + "_mc_head.pb"
+        head = convert_variables_to_constants_v2(service.mc_head_function.get_concrete_function())
+        with open(head_path, "wb") as f:
+            f.write(head.graph.as_graph_def().SerializeToString())
+        metadata["mc_head"] = {
+            "path": os.path.basename(head_path),
+            "input": head.inputs[0].name,
+            "outputs": [tensor.name for tensor in head.outputs],
+        }
+    with open(output_path + ".json", "w") as f:
+        json.dump(metadata, f, indent=2)
+    
+    training_nodes = [node.name for node in graph_def.node if "dropout" in node.name.lower()]
+    print(f"   Graph nodes: {nodes_before} -> {len(graph_def.node)} after freezing and optimization")
+    print(f"   Dropout nodes left: {len(training_nodes)}")
+    print(f"   Size: {os.path.getsize(output_path) / 1e6:.1f} MB, exported in {time.perf_counter() - start:.1f}s")
+    return metadata
+
+
+def benchmark_worker(use_artifact, model_path, artifact_path, repeats, result_queue):
+    """Load one variant in a fresh process and time load and single-image latency"""
+    settings.MODEL_PATH = model_path
+    settings.SERVING_MODEL_PATH = artifact_path
+    settings.USE_SERVING_ARTIFACT = use_artifact
+    
+    from app.services.model_service import ModelService
+    start = time.perf_counter()
+    service = ModelService()
+    service.load_model()
+    load_seconds = time.perf_counter() - start
+    
+    pixels = np.random.default_rng(0).integers(0, 256, (1, *settings.IMAGE_SIZE, 3), dtype=np.uint8)
+    # The .h5 path gets the float input ImageProcessor produces, the artifact the raw pixels
+    image = pixels if use_artifact else pixels.astype(np.float32) / 255.0
+    
+    service.predict_batch(image)
+    latencies = []
+    for _ in range(repeats):
+        call_start = time.perf_counter()
+        service.predict_batch(image)
+        latencies.append(time.perf_counter() - call_start)
+    
+    outputs, _ = service._run_model(image)
+    result_queue.put({
+        "artifact": service.serving_function is not None,
+        "load_seconds": load_seconds,
+        "latency_ms": float(np.median(latencies) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "outputs": outputs.tolist(),
+    })
+
+
+def run_benchmark(model_path, artifact_path, repeats):
+    ctx = mp.get_context("spawn")
+    results = {}
+    for name, use_artifact in (("h5", False), ("artifact", True)):
+        result_queue = ctx.Queue()
+        process = ctx.Process(target=benchmark_worker,
+                              args=(use_artifact, model_path, artifact_path, repeats, result_queue))
+        process.start()
+        results[name] = result_queue.get()
+        process.join()
+    
+    if not results["artifact"]["artifact"]:
+        print("\n❌ The artifact was not loaded (see the log above)")
+        return
+    
+    difference = np.abs(np.array(results["h5"]["outputs"]) - np.array(results["artifact"]["outputs"])).max()
+    
+    print("\n" + "=" * 70)
+    print(f"📊 BENCHMARK ({repeats} single-image requests)")
+    print("=" * 70)
+    print(f"{'':<20} {'Load (s)':>10} {'Median (ms)':>12} {'p95 (ms)':>10}")
+    for name in ("h5", "artifact"):
+        result = results[name]
+        print(f"{name:<20} {result['load_seconds']:>10.2f} {result['latency_ms']:>12.2f} {result['p95_ms']:>10.2f}")
+    print(f"\n   Load speedup: {results['h5']['load_seconds'] / results['artifact']['load_seconds']:.1f}x, "
+          f"latency speedup: {results['h5']['latency_ms'] / results['artifact']['latency_ms']:.2f}x")
+    print(f"   Max output difference: {difference:.2e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a frozen serving graph with preprocessing built in")
+    parser.add_argument("--model", default=settings.MODEL_PATH, help="Trained .h5 model")
+    parser.add_argument("--output", default=settings.SERVING_MODEL_PATH, help="Frozen graph to write")
+    parser.add_argument("--benchmark", action="store_true", help="Compare load time and latency with the .h5")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("📦 SERVING MODEL EXPORT")
+    print("=" * 70)
+    
+    if not os.path.exists(args.model):
+        print(f"\n❌ Model not found at {args.model}")
+        return
+    
+    print(f"\n🧊 Freezing {args.model}...")
+    export(args.model, args.output)
+    print(f"\n✅ Serving graph saved to: {args.output} (metadata in {args.output}.json)")
+    
+    if args.benchmark:
+        run_benchmark(args.model, args.output, args.repeats)
+    
+    print("\n🔄 Restart the backend server to serve the exported graph")
+
+
+if __name__ == "__main__":
+    main()
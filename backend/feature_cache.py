@@ -0,0 +1,89 @@
+"""
+Frozen-Backbone Feature Cache
+Runs the pre-trained backbone over a dataset once and caches the pooled
+features, so the classification head can be trained and evaluated many
+times (cross-validation, hyperparameter search) in seconds on CPU
+
+Features are computed from un-augmented images with the same 1/255
+rescaling as training. The cache key covers the backbone and every file's
+path, size and modification time, so it is rebuilt automatically when the
+dataset changes.
+
+Usage:
+    from feature_cache import load_features
+    features, labels, filenames = load_features(DATASET_PATH)
+"""
+
+import os
+import hashlib
+import numpy as np
+
+# Cached feature files
+FEATURE_CACHE_DIR = "models"
+FEATURE_BATCH_SIZE = 32
+
+
+def dataset_files(dataset_path):
+    """(relative path, class index) for every image, in flow_from_directory order"""
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    generator = ImageDataGenerator().flow_from_directory(
+        dataset_path,
+        class_mode='binary',
+        batch_size=1,
+        shuffle=False
+    )
+    return generator.filenames, generator.classes
+
+
+def cache_key(dataset_path, architecture, filenames):
+    digest = hashlib.sha1(architecture.encode())
+    for filename in filenames:
+        stat = os.stat(os.path.join(dataset_path, filename))
+        digest.update(f"|{filename}|{stat.st_size}|{stat.st_mtime}".encode())
+    return digest.hexdigest()[:12]
+
+
+def load_features(dataset_path, architecture="efficientnet", cache_dir=FEATURE_CACHE_DIR):
+    """
+    Pooled backbone features for every image under dataset_path
+    
+    Args:
+        dataset_path: Folder with one sub-folder per class (Benign/, Malignant/)
+        architecture: Backbone name understood by train_model.build_backbone
+        cache_dir: Where the .npz cache is stored
+    
+    Returns:
+        Tuple of (features [N, D] float32, labels [N] int, filenames [N])
+    """
+    filenames, labels = dataset_files(dataset_path)
+    key = cache_key(dataset_path, architecture, filenames)
+    cache_path = os.path.join(cache_dir, f"features_{architecture}_{key}.npz")
+    
+    if os.path.exists(cache_path):
+        print(f"♻️  Using cached backbone features: {cache_path}")
+        with np.load(cache_path) as cache:
+            return cache["features"], cache["labels"], cache["filenames"]
+    
+    import tensorflow as tf
+    from tensorflow.keras.layers import GlobalAveragePooling2D
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    from train_model import build_backbone, IMG_SIZE
+    
+    print(f"🧊 Computing frozen {architecture} features for {len(filenames)} images (cached for next runs)...")
+    generator = ImageDataGenerator(rescale=1./255).flow_from_directory(
+        dataset_path,
+        target_size=IMG_SIZE,
+        batch_size=FEATURE_BATCH_SIZE,
+        class_mode='binary',
+        shuffle=False
+    )
+    
+    backbone = build_backbone(architecture)
+    extractor = tf.keras.Model(backbone.input, GlobalAveragePooling2D()(backbone.output))
+    features = extractor.predict(generator, verbose=1).astype(np.float32)
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez(cache_path, features=features, labels=np.asarray(labels), filenames=np.array(filenames))
+    print(f"💾 Features cached to {cache_path} ({features.shape[0]} x {features.shape[1]})")
+    
+    return features, np.asarray(labels), np.array(filenames)
@@ -0,0 +1,186 @@
+"""
+Hyperparameter Search
+Tunes the classification head (learning rate, batch size, dropout, dense
+width) with successive halving on cached frozen-backbone features
+
+Random configurations are trained for a few epochs in parallel worker
+processes; only the best 1/eta survive to the next rung, which gets eta
+times more epochs. Every evaluation is appended to a JSONL results store,
+and the winner is exported to train_config.json, which train_model.py
+picks up automatically.
+
+Usage:
+    python hyperparameter_search.py
+    python hyperparameter_search.py --data path/to/dataset --trials 81 --eta 3 --workers 4
+    python hyperparameter_search.py --metric sensitivity --no-export
+"""
+
+import os
+import json
+import time
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from cross_validate import init_worker, train_head, METRIC_NAMES
+
+# Output files
+RESULTS_STORE_PATH = "hpo_results.jsonl"
+
+# Search space
+LEARNING_RATE_RANGE = (1e-5, 1e-2)  # Sampled log-uniformly
+BATCH_SIZE_CHOICES = [8, 16, 32, 64]
+DROPOUT_RANGE = (0.0, 0.6)
+DENSE_UNITS_CHOICES = [32, 64, 128, 256, 512]
+
+
+def sample_config(rng):
+    """Draw one random head configuration"""
+    low, high = np.log10(LEARNING_RATE_RANGE[0]), np.log10(LEARNING_RATE_RANGE[1])
+    return {
+        "LEARNING_RATE": float(10 ** rng.uniform(low, high)),
+        "BATCH_SIZE": int(rng.choice(BATCH_SIZE_CHOICES)),
+        "DROPOUT_RATE": round(float(rng.uniform(*DROPOUT_RANGE)), 3),
+        "DENSE_UNITS": int(rng.choice(DENSE_UNITS_CHOICES)),
+    }
+
+
+def run_trial(trial, config, epochs, train_idx, val_idx, seed):
+    """Train one configuration for `epochs` epochs and score it on the validation split"""
+    start = time.perf_counter()
+    metrics, epochs_trained, val_loss = train_head(
+        train_idx, val_idx, seed,
+        learning_rate=config["LEARNING_RATE"],
+        batch_size=config["BATCH_SIZE"],
+        dropout_rate=config["DROPOUT_RATE"],
+        dense_units=config["DENSE_UNITS"],
+        epochs=epochs
+    )
+    return {
+        "trial": trial,
+        "config": config,
+        "epochs": epochs,
+        "epochs_trained": epochs_trained,
+        "val_loss": val_loss,
+        **metrics,
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+
+
+def score(result, metric):
+    """Higher is better"""
+    return -result["val_loss"] if metric == "val_loss" else result[metric]
+
+
+def export_config(best, metric, path):
+    from train_model import TUNABLE_PARAMETERS
+    config = {name: best["config"][name] for name in TUNABLE_PARAMETERS}
+    config["_source"] = {
+        "generated_by": "hyperparameter_search.py",
+        "metric": metric,
+        "val_loss": best["val_loss"],
+        **{name: best[name] for name in METRIC_NAMES},
+    }
+    with open(path, "w") as f:
+        json.dump(config, f, indent=2)
+
+
+def parse_args():
+    from train_model import DATASET_PATH
+    parser = argparse.ArgumentParser(description="Successive-halving search over classification head settings")
+    parser.add_argument("--data", default=DATASET_PATH, help="Folder with Benign/ and Malignant/ sub-folders")
+    parser.add_argument("--trials", type=int, default=27, help="Configurations in the first rung")
+    parser.add_argument("--eta", type=int, default=3, help="Keep the best 1/eta of each rung")
+    parser.add_argument("--min-epochs", type=int, default=5, help="Epoch budget of the first rung")
+    parser.add_argument("--max-epochs", type=int, default=100, help="Cap on the epoch budget of later rungs")
+    parser.add_argument("--metric", default="val_loss", choices=["val_loss"] + METRIC_NAMES,
+                        help="What to rank trials by")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel trials (default: CPUs)")
+    parser.add_argument("--architecture", default="efficientnet", choices=["efficientnet", "mobilenet"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-export", action="store_true", help="Do not write train_config.json")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    
+    print("=" * 70)
+    print("🎛️  HYPERPARAMETER SEARCH (successive halving)")
+    print("=" * 70)
+    
+    if not os.path.exists(args.data):
+        print(f"\n❌ Dataset not found: {args.data}")
+        return
+    
+    from sklearn.model_selection import train_test_split
+    from feature_cache import load_features
+    from train_model import TRAIN_CONFIG_PATH
+    
+    features, labels, _ = load_features(args.data, args.architecture)
+    
+    # Same 80/20 proportions as train_model.py, fixed for every trial
+    indices = np.arange(len(labels))
+    train_idx, val_idx = train_test_split(indices, test_size=0.2, stratify=labels, random_state=args.seed)
+    
+    workers = args.workers or os.cpu_count() or 1
+    threads = max((os.cpu_count() or 1) // workers, 1)
+    rng = np.random.default_rng(args.seed)
+    survivors = [(trial, sample_config(rng)) for trial in range(args.trials)]
+    study = time.strftime("%Y%m%d-%H%M%S")
+    
+    print(f"\n🧮 {args.trials} trials on {len(train_idx)}/{len(val_idx)} train/val images, "
+          f"{workers} workers x {threads} threads, ranking by {args.metric}")
+    
+    start = time.perf_counter()
+    best = None
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(features, labels, threads)
+    ) as pool, open(RESULTS_STORE_PATH, "a") as store:
+        rung = 0
+        while survivors:
+            epochs = min(args.min_epochs * args.eta ** rung, args.max_epochs)
+            print(f"\n🪜 Rung {rung}: {len(survivors)} trials x {epochs} epochs")
+            
+            futures = [pool.submit(run_trial, trial, config, epochs, train_idx, val_idx, args.seed)
+                       for trial, config in survivors]
+            results = []
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                store.write(json.dumps({"study": study, "rung": rung, **result}) + "\n")
+                store.flush()
+            
+            results.sort(key=lambda result: score(result, args.metric), reverse=True)
+            for result in results[:3]:
+                print(f"   #{result['trial']:<3} val_loss {result['val_loss']:.4f}  "
+                      f"accuracy {result['accuracy']:.1%}  {result['config']}")
+            
+            best = results[0]
+            keep = len(results) // args.eta
+            if keep < 1 or epochs >= args.max_epochs:
+                break
+            survivors = [(result["trial"], result["config"]) for result in results[:keep]]
+            rung += 1
+    
+    print("\n" + "=" * 70)
+    print(f"🏆 BEST CONFIGURATION (trial #{best['trial']}, {time.perf_counter() - start:.1f}s total)")
+    print("=" * 70)
+    for name, value in best["config"].items():
+        print(f"   {name} = {value}")
+    print(f"   val_loss {best['val_loss']:.4f}, accuracy {best['accuracy']:.1%}, "
+          f"sensitivity {best['sensitivity']:.1%}, specificity {best['specificity']:.1%}")
+    print(f"\n💾 All trials logged to '{RESULTS_STORE_PATH}' (study {study})")
+    
+    if not args.no_export:
+        export_config(best, args.metric, TRAIN_CONFIG_PATH)
+        print(f"💾 Best configuration exported to '{TRAIN_CONFIG_PATH}' (used by train_model.py)")
+        print("   Check it with: python cross_validate.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,28 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import APIRouter, Depends, FastAPI, File, Header, UploadFile, HTTPException, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse
 import uvicorn
-from typing import Dict
+import numpy as np
+from typing import Dict, Optional, Tuple
+import hmac
 import logging
+import os
+import time
 
-from app.services.image_processor import ImageProcessor
+from app.services.image_processor import ImageProcessor, ImageQualityError
 from app.services.model_service import ModelService
-from app.models.response_models import PredictionResponse, HealthResponse
+from app.services.model_server import RemoteModelService
+from app.services.cascade_service import CascadeService
+from app.services.admission_control import AdmissionController, AdmissionRejected, ClientDisconnected
+from app.services.embedding_index import EmbeddingIndex
+from app.services.profiler import RequestProfiler, stage_timer
+from app.services.tracing import Span, Tracer
+from app.services.tiled_inference import TiledInference
+from app.services.audit_log import AuditLog, hash_input
+from app.services.drift_monitor import DriftMonitor
+from app.services.pipeline import Pipeline, PipelineStats, Stage
+from app.models.response_models import PredictionResponse, HealthResponse, SimilarCasesResponse, TiledPredictionResponse
 from app.core.config import settings
 
 # Configure logging
@@ -34,18 +49,131 @@ app.add_middleware(
 
 # Initialize services
 image_processor = ImageProcessor()
-model_service = ModelService()
+model_service = RemoteModelService() if settings.MODEL_SERVER_ENABLED else ModelService()
+cascade_service = CascadeService(model_service)
+tiled_inference = TiledInference(image_processor, model_service)
+audit_log = AuditLog()
+drift_monitor = DriftMonitor()
+admission_controller = AdmissionController()
+request_profiler = RequestProfiler()
+tracer = Tracer()
+batch_pipeline_stats = PipelineStats()
+reference_index: Optional[EmbeddingIndex] = None
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Open a root span for every request and return its trace id"""
+    trace_id = tracer.new_trace_id(request.headers.get("X-Trace-ID"))
+    with tracer.span(f"{request.method} {request.url.path}", trace_id) as span:
+        request.state.trace_span = span
+        response = await call_next(request)
+        span.set_attribute("status_code", response.status_code)
+    response.headers["X-Trace-ID"] = trace_id
+    return response
+
+
+def get_client_id(request: Request) -> str:
+    """Identify the caller for per-client concurrency limits"""
+    client_id = request.headers.get("X-Client-ID")
+    if client_id:
+        return client_id
+    return request.client.host if request.client else "unknown"
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Reject /admin requests unless they send "X-Admin-Token: <ADMIN_TOKEN>" (all of them when it is unset)"""
+    if not settings.ADMIN_TOKEN or x_admin_token is None or not hmac.compare_digest(
+        x_admin_token.encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Admin token missing or invalid")
+
+
+# Audit records, traces and profiles describe patients' uploads; every route here needs the admin token
+admin_router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin_token)])
+
+
+def admission_error(error: Exception) -> HTTPException:
+    """Translate admission control failures into HTTP errors"""
+    if isinstance(error, AdmissionRejected):
+        logger.warning(f"Request shed ({error.status_code}): {error.message}")
+        return HTTPException(
+            status_code=error.status_code,
+            detail=error.message,
+            headers={"Retry-After": str(error.retry_after)}
+        )
+    
+    logger.info("Client disconnected before inference started, request cancelled")
+    return HTTPException(status_code=499, detail="Client closed request")
+
+
+def quality_error(error: ImageQualityError) -> HTTPException:
+    """Return the quality gate's reasons so the client can retake the photo"""
+    return HTTPException(
+        status_code=422,
+        detail={"message": str(error), "reasons": error.reasons, "metrics": error.metrics}
+    )
+
+
+def classify(processed_image: np.ndarray, uncertainty: bool = False,
+             image_size: Optional[Tuple[int, int]] = None) -> Dict[str, any]:
+    """
+    Cascaded prediction, or the full model with a Monte-Carlo dropout estimate when asked for
+    
+    With image_size (the upload's width and height) the prediction is also fed to the drift monitor.
+    """
+    if uncertainty:
+        result = {**model_service.predict_with_uncertainty(processed_image)[0], "stage": "full"}
+    else:
+        result = cascade_service.predict(processed_image)
+    if image_size is not None:
+        drift_monitor.observe(image_size, processed_image, result)
+    return result
+
+
+def predict_stages(contents: bytes, timings: Optional[Dict[str, float]] = None,
+                   uncertainty: bool = False) -> Dict[str, any]:
+    """Decode and classify one image, recording stage timings when profiling"""
+    processed_image = image_processor.process_image(contents, timings, quality_gate=True)
+    with stage_timer(timings, "predict"):
+        return classify(processed_image, uncertainty, image_processor.read_size(contents))
 
 
 @app.on_event("startup")
 async def startup_event():
     """Load ML model on startup"""
     logger.info("Starting up Oral Lesion Classifier API...")
+    audit_log.start()
+    drift_monitor.load_reference(settings.DRIFT_REFERENCE_PATH)
     try:
         model_service.load_model()
+        # The exported serving graph rescales uint8 pixels itself
+        image_processor.scale_pixels = not model_service.accepts_pixels
         logger.info("Model loaded successfully")
     except Exception as e:
         logger.error(f"Failed to load model: {str(e)}")
+    
+    try:
+        cascade_service.load_model()
+    except Exception as e:
+        logger.error(f"Failed to load screening model, cascade disabled: {str(e)}")
+    
+    global reference_index
+    if os.path.exists(settings.REFERENCE_INDEX_PATH):
+        try:
+            reference_index = EmbeddingIndex.load(settings.REFERENCE_INDEX_PATH)
+        except Exception as e:
+            logger.error(f"Failed to load reference index: {str(e)}")
+    else:
+        logger.warning(f"Reference index not found at {settings.REFERENCE_INDEX_PATH}, /similar-cases is disabled")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush the audit log and release model server connections and shared memory"""
+    audit_log.close()
+    if isinstance(model_service, RemoteModelService):
+        model_service.close()
 
 
 @app.get("/", response_model=HealthResponse)
@@ -70,12 +198,19 @@ async def health_check():
 
 
 @app.post("/predict", response_model=PredictionResponse)
-async def predict_lesion(file: UploadFile = File(...)):
+async def predict_lesion(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    uncertainty: bool = Query(False, description="Add a Monte-Carlo dropout uncertainty estimate")
+):
     """
     Predict oral lesion type from uploaded image
     
     Args:
         file: Uploaded image file (JPEG, PNG, JPG)
+        uncertainty: Also return mean probability, variance and predictive entropy
+            over MC_DROPOUT_SAMPLES stochastic passes of the classification head
     
     Returns:
         PredictionResponse with prediction, confidence, and class probabilities
@@ -88,20 +223,67 @@ async def predict_lesion(file: UploadFile = File(...)):
                 detail="Invalid file type. Please upload an image file (JPEG, PNG, JPG)"
             )
         
+        if uncertainty and not model_service.supports_uncertainty:
+            raise HTTPException(status_code=400, detail="Uncertainty estimates are not available for the loaded model")
+        
+        root = request.state.trace_span
+        start = time.perf_counter()
+        
         # Read image file
-        contents = await file.read()
+        with tracer.span("upload_read", root.trace_id, root, filename=file.filename) as span:
+            contents = await file.read()
+            span.set_attribute("bytes", len(contents))
         logger.info(f"Received image: {file.filename}, size: {len(contents)} bytes")
+        input_hash = await run_in_threadpool(hash_input, contents)
         
-        # Process image
-        processed_image = image_processor.process_image(contents)
-        
-        # Get prediction from model
-        prediction_result = model_service.predict(processed_image)
+        # Wait for an inference slot, then decode and predict off the event loop
+        queue_span = tracer.start_span("queue", root.trace_id, root)
+        async with admission_controller.admit(get_client_id(request), request.is_disconnected):
+            tracer.end_span(queue_span)
+            
+            if request_profiler.should_profile(request.headers.get("X-Profile")):
+                with tracer.span("profiled_predict", root.trace_id, root) as span:
+                    prediction_result, profile_id = await run_in_threadpool(
+                        request_profiler.run,
+                        lambda timings: predict_stages(contents, timings, uncertainty),
+                        "/predict",
+                        file.filename
+                    )
+                    span.set_attribute("profile_id", profile_id)
+                response.headers["X-Profile-ID"] = profile_id
+            else:
+                # Process image
+                with tracer.span("process_image", root.trace_id, root):
+                    processed_image = await run_in_threadpool(
+                        image_processor.process_image, contents, quality_gate=True
+                    )
+                
+                # Get prediction from model
+                with tracer.span("predict", root.trace_id, root, uncertainty=uncertainty) as span:
+                    prediction_result = await run_in_threadpool(
+                        classify, processed_image, uncertainty, image_processor.read_size(contents)
+                    )
+                    span.set_attribute("stage", prediction_result.get("stage"))
         
         logger.info(f"Prediction: {prediction_result['prediction']} with confidence {prediction_result['confidence']:.2f}")
         
+        audit_log.record(
+            "/predict", input_hash, len(contents), model_service.model_version, prediction_result,
+            (time.perf_counter() - start) * 1000, trace_id=root.trace_id, filename=file.filename
+        )
+        
         return PredictionResponse(**prediction_result)
     
+    except HTTPException:
+        raise
+    
+    except (AdmissionRejected, ClientDisconnected) as e:
+        tracer.end_span(queue_span, error=type(e).__name__)
+        raise admission_error(e)
+    
+    except ImageQualityError as e:
+        raise quality_error(e)
+    
     except ValueError as ve:
         logger.error(f"Validation error: {str(ve)}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -115,7 +297,7 @@ async def predict_lesion(file: UploadFile = File(...)):
 
 
 @app.post("/batch-predict")
-async def batch_predict(files: list[UploadFile] = File(...)):
+async def batch_predict(request: Request, files: list[UploadFile] = File(...)):
     """
     Predict multiple oral lesion images at once
     
@@ -132,32 +314,49 @@ async def batch_predict(files: list[UploadFile] = File(...)):
                 detail="Maximum 10 images allowed per batch"
             )
         
-        results = []
+        root = request.state.trace_span
+        start = time.perf_counter()
+        results = [None] * len(files)
+        uploads = []
         
-        for file in files:
+        for i, file in enumerate(files):
             if not file.content_type.startswith("image/"):
-                results.append({
+                results[i] = {
                     "filename": file.filename,
                     "error": "Invalid file type"
-                })
+                }
                 continue
             
-            try:
+            with tracer.span("upload_read", root.trace_id, root, filename=file.filename, index=i) as span:
                 contents = await file.read()
-                processed_image = image_processor.process_image(contents)
-                prediction_result = model_service.predict(processed_image)
-                
-                results.append({
-                    "filename": file.filename,
-                    **prediction_result
-                })
-            except Exception as e:
-                results.append({
-                    "filename": file.filename,
-                    "error": str(e)
-                })
+                span.set_attribute("bytes", len(contents))
+            uploads.append((i, contents))
         
-        return JSONResponse(content={"results": results})
+        input_hashes = await run_in_threadpool(lambda: [hash_input(contents) for _, contents in uploads])
+        
+        # The whole batch shares one inference slot
+        queue_span = tracer.start_span("queue", root.trace_id, root)
+        async with admission_controller.admit(get_client_id(request), request.is_disconnected):
+            tracer.end_span(queue_span)
+            await run_in_threadpool(run_batch_inference, files, uploads, results, root)
+        
+        latency_ms = (time.perf_counter() - start) * 1000
+        for (i, contents), input_hash in zip(uploads, input_hashes):
+            if "prediction" in results[i]:
+                audit_log.record(
+                    "/batch-predict", input_hash, len(contents), model_service.model_version, results[i],
+                    latency_ms, trace_id=root.trace_id, filename=files[i].filename
+                )
+        
+        with tracer.span("serialize", root.trace_id, root):
+            return JSONResponse(content={"results": results})
+    
+    except HTTPException:
+        raise
+    
+    except (AdmissionRejected, ClientDisconnected) as e:
+        tracer.end_span(queue_span, error=type(e).__name__)
+        raise admission_error(e)
     
     except Exception as e:
         logger.error(f"Error during batch prediction: {str(e)}")
@@ -167,6 +366,363 @@ async def batch_predict(files: list[UploadFile] = File(...)):
         )
 
 
+@app.post("/predict-raw")
+async def predict_raw(request: Request):
+    """
+    Predict from raw uint8 RGB pixels that are already resized, skipping image decode
+    
+    The request body is the pixel buffer in row-major (N, H, W, C) order.
+    
+    Headers:
+        X-Tensor-Shape: "N,224,224,3" for a batch or "224,224,3" for a single frame
+        X-Tensor-Dtype: "uint8" (the only supported dtype)
+    
+    Returns:
+        PredictionResponse for a single frame, or {"results": [...]} for a batch
+    """
+    try:
+        dtype = request.headers.get("X-Tensor-Dtype", "uint8").lower()
+        if dtype != "uint8":
+            raise HTTPException(status_code=400, detail=f"Unsupported tensor dtype: {dtype}. Only uint8 is accepted")
+        
+        shape_header = request.headers.get("X-Tensor-Shape")
+        if not shape_header:
+            raise HTTPException(status_code=400, detail="Missing X-Tensor-Shape header")
+        shape = image_processor.parse_tensor_shape(shape_header)
+        single_frame = len(shape_header.split(",")) == 3
+        
+        # Reject mismatched uploads before reading the body
+        expected_bytes = int(np.prod(shape))
+        content_length = request.headers.get("Content-Length")
+        if content_length is not None and int(content_length) != expected_bytes:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Content-Length {content_length} does not match shape {shape} ({expected_bytes} bytes)"
+            )
+        
+        root = request.state.trace_span
+        start = time.perf_counter()
+        body = await request.body()
+        
+        async with admission_controller.admit(get_client_id(request), request.is_disconnected):
+            image_array = await run_in_threadpool(image_processor.process_pixel_buffer, body, shape)
+            predictions = await run_in_threadpool(cascade_service.predict_batch, image_array)
+        
+        # Frames arrive already resized, so their original size is unknown and left out of the size histogram
+        for frame, prediction_result in zip(image_array, predictions):
+            drift_monitor.observe(None, frame, prediction_result)
+        
+        # One record per frame, keyed by the hash of that frame's pixels
+        latency_ms = (time.perf_counter() - start) * 1000
+        frame_bytes = len(body) // len(predictions)
+        frame_hashes = await run_in_threadpool(
+            lambda: [hash_input(body[i * frame_bytes:(i + 1) * frame_bytes]) for i in range(len(predictions))]
+        )
+        for prediction_result, input_hash in zip(predictions, frame_hashes):
+            audit_log.record(
+                "/predict-raw", input_hash, frame_bytes, model_service.model_version, prediction_result,
+                latency_ms, trace_id=root.trace_id
+            )
+        
+        if single_frame:
+            return PredictionResponse(**predictions[0])
+        
+        return JSONResponse(content={"results": predictions})
+    
+    except HTTPException:
+        raise
+    
+    except (AdmissionRejected, ClientDisconnected) as e:
+        raise admission_error(e)
+    
+    except ValueError as ve:
+        logger.error(f"Validation error: {str(ve)}")
+        raise HTTPException(status_code=400, detail=str(ve))
+    
+    except Exception as e:
+        logger.error(f"Error during raw prediction: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing tensor: {str(e)}"
+        )
+
+
+@app.post("/predict-tiled", response_model=TiledPredictionResponse)
+async def predict_tiled(request: Request, file: UploadFile = File(...)):
+    """
+    Predict a large photo from overlapping tiles instead of one 224x224 view
+    
+    Small lesions in wide intraoral shots survive at tile resolution. Costs
+    one model pass per evaluated tile (at most TILE_BUDGET).
+    
+    Args:
+        file: Uploaded image file (JPEG, PNG, JPG)
+    
+    Returns:
+        TiledPredictionResponse with the image-level prediction, tile counts and a lesion heatmap
+    """
+    try:
+        if not file.content_type.startswith("image/"):
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid file type. Please upload an image file (JPEG, PNG, JPG)"
+            )
+        
+        root = request.state.trace_span
+        start = time.perf_counter()
+        contents = await file.read()
+        input_hash = await run_in_threadpool(hash_input, contents)
+        
+        async with admission_controller.admit(get_client_id(request), request.is_disconnected):
+            with tracer.span("predict_tiled", root.trace_id, root) as span:
+                result = await run_in_threadpool(tiled_inference.predict, contents, quality_gate=True)
+                span.set_attribute("tiles", result["tiles"]["evaluated"])
+        
+        # The whole downscaled photo, not a tile, is what the drift reference describes
+        drift_monitor.observe(image_processor.read_size(contents), result.pop("overview"), result)
+        audit_log.record(
+            "/predict-tiled", input_hash, len(contents), model_service.model_version, result,
+            (time.perf_counter() - start) * 1000, trace_id=root.trace_id, filename=file.filename
+        )
+        
+        return TiledPredictionResponse(**result)
+    
+    except HTTPException:
+        raise
+    
+    except (AdmissionRejected, ClientDisconnected) as e:
+        raise admission_error(e)
+    
+    except ImageQualityError as e:
+        raise quality_error(e)
+    
+    except ValueError as ve:
+        logger.error(f"Validation error: {str(ve)}")
+        raise HTTPException(status_code=400, detail=str(ve))
+    
+    except Exception as e:
+        logger.error(f"Error during tiled prediction: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing image: {str(e)}"
+        )
+
+
+@app.post("/similar-cases", response_model=SimilarCasesResponse)
+async def find_similar_cases(
+    request: Request,
+    file: UploadFile = File(...),
+    k: int = Query(settings.SIMILAR_CASES_K, ge=1, le=settings.MAX_SIMILAR_CASES_K)
+):
+    """
+    Predict an uploaded image and return the most similar confirmed reference cases
+    
+    Args:
+        file: Uploaded image file (JPEG, PNG, JPG)
+        k: Number of similar cases to return
+    
+    Returns:
+        SimilarCasesResponse with the prediction and the k nearest reference images
+    """
+    try:
+        if reference_index is None or len(reference_index) == 0:
+            raise HTTPException(
+                status_code=503,
+                detail="Reference index not available. Run build_reference_index.py and restart the server"
+            )
+        
+        if not file.content_type.startswith("image/"):
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid file type. Please upload an image file (JPEG, PNG, JPG)"
+            )
+        
+        root = request.state.trace_span
+        start = time.perf_counter()
+        contents = await file.read()
+        input_hash = await run_in_threadpool(hash_input, contents)
+        
+        async with admission_controller.admit(get_client_id(request), request.is_disconnected):
+            processed_image = await run_in_threadpool(image_processor.process_image, contents, quality_gate=True)
+            
+            # Prediction and embedding come from the same forward pass
+            predictions, embeddings = await run_in_threadpool(
+                model_service.predict_with_embeddings, processed_image
+            )
+        
+        similar = reference_index.search(embeddings[0], k)
+        
+        audit_log.record(
+            "/similar-cases", input_hash, len(contents), model_service.model_version, predictions[0],
+            (time.perf_counter() - start) * 1000, trace_id=root.trace_id, filename=file.filename
+        )
+        
+        return SimilarCasesResponse(**predictions[0], similar_cases=similar)
+    
+    except HTTPException:
+        raise
+    
+    except (AdmissionRejected, ClientDisconnected) as e:
+        raise admission_error(e)
+    
+    except ImageQualityError as e:
+        raise quality_error(e)
+    
+    except ValueError as ve:
+        logger.error(f"Validation error: {str(ve)}")
+        raise HTTPException(status_code=400, detail=str(ve))
+    
+    except Exception as e:
+        logger.error(f"Error during similar-case search: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing image: {str(e)}"
+        )
+
+
+def run_batch_inference(files: list, uploads: list, results: list, root: Optional[Span] = None) -> Dict[str, any]:
+    """
+    Decode uploads and run them through the model in batched calls
+    
+    Decoding, inference and post-processing run as overlapping pipeline
+    stages, so later images are decoded while earlier ones are in the model.
+    
+    Returns:
+        Pipeline run report with per-stage utilization
+    """
+    trace_id = root.trace_id if root is not None else tracer.new_trace_id()
+    
+    def decode(upload):
+        i, contents = upload
+        with tracer.span("process_image", trace_id, root, filename=files[i].filename, index=i) as span:
+            processed_image = image_processor.process_image(contents, quality_gate=True)
+        return i, processed_image, image_processor.read_size(contents), span
+    
+    def infer(decoded):
+        # Linked to the images it carries so each one can be followed into the batch
+        with tracer.span(
+            "predict_batch",
+            trace_id,
+            root,
+            links=[image_span for _, _, _, image_span in decoded],
+            batch_size=len(decoded)
+        ) as span:
+            batch = np.concatenate([processed_image for _, processed_image, _, _ in decoded], axis=0)
+            predictions = cascade_service.predict_batch(batch)
+            span.set_attribute("full_model_images", sum(p.get("stage") == "full" for p in predictions))
+        return [(image, prediction_result) for image, prediction_result in zip(decoded, predictions)]
+    
+    def postprocess(inferred):
+        (i, processed_image, image_size, _), prediction_result = inferred
+        drift_monitor.observe(image_size, processed_image, prediction_result)
+        results[i] = {
+            "filename": files[i].filename,
+            **prediction_result
+        }
+    
+    def collect(item):
+        if item.error is not None:
+            i = uploads[item.index][0]
+            results[i] = {
+                "filename": files[i].filename,
+                "error": str(item.error)
+            }
+    
+    pipeline = Pipeline([
+        Stage("decode", decode, workers=settings.PIPELINE_DECODE_WORKERS),
+        Stage("infer", infer, batch_size=settings.INFERENCE_BATCH_SIZE, max_wait_ms=settings.PIPELINE_BATCH_WAIT_MS),
+        Stage("postprocess", postprocess),
+    ], queue_size=settings.PIPELINE_QUEUE_SIZE, stats=batch_pipeline_stats)
+    return pipeline.run(uploads, sink=collect)
+
+
+@admin_router.get("/cascade")
+async def get_cascade_stats():
+    """How many images the screening and full models answered"""
+    return cascade_service.get_stats()
+
+
+@admin_router.get("/admission")
+async def get_admission_stats():
+    """Inference queue depth and load-shedding counters"""
+    return admission_controller.get_stats()
+
+
+@admin_router.get("/pipeline")
+async def get_pipeline_stats():
+    """Per-stage utilization of the /batch-predict pipeline since startup"""
+    return batch_pipeline_stats.get_stats()
+
+
+@admin_router.get("/profiles")
+async def list_profiles():
+    """Stored request profiles with their stage timings, newest first"""
+    return {"profiles": request_profiler.list_profiles()}
+
+
+@admin_router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """Full profile: stage timings and folded stacks (flamegraph.pl / speedscope format)"""
+    profile = request_profiler.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+    return profile
+
+
+@admin_router.get("/profiles/{profile_id}/flamegraph")
+async def get_flame_graph(profile_id: str):
+    """SVG flame graph of a stored profile"""
+    path = request_profiler.flame_graph_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+    return FileResponse(path, media_type="image/svg+xml")
+
+
+@admin_router.get("/traces")
+async def get_traces(
+    trace_id: Optional[str] = Query(default=None, description="Return every span of this trace"),
+    name: Optional[str] = Query(default=None, description="Only spans with this name, e.g. predict_batch"),
+    min_duration_ms: float = Query(default=0.0, ge=0.0),
+    limit: int = Query(default=100, ge=1, le=settings.TRACE_BUFFER_SIZE)
+):
+    """Query recent spans from the in-process trace buffer"""
+    return {"spans": tracer.find(trace_id, name, min_duration_ms, limit)}
+
+
+@admin_router.get("/audit")
+async def get_audit_records(
+    input_hash: Optional[str] = Query(default=None, description="SHA-256 of the uploaded image bytes"),
+    since: Optional[float] = Query(default=None, description="Unix time, inclusive"),
+    until: Optional[float] = Query(default=None, description="Unix time, exclusive"),
+    limit: int = Query(default=100, ge=1, le=10000)
+):
+    """Look up audited predictions by input hash and/or time range, newest first"""
+    records = await run_in_threadpool(audit_log.find, input_hash, since, until, limit)
+    return {"records": records}
+
+
+@admin_router.get("/audit/stats")
+async def get_audit_stats():
+    """Audit queue depth, dropped records and flush sizes"""
+    return audit_log.get_stats()
+
+
+@admin_router.get("/drift")
+async def get_drift_report():
+    """Running input and prediction statistics with drift scores against the training reference"""
+    return drift_monitor.get_report()
+
+
+@admin_router.post("/drift/reset")
+async def reset_drift_monitor():
+    """Start the running statistics over, e.g. after deploying a new model"""
+    drift_monitor.reset()
+    return {"status": "reset"}
+
+
+app.include_router(admin_router)
+
+
 @app.get("/classes")
 async def get_classes():
     """Get available lesion classes"""
@@ -177,11 +733,16 @@ async def get_classes():
 
 
 if __name__ == "__main__":
+    # uvicorn's reloader runs a single process and ignores workers
+    reload = settings.DEBUG and settings.INFERENCE_WORKERS == 1
+    if settings.DEBUG and not reload:
+        logger.warning(f"Auto-reload is disabled because INFERENCE_WORKERS={settings.INFERENCE_WORKERS}")
     uvicorn.run(
         "main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG
+        reload=reload,
+        workers=settings.INFERENCE_WORKERS
     )
 
 
@@ -0,0 +1,299 @@
+"""
+Layer Profiler
+Times every layer of the served model and measures its activation memory,
+to see which EfficientNet blocks are worth pruning, quantizing or replacing
+
+The model is loaded by ModelService.load_model, exactly as the API loads it
+(the .h5 file, not the frozen serving graph, which has no layers). For each
+batch size the functional graph is walked layer by layer on a synthetic
+batch, nested models included:
+  - time:   each layer runs as its own compiled tf.function on its real
+            inputs; the median is reported with the cost of an empty
+            tf.function call subtracted
+  - memory: output size of every layer, and the peak size of all live
+            activations, where a tensor is freed after its last consumer
+Layers are also summed per block (stem, block1a ... block7a, top, head).
+
+The graph walk uses Keras 3 internals, so this needs TensorFlow >= 2.16.
+
+Usage:
+    python profile_layers.py
+    python profile_layers.py --batch-sizes 1 8 32 --repeats 20 --top 30
+    python profile_layers.py --model models/candidate.h5 --compare layer_profile_3f2a9c1d04be.json
+"""
+
+import os
+import re
+import json
+import time
+import argparse
+from collections import OrderedDict
+
+import numpy as np
+
+from app.core.config import settings
+
+# EfficientNet layer names start with their block: stem_conv, block2b_se_squeeze, top_bn
+BLOCK_PATTERN = re.compile(r"^(stem|top|block\d+[a-z])_")
+
+
+def block_of(name):
+    """Block a (possibly nested, '/'-separated) layer name belongs to; unmatched layers form the head"""
+    match = BLOCK_PATTERN.match(name.rsplit("/", 1)[-1])
+    return match.group(1) if match else "head"
+
+
+def tensor_bytes(value):
+    import tensorflow as tf
+    return sum(int(np.prod(t.shape)) * t.dtype.size for t in tf.nest.flatten(value) if hasattr(t, "dtype"))
+
+
+def time_op(fn, args, kwargs, repeats):
+    """Median milliseconds per call of fn(*args, **kwargs) after a warm-up"""
+    for _ in range(2):
+        fn(*args, **kwargs)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+class LayerProfiler:
+    """Walks a functional Keras graph in execution order, timing layers and tracking live activations"""
+    
+    def __init__(self, repeats, dispatch_ms):
+        self.repeats = repeats
+        self.dispatch_ms = dispatch_ms
+        self.layers = []
+        self.live_bytes = 0
+        self.peak_bytes = 0
+        self.peak_at = None
+    
+    def run(self, model, inputs, prefix=""):
+        """Execute model on inputs node by node; returns its outputs"""
+        import tensorflow as tf
+        
+        model = getattr(model, "_functional", None) or model
+        consumers = {}
+        for nodes in model._nodes_by_depth.values():
+            for node in nodes:
+                if node.operation and not node.is_input:
+                    for x in node.input_tensors:
+                        consumers[id(x)] = consumers.get(id(x), 0) + 1
+        # The caller owns the inputs and outputs and frees them itself
+        kept_ids = {id(x) for x in model.inputs + model.outputs}
+        
+        values = {id(x): y for x, y in zip(model.inputs, tf.nest.flatten(inputs))}
+        for depth in sorted(model._nodes_by_depth, reverse=True):
+            for node in model._nodes_by_depth[depth]:
+                if not node.operation or node.is_input:
+                    continue
+                args, kwargs = node.arguments.fill_in(values)
+                layer = node.operation
+                name = prefix + layer.name
+                
+                if hasattr(layer, "_nodes_by_depth") or hasattr(layer, "_functional"):
+                    outputs = self.run(layer, args[0] if len(args) == 1 else args, prefix=name + "/")
+                else:
+                    outputs = self._profile_layer(layer, name, args, kwargs)
+                
+                for x, y in zip(node.outputs, tf.nest.flatten(outputs)):
+                    values[id(x)] = y
+                
+                # Free inputs nobody else needs any more
+                for x in node.input_tensors:
+                    consumers[id(x)] -= 1
+                    if consumers[id(x)] == 0 and id(x) not in kept_ids and id(x) in values:
+                        self.live_bytes -= tensor_bytes(values.pop(id(x)))
+        
+        return tf.nest.pack_sequence_as(model._outputs_struct, [values[id(x)] for x in model.outputs])
+    
+    def _profile_layer(self, layer, name, args, kwargs):
+        import tensorflow as tf
+        
+        if getattr(layer, "_call_has_training_arg", False):
+            kwargs = {**kwargs, "training": False}
+        compiled = tf.function(layer.__call__)
+        outputs = compiled(*args, **kwargs)
+        milliseconds = max(time_op(compiled, args, kwargs, self.repeats) - self.dispatch_ms, 0.0)
+        
+        output_bytes = tensor_bytes(outputs)
+        self.live_bytes += output_bytes
+        if self.live_bytes > self.peak_bytes:
+            self.peak_bytes = self.live_bytes
+            self.peak_at = name
+        
+        self.layers.append({
+            "name": name,
+            "type": type(layer).__name__,
+            "block": block_of(name),
+            "ms": milliseconds,
+            "output_shape": [list(t.shape) for t in tf.nest.flatten(outputs)],
+            "output_bytes": output_bytes,
+            "live_bytes": self.live_bytes,
+            "params": int(layer.count_params()) if layer.built else 0,
+        })
+        return outputs
+
+
+def profile_batch_size(model_service, batch_size, repeats):
+    """Profile one batch size; returns the report for it"""
+    import tensorflow as tf
+    
+    batch = tf.constant(np.random.rand(batch_size, *settings.IMAGE_SIZE, settings.IMAGE_CHANNELS).astype(np.float32))
+    
+    # What the whole model costs when it runs as one graph, as in the API
+    full_model = tf.function(lambda x: model_service.model(x, training=False))
+    full_model_ms = time_op(full_model, (batch,), {}, repeats)
+    
+    # Calling a compiled function costs something even when it does nothing
+    empty = tf.function(lambda x: x)
+    dispatch_ms = time_op(empty, (batch,), {}, repeats * 5)
+    
+    profiler = LayerProfiler(repeats, dispatch_ms)
+    profiler.live_bytes = tensor_bytes(batch)
+    profiler.run(model_service.model, batch)
+    
+    blocks = OrderedDict()
+    for layer in profiler.layers:
+        block = blocks.setdefault(layer["block"], {"block": layer["block"], "layers": 0, "ms": 0.0,
+                                                   "output_bytes": 0, "max_live_bytes": 0, "params": 0})
+        block["layers"] += 1
+        block["ms"] += layer["ms"]
+        block["output_bytes"] += layer["output_bytes"]
+        block["max_live_bytes"] = max(block["max_live_bytes"], layer["live_bytes"])
+        block["params"] += layer["params"]
+    
+    layers_ms = sum(layer["ms"] for layer in profiler.layers)
+    for entry in list(profiler.layers) + list(blocks.values()):
+        entry["share"] = entry["ms"] / layers_ms if layers_ms > 0 else 0.0
+    
+    return {
+        "batch_size": batch_size,
+        "full_model_ms": full_model_ms,
+        "layers_sum_ms": layers_ms,
+        "dispatch_overhead_ms": dispatch_ms,
+        "peak_activation_bytes": profiler.peak_bytes,
+        "peak_at": profiler.peak_at,
+        "layers": profiler.layers,
+        "blocks": list(blocks.values()),
+    }
+
+
+def megabytes(num_bytes):
+    return num_bytes / (1024 * 1024)
+
+
+def print_report(report, top):
+    print(f"\n📐 Batch size {report['batch_size']}: full model {report['full_model_ms']:.1f} ms, "
+          f"sum of layers {report['layers_sum_ms']:.1f} ms "
+          f"({report['dispatch_overhead_ms']:.3f} ms call overhead subtracted per layer)")
+    print(f"   Peak live activations: {megabytes(report['peak_activation_bytes']):.1f} MB at {report['peak_at']}")
+    
+    print(f"\n   {'block':<10} {'layers':>6} {'ms':>9} {'share':>7} {'outputs MB':>11} {'peak MB':>9} {'params':>10}")
+    for block in sorted(report["blocks"], key=lambda b: b["ms"], reverse=True):
+        print(f"   {block['block']:<10} {block['layers']:>6} {block['ms']:>9.2f} {block['share']:>7.1%} "
+              f"{megabytes(block['output_bytes']):>11.1f} {megabytes(block['max_live_bytes']):>9.1f} "
+              f"{block['params']:>10,}")
+    
+    print(f"\n   Top {top} layers:")
+    print(f"   {'layer':<34} {'type':<22} {'ms':>9} {'share':>7} {'output MB':>10}")
+    for layer in sorted(report["layers"], key=lambda l: l["ms"], reverse=True)[:top]:
+        print(f"   {layer['name'].rsplit('/', 1)[-1][:34]:<34} {layer['type'][:22]:<22} {layer['ms']:>9.2f} {layer['share']:>7.1%} "
+              f"{megabytes(layer['output_bytes']):>10.2f}")
+
+
+def print_comparison(results, baseline_path):
+    """Block times of this run next to an earlier profile, e.g. of another model version"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    
+    print("\n" + "=" * 70)
+    print(f"🔍 COMPARISON WITH {baseline.get('model_version')} ({os.path.basename(baseline_path)})")
+    print("=" * 70)
+    for batch_size, report in results["batch_sizes"].items():
+        previous = baseline["batch_sizes"].get(batch_size)
+        if previous is None:
+            print(f"\n   Batch size {batch_size}: not in the baseline profile")
+            continue
+        
+        print(f"\n   Batch size {batch_size}: full model {previous['full_model_ms']:.1f} -> {report['full_model_ms']:.1f} ms, "
+              f"peak {megabytes(previous['peak_activation_bytes']):.1f} -> "
+              f"{megabytes(report['peak_activation_bytes']):.1f} MB")
+        previous_blocks = {block["block"]: block for block in previous["blocks"]}
+        print(f"   {'block':<10} {'before ms':>10} {'after ms':>10} {'change':>8}")
+        for block in report["blocks"]:
+            before = previous_blocks.get(block["block"])
+            if before is None:
+                print(f"   {block['block']:<10} {'-':>10} {block['ms']:>10.2f} {'new':>8}")
+                continue
+            change = (block["ms"] - before["ms"]) / before["ms"] if before["ms"] > 0 else 0.0
+            print(f"   {block['block']:<10} {before['ms']:>10.2f} {block['ms']:>10.2f} {change:>+8.0%}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Profile per-layer latency and activation memory of the model")
+    parser.add_argument("--model", default=settings.MODEL_PATH, help="Model file to profile")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, settings.INFERENCE_BATCH_SIZE],
+                        help="Batch sizes to profile")
+    parser.add_argument("--repeats", type=int, default=10, help="Timed calls per layer")
+    parser.add_argument("--top", type=int, default=20, help="Slowest layers to list")
+    parser.add_argument("--output", default=None,
+                        help="JSON report path (default: layer_profile_<model version>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier JSON report to compare block times with")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    
+    print("=" * 70)
+    print("🔬 LAYER PROFILER")
+    print("=" * 70)
+    
+    if not os.path.exists(args.model):
+        print(f"\n❌ Model not found: {args.model}")
+        return
+    
+    import tensorflow as tf
+    if int(tf.keras.__version__.split(".")[0]) < 3:
+        # LayerProfiler walks Keras 3's functional graph (_nodes_by_depth, node.arguments), absent in Keras 2
+        print(f"\n❌ The layer profiler needs Keras 3 (TensorFlow >= 2.16), found Keras {tf.keras.__version__}")
+        return
+    
+    from app.services.model_service import ModelService
+    
+    # An explicit path loads the Keras model even when a frozen serving graph exists
+    model_service = ModelService(model_path=args.model)
+    model_service.load_model()
+    model = model_service.model
+    print(f"\n📦 Model: {args.model} (version {model_service.model_version})")
+    print(f"   {len(model.layers)} top-level layers, {model.count_params():,} parameters")
+    
+    results = {
+        "model": args.model,
+        "model_version": model_service.model_version,
+        "created": time.time(),
+        "tf_intra_op_threads": settings.TF_INTRA_OP_THREADS,
+        "batch_sizes": {},
+    }
+    for batch_size in sorted(set(args.batch_sizes)):
+        print(f"\n⏳ Profiling batch size {batch_size}...")
+        report = profile_batch_size(model_service, batch_size, args.repeats)
+        results["batch_sizes"][str(batch_size)] = report
+        print_report(report, args.top)
+    
+    output = args.output or f"layer_profile_{model_service.model_version}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    
+    if args.compare:
+        print_comparison(results, args.compare)
+    
+    print(f"\n💾 Full per-layer report saved to '{output}'")
+
+
+if __name__ == "__main__":
+    main()
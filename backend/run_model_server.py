@@ -0,0 +1,110 @@
+"""
+Model Server Launcher
+Starts one inference process per address in MODEL_SERVER_ADDRESSES. Each
+process loads its own copy of the model; API workers started with
+MODEL_SERVER_ENABLED=true connect to them and pass tensors through shared
+memory instead of running TensorFlow themselves.
+
+On many-core machines several small instances usually beat one large one.
+With --pin-cores each process is pinned to its own block of cores and its
+TensorFlow thread pools are sized to that block, so instances do not
+compete for the same cores (compare with benchmark_instances.py).
+
+The API workers and the servers must share a private MODEL_SERVER_AUTHKEY
+(set it in .env); neither side starts without one.
+
+Usage:
+    python run_model_server.py
+    MODEL_SERVER_ENABLED=true python main.py     # in another terminal
+    python run_model_server.py --addresses 127.0.0.1:8765 127.0.0.1:8766
+    python run_model_server.py --instances 4 --pin-cores
+    python run_model_server.py --instances 4 --pin-cores --cores-per-instance 6
+"""
+
+import json
+import argparse
+import logging
+import multiprocessing as mp
+
+from app.core.config import settings
+from app.services.cpu_affinity import partition_cores
+
+
+def serve(address, noop, cores):
+    """Run one model server until the process is stopped"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    
+    if cores:
+        # Before TensorFlow is imported, so all of its threads inherit the affinity
+        from app.services.cpu_affinity import pin_current_process
+        pin_current_process(cores)
+    
+    # Imported here so TensorFlow initializes inside the server process
+    from app.services.model_server import ModelServer
+    
+    ModelServer(address, noop=noop).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run inference in dedicated model server processes")
+    parser.add_argument("--addresses", nargs="+", default=settings.MODEL_SERVER_ADDRESSES,
+                        help="host:port to listen on, one process each")
+    parser.add_argument("--instances", type=int, default=None,
+                        help="Start this many servers on consecutive ports after the first address")
+    parser.add_argument("--pin-cores", action="store_true", default=settings.MODEL_SERVER_PIN_CORES,
+                        help="Pin each server to its own block of cores with matching TensorFlow threads")
+    parser.add_argument("--cores-per-instance", type=int, default=settings.MODEL_SERVER_CORES_PER_INSTANCE,
+                        help="Cores per pinned server (0 = split all cores; fewer leaves cores for the API)")
+    parser.add_argument("--noop", action="store_true",
+                        help="Skip the model and return zeros (measures protocol overhead only)")
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("🧠 MODEL SERVER")
+    print("=" * 70)
+    
+    try:
+        settings.model_server_authkey()
+    except RuntimeError as e:
+        print(f"\n❌ {str(e)}")
+        return
+    
+    addresses = args.addresses
+    if args.instances:
+        host, port = addresses[0].rsplit(":", 1)
+        addresses = [f"{host}:{int(port) + i}" for i in range(args.instances)]
+    
+    core_blocks = [None] * len(addresses)
+    if args.pin_cores:
+        try:
+            core_blocks = partition_cores(len(addresses), args.cores_per_instance)
+        except ValueError as e:
+            print(f"\n❌ {str(e)}")
+            return
+    
+    ctx = mp.get_context("spawn")
+    processes = [ctx.Process(target=serve, args=(address, args.noop, cores), name=f"model-server-{address}")
+                 for address, cores in zip(addresses, core_blocks)]
+    for process, address, cores in zip(processes, addresses, core_blocks):
+        process.start()
+        pinning = f", cores {cores[0]}-{cores[-1]}" if cores else ""
+        print(f"   🚀 Serving on {address} (pid {process.pid}{pinning})")
+    
+    if addresses != settings.MODEL_SERVER_ADDRESSES:
+        print(f"\n💡 Start the API with MODEL_SERVER_ADDRESSES='{json.dumps(addresses)}'")
+    
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping model servers...")
+        for process in processes:
+            process.terminate()
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from augmentation import AUGMENTATION, augment_batch, random_affine_transforms
+
+# Every range at zero: the identity transform
+NO_AUGMENTATION = {
+    "rotation_range": 0,
+    "width_shift_range": 0,
+    "height_shift_range": 0,
+    "shear_range": 0,
+    "zoom_range": 0,
+    "horizontal_flip": False,
+    "vertical_flip": False,
+    "brightness_range": (1.0, 1.0),
+}
+
+
+def smooth_image(size):
+    rows, cols = np.mgrid[0:size, 0:size]
+    return np.stack([
+        np.sin(cols / 7.0) * 0.5 + 0.5,
+        np.cos(rows / 5.0) * 0.5 + 0.5,
+        (rows + cols) / (2.0 * size)
+    ], axis=-1).astype(np.float32)
+
+
+def test_zero_ranges_give_the_identity():
+    transforms = random_affine_transforms(4, 48, 64, NO_AUGMENTATION).numpy()
+    np.testing.assert_allclose(transforms, np.tile([1, 0, 0, 0, 1, 0, 0, 0], (4, 1)), atol=1e-6)
+
+
+def test_rotations_keep_the_image_centre_fixed():
+    height, width = 48, 64
+    transforms = random_affine_transforms(16, height, width, dict(NO_AUGMENTATION, rotation_range=90)).numpy()
+    linear = transforms[:, [0, 1, 3, 4]].reshape(-1, 2, 2)
+    centre = np.array([(width - 1) / 2, (height - 1) / 2])
+    
+    np.testing.assert_allclose(linear @ np.swapaxes(linear, 1, 2), np.tile(np.eye(2), (16, 1, 1)), atol=1e-5)
+    np.testing.assert_allclose(linear @ centre + transforms[:, [2, 5]], np.tile(centre, (16, 1)), atol=1e-3)
+
+
+def test_composition_matches_image_data_generator():
+    pytest.importorskip("scipy")
+    # ImageDataGenerator centres on (height / 2, width / 2) swapped, so only square images agree
+    size, batch_size = 56, 8
+    image = smooth_image(size)
+    params = dict(AUGMENTATION, brightness_range=(1.0, 1.0))
+    
+    tf.random.set_seed(3)
+    augmented = augment_batch(tf.constant(np.repeat(image[None], batch_size, axis=0)), params).numpy()
+    
+    # Replay random_affine_transforms' draws in the same order
+    tf.random.set_seed(3)
+    
+    def uniform(low, high):
+        return tf.random.uniform([batch_size], low, high).numpy()
+    
+    theta = uniform(-params["rotation_range"], params["rotation_range"])
+    tx = uniform(-params["width_shift_range"], params["width_shift_range"]) * size
+    ty = uniform(-params["height_shift_range"], params["height_shift_range"]) * size
+    shear = uniform(-params["shear_range"], params["shear_range"])
+    zx = uniform(1 - params["zoom_range"], 1 + params["zoom_range"])
+    zy = uniform(1 - params["zoom_range"], 1 + params["zoom_range"])
+    flip_horizontal = tf.random.uniform([batch_size]).numpy() < 0.5
+    flip_vertical = tf.random.uniform([batch_size]).numpy() < 0.5
+    
+    generator = tf.keras.preprocessing.image.ImageDataGenerator()
+    for i in range(batch_size):
+        expected = generator.apply_transform(image, {
+            "theta": theta[i], "tx": tx[i], "ty": ty[i], "shear": shear[i], "zx": zx[i], "zy": zy[i],
+            "flip_horizontal": flip_horizontal[i], "flip_vertical": flip_vertical[i],
+        })
+        np.testing.assert_allclose(augmented[i], expected, atol=1e-3)
+
+
+def test_brightness_stays_in_range():
+    images = tf.fill([4, 32, 32, 3], 0.9)
+    augmented = augment_batch(images, dict(NO_AUGMENTATION, brightness_range=(0.8, 1.2))).numpy()
+    
+    assert augmented.min() >= 0.9 * 0.8 - 1e-6
+    assert augmented.max() <= 1.0
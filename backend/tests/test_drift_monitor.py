@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.drift_monitor import PIXEL_STRIDE, DriftMonitor, DriftStats, ImageSummary, population_stability_index
+
+RESULT = {"prediction": "Healthy", "confidence": 0.9}
+
+
+def random_images(seed=0):
+    rng = np.random.default_rng(seed)
+    images = []
+    for height, width in [(224, 224), (37, 51), (8, 8), (100, 60)]:
+        images.append(rng.random((height, width, 3)) * rng.random(3))
+        images.append(rng.integers(0, 256, (1, height, width, 3), dtype=np.uint8))
+    return images
+
+
+def test_merged_moments_match_numpy_over_all_sampled_pixels():
+    stats = DriftStats()
+    sampled = []
+    for image in random_images():
+        stats.update(ImageSummary((640, 480), image, RESULT))
+        pixels = np.squeeze(image, axis=0) if image.ndim == 4 else image
+        pixels = pixels[::PIXEL_STRIDE, ::PIXEL_STRIDE].reshape(-1, 3).astype(np.float64)
+        sampled.append(pixels / 255.0 if image.dtype == np.uint8 else pixels)
+    sampled = np.concatenate(sampled)
+    
+    assert stats.images == 8
+    assert stats.pixels == len(sampled)
+    np.testing.assert_allclose(stats.mean, sampled.mean(axis=0), rtol=1e-9)
+    np.testing.assert_allclose(stats.variance, sampled.var(axis=0), rtol=1e-6)
+
+
+def test_psi_of_identical_histograms_is_zero():
+    assert population_stability_index([5, 20, 0, 75], [5, 20, 0, 75]) == 0.0
+    # Same proportions, different totals: only the empty-bin epsilon tells them apart
+    assert population_stability_index([5, 20, 0, 75], [10, 40, 0, 150]) == pytest.approx(0.0, abs=1e-5)
+
+
+def test_psi_matches_its_definition():
+    # sum((actual - expected) * ln(actual / expected)) over bin proportions
+    expected = 0.4 * math.log(0.9 / 0.5) + (-0.4) * math.log(0.1 / 0.5)
+    assert population_stability_index([50, 50], [90, 10]) == pytest.approx(expected, rel=1e-3)
+    assert population_stability_index([90, 10], [50, 50]) == pytest.approx(expected, rel=1e-3)
+
+
+def test_psi_stays_finite_with_empty_bins():
+    psi = population_stability_index([10, 0], [0, 10])
+    assert math.isfinite(psi) and psi > settings.DRIFT_PSI_ALERT
+
+
+def test_traffic_like_the_reference_is_not_drift(monkeypatch):
+    monkeypatch.setattr(settings, "DRIFT_MIN_IMAGES", 4)
+    stats = DriftStats()
+    for image in random_images():
+        stats.update(ImageSummary((640, 480), image, RESULT))
+    monitor = DriftMonitor()
+    monitor.reference = stats.to_dict()
+    
+    report = monitor.compare(stats)
+    
+    assert report["status"] == "ok"
+    assert report["scores"]["image_size_psi"] == 0.0
+    assert report["scores"]["pixel_mean_shift"] == {"R": 0.0, "G": 0.0, "B": 0.0}
+
+
+def test_frames_of_unknown_size_get_no_size_score(monkeypatch):
+    monkeypatch.setattr(settings, "DRIFT_MIN_IMAGES", 4)
+    reference = DriftStats()
+    frames = DriftStats()
+    for image in random_images():
+        reference.update(ImageSummary((640, 480), image, RESULT))
+        frames.update(ImageSummary(None, image, RESULT))
+    monitor = DriftMonitor()
+    monitor.reference = reference.to_dict()
+    
+    report = monitor.compare(frames)
+    
+    assert frames.size_counts.sum() == 0
+    assert report["scores"]["image_size_psi"] is None
+    assert report["status"] == "ok"
@@ -0,0 +1,98 @@
+import random
+import threading
+import time
+
+import pytest
+
+from app.services.pipeline import Pipeline, Stage
+
+
+def run_collecting(pipeline, values):
+    items = []
+    report = pipeline.run(values, sink=items.append)
+    return sorted(items, key=lambda item: item.index), report
+
+
+def test_multi_worker_stages_keep_every_item_and_its_error():
+    def decode(value):
+        time.sleep(random.random() * 0.005)
+        if value % 7 == 3:
+            raise ValueError(f"bad input {value}")
+        return value
+    
+    pipeline = Pipeline([
+        Stage("decode", decode, workers=4),
+        Stage("infer", lambda values: [value * 10 for value in values], batch_size=4, max_wait_ms=5),
+        Stage("postprocess", lambda value: value + 1, workers=2),
+    ], queue_size=4)
+    
+    items, report = run_collecting(pipeline, range(50))
+    
+    assert [item.index for item in items] == list(range(50))
+    for item in items:
+        if item.index % 7 == 3:
+            # Later stages pass a failed item through untouched
+            assert isinstance(item.error, ValueError)
+            assert str(item.error) == f"bad input {item.index}"
+            assert item.value == item.index
+        else:
+            assert item.error is None
+            assert item.value == item.index * 10 + 1
+    assert report["items"] == 50
+    assert report["stages"]["decode"]["errors"] == 7
+    assert report["stages"]["infer"]["items"] == 43
+
+
+def test_batch_stage_with_wrong_result_count_fails_its_items():
+    pipeline = Pipeline([
+        Stage("infer", lambda values: values[:-1], batch_size=8),
+        Stage("postprocess", lambda value: value + 1),
+    ])
+    
+    items, _ = run_collecting(pipeline, range(8))
+    
+    assert len(items) == 8
+    assert all(isinstance(item.error, RuntimeError) for item in items)
+    assert [item.value for item in items] == list(range(8))
+
+
+def test_failing_input_ends_the_run_with_the_items_read_so_far():
+    def values():
+        yield from range(5)
+        raise OSError("disk gone")
+    
+    items, report = run_collecting(Pipeline([Stage("decode", lambda value: value, workers=3)]), values())
+    
+    assert [item.value for item in items] == list(range(5))
+    assert report["items"] == 5
+
+
+def test_failing_sink_stops_every_worker():
+    def sink(item):
+        raise RuntimeError("client went away")
+    
+    pipeline = Pipeline([
+        Stage("decode", lambda value: value, workers=4),
+        Stage("infer", lambda values: values, batch_size=4, max_wait_ms=50),
+        Stage("postprocess", lambda value: value, workers=2),
+    ], queue_size=2)
+    errors = []
+    
+    def run():
+        try:
+            pipeline.run(range(10000), sink=sink)
+        except RuntimeError as e:
+            errors.append(e)
+    
+    runner = threading.Thread(target=run, daemon=True)
+    runner.start()
+    runner.join(timeout=10)
+    
+    assert not runner.is_alive(), "Pipeline.run hung after the sink raised"
+    assert [str(e) for e in errors] == ["client went away"]
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith("pipeline-")]
+
+
+def test_stage_rejects_zero_workers():
+    with pytest.raises(ValueError):
+        Stage("decode", lambda value: value, workers=0)
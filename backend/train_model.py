@@ -4,9 +4,16 @@ Uses EfficientNetB0 with Transfer Learning for better accuracy
 """
 
 import os
+import sys
+import json
+import math
+import time
+import hashlib
+import argparse
+from functools import partial
 import numpy as np
 import tensorflow as tf
-from tensorflow.keras.applications import EfficientNetB0
+from tensorflow.keras.applications import EfficientNetB0, MobileNetV2
 from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
 from tensorflow.keras.models import Model
 from tensorflow.keras.optimizers import Adam
@@ -14,6 +21,9 @@ from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCh
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 import matplotlib.pyplot as plt
 
+# Gradient accumulation and activation recomputation rely on Keras 3 (TensorFlow >= 2.16)
+KERAS_3 = int(tf.keras.__version__.split(".")[0]) >= 3
+
 # ============== CONFIGURATION ==============
 # Update this path to your dataset folder
 DATASET_PATH = r"C:\Users\sh\Downloads\sem 3\dtl el\dataset"  # <-- UPDATE THIS!
@@ -26,10 +36,42 @@ IMG_SIZE = (224, 224)
 BATCH_SIZE = 16
 EPOCHS = 50
 LEARNING_RATE = 0.0001
+DROPOUT_RATE = 0.3
+DENSE_UNITS = 128
+
+# Tuned values exported by hyperparameter_search.py override the constants above
+TRAIN_CONFIG_PATH = "train_config.json"
+TUNABLE_PARAMETERS = ("LEARNING_RATE", "BATCH_SIZE", "DROPOUT_RATE", "DENSE_UNITS")
 
 # Output model path
 OUTPUT_MODEL_PATH = "models/oral_lesion_model_new.h5"
 
+# Small, fast backbone used as the first stage of the inference cascade
+SCREENING_MODEL_PATH = "models/oral_lesion_screening_model.h5"
+
+# Knowledge distillation (--distill): the served model teaches a smaller student
+TEACHER_MODEL_PATH = "models/oral_lesion_model.h5"
+STUDENT_MODEL_PATH = "models/oral_lesion_student_model.h5"
+DISTILL_TEMPERATURE = 4.0  # Softens teacher and student logits for the soft-target loss
+DISTILL_ALPHA = 0.3  # Weight of the hard-label loss; the rest goes to the teacher's soft targets
+
+# Data-parallel training (--workers N, see distributed_training.py)
+SCALING_REPORT_PATH = "training_scaling.json"
+
+
+def load_train_config(path=TRAIN_CONFIG_PATH):
+    """Apply tuned hyperparameters from train_config.json, if it exists"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        config = json.load(f)
+    applied = {name: type(globals()[name])(config[name]) for name in TUNABLE_PARAMETERS if name in config}
+    globals().update(applied)
+    return applied
+
+
+TRAIN_CONFIG = load_train_config()
+
 
 def check_gpu():
     """Check if GPU is available"""
@@ -45,8 +87,9 @@ def check_gpu():
         return False
 
 
-def create_data_generators(dataset_path):
+def create_data_generators(dataset_path, batch_size=None):
     """Create training and validation data generators with augmentation"""
+    batch_size = batch_size or BATCH_SIZE
     
     # Heavy augmentation for training
     train_datagen = ImageDataGenerator(
@@ -75,7 +118,7 @@ def create_data_generators(dataset_path):
     train_generator = train_datagen.flow_from_directory(
         dataset_path,
         target_size=IMG_SIZE,
-        batch_size=BATCH_SIZE,
+        batch_size=batch_size,
         class_mode='binary',
         subset='training',
         shuffle=True
@@ -85,7 +128,7 @@ def create_data_generators(dataset_path):
     val_generator = val_datagen.flow_from_directory(
         dataset_path,
         target_size=IMG_SIZE,
-        batch_size=BATCH_SIZE,
+        batch_size=batch_size,
         class_mode='binary',
         subset='validation',
         shuffle=False
@@ -99,17 +142,106 @@ def create_data_generators(dataset_path):
     return train_generator, val_generator
 
 
-def build_model():
-    """Build EfficientNetB0 model with transfer learning"""
+def load_image(path, label):
+    """Read, decode and resize one image like flow_from_directory, scaled to [0, 1]"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, IMG_SIZE, method='nearest')
+    return tf.cast(image, tf.float32) / 255.0, label
+
+
+def list_dataset(dataset_path):
+    """
+    Image paths and labels of the training and validation subsets
+    
+    Only lists files, so the split matches create_data_generators exactly.
+    
+    Returns:
+        {"training": (paths, labels), "validation": (paths, labels)}
+    """
+    print(f"\n📂 Loading dataset from: {dataset_path}")
+    
+    listing = ImageDataGenerator(validation_split=0.2)
+    subsets = {}
+    for subset in ("training", "validation"):
+        files = listing.flow_from_directory(
+            dataset_path,
+            class_mode='binary',
+            subset=subset,
+            shuffle=False
+        )
+        paths = [os.path.join(dataset_path, filename) for filename in files.filenames]
+        subsets[subset] = (paths, files.classes.astype(np.float32))
     
-    print("\n🏗️ Building EfficientNetB0 model...")
+    print(f"\n📊 Dataset Summary:")
+    print(f"   Training samples: {len(subsets['training'][0])}")
+    print(f"   Validation samples: {len(subsets['validation'][0])}")
+    print(f"   Classes: {files.class_indices}")
     
-    # Load pre-trained EfficientNetB0 (without top layer)
-    base_model = EfficientNetB0(
-        weights='imagenet',
+    return subsets
+
+
+def make_dataset(paths, labels, training, repeat=False, batch_size=None):
+    """Batched tf.data pipeline over the given files; training shuffles and augments"""
+    from augmentation import augment_batch
+    
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if training:
+        dataset = dataset.shuffle(len(paths), reshuffle_each_iteration=True)
+    if repeat:
+        # Repeating before batching keeps every batch full across epoch boundaries
+        dataset = dataset.repeat()
+    dataset = dataset.map(load_image, num_parallel_calls=tf.data.AUTOTUNE).batch(batch_size or BATCH_SIZE)
+    if training:
+        dataset = dataset.map(lambda x, y: (augment_batch(x), y), num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def create_datasets(dataset_path, batch_size=None):
+    """
+    tf.data version of create_data_generators: same 80/20 split and augmentation
+    ranges, but images are decoded in parallel and augmented a whole batch at a time
+    """
+    subsets = list_dataset(dataset_path)
+    return (make_dataset(*subsets["training"], training=True, batch_size=batch_size),
+            make_dataset(*subsets["validation"], training=False, batch_size=batch_size))
+
+
+def build_backbone(architecture, weights='imagenet'):
+    """Load a pre-trained backbone (without top layer)"""
+    if architecture == "mobilenet":
+        # Screening model: MobileNetV2 at width 0.35 needs ~6x fewer FLOPs than EfficientNetB0
+        return MobileNetV2(
+            weights=weights,
+            include_top=False,
+            input_shape=(*IMG_SIZE, 3),
+            alpha=0.35
+        )
+    
+    return EfficientNetB0(
+        weights=weights,
         include_top=False,
         input_shape=(*IMG_SIZE, 3)
     )
+
+
+def build_head(x, dropout_rate=None, dense_units=None):
+    """Classification head on top of the pooled backbone features"""
+    dropout_rate = DROPOUT_RATE if dropout_rate is None else dropout_rate
+    dense_units = DENSE_UNITS if dense_units is None else dense_units
+    x = Dropout(dropout_rate)(x)
+    x = Dense(dense_units, activation='relu')(x)
+    x = Dropout(dropout_rate)(x)
+    return Dense(1, activation='sigmoid')(x)  # Binary classification
+
+
+def build_model(architecture="efficientnet", weights='imagenet', learning_rate=None):
+    """Build the classifier (EfficientNetB0 by default) with transfer learning"""
+    
+    backbone_name = "MobileNetV2 (0.35)" if architecture == "mobilenet" else "EfficientNetB0"
+    print(f"\n🏗️ Building {backbone_name} model...")
+    
+    # Load pre-trained backbone (without top layer)
+    base_model = build_backbone(architecture, weights)
     
     # Freeze base model layers initially
     base_model.trainable = False
@@ -117,16 +249,13 @@ def build_model():
     # Add custom classification head
     x = base_model.output
     x = GlobalAveragePooling2D()(x)
-    x = Dropout(0.3)(x)
-    x = Dense(128, activation='relu')(x)
-    x = Dropout(0.3)(x)
-    output = Dense(1, activation='sigmoid')(x)  # Binary classification
+    output = build_head(x)
     
     model = Model(inputs=base_model.input, outputs=output)
     
     # Compile model
     model.compile(
-        optimizer=Adam(learning_rate=LEARNING_RATE),
+        optimizer=Adam(learning_rate=LEARNING_RATE if learning_rate is None else learning_rate),
         loss='binary_crossentropy',
         metrics=['accuracy']
     )
@@ -137,10 +266,12 @@ def build_model():
     return model, base_model
 
 
-def train_model(model, base_model, train_gen, val_gen):
-    """Train the model with callbacks"""
+def create_callbacks(output_path, checkpoint=True, saved_model=None):
+    """
+    Early stopping, learning rate decay and (unless checkpoint=False) best-model checkpoints
     
-    # Callbacks
+    saved_model: Model to checkpoint instead of the one being fit (see activation_recompute.py)
+    """
     callbacks = [
         EarlyStopping(
             monitor='val_loss',
@@ -154,14 +285,54 @@ def train_model(model, base_model, train_gen, val_gen):
             patience=5,
             min_lr=1e-7,
             verbose=1
-        ),
-        ModelCheckpoint(
-            OUTPUT_MODEL_PATH,
+        )
+    ]
+    if checkpoint:
+        if saved_model is not None:
+            from activation_recompute import PinnedModelCheckpoint
+            checkpoint_class = partial(PinnedModelCheckpoint, saved_model)
+        else:
+            checkpoint_class = ModelCheckpoint
+        callbacks.append(checkpoint_class(
+            output_path,
             monitor='val_accuracy',
+            mode='max',
             save_best_only=True,
             verbose=1
+        ))
+    return callbacks
+
+
+def make_optimizer(learning_rate, accumulation_steps=1):
+    """Adam, averaging the gradients of accumulation_steps batches per update when it is above 1"""
+    # gradient_accumulation_steps only exists in Keras 3; Keras 2 optimizers reject unknown arguments
+    if accumulation_steps > 1:
+        return Adam(learning_rate=learning_rate, gradient_accumulation_steps=accumulation_steps)
+    return Adam(learning_rate=learning_rate)
+
+
+def train_model(model, base_model, train_gen, val_gen, output_path=OUTPUT_MODEL_PATH,
+                loss='binary_crossentropy', metrics=('accuracy',), accumulation_steps=1,
+                recompute=False, recompute_segments=0):
+    """
+    Train the model with callbacks
+    
+    Memory-bounded fine-tuning: with accumulation_steps > 1, Adam averages the
+    gradients of that many batches before each update, so the effective batch
+    is accumulation_steps x the generator's batch size while only one batch is
+    held in memory. recompute runs phase 2 on a copy of the model that
+    recomputes activations in the backward pass (see activation_recompute.py).
+    Batch normalization statistics still come from the individual batches.
+    """
+    if accumulation_steps > 1:
+        model.compile(
+            optimizer=make_optimizer(LEARNING_RATE, accumulation_steps),
+            loss=loss,
+            metrics=list(metrics)
         )
-    ]
+    
+    # Callbacks
+    callbacks = create_callbacks(output_path, saved_model=model if recompute else None)
     
     # Phase 1: Train only the top layers
     print("\n" + "="*50)
@@ -184,14 +355,21 @@ def train_model(model, base_model, train_gen, val_gen):
     # Unfreeze base model
     base_model.trainable = True
     
+    # Shares all weights with model; the checkpoint still saves model itself
+    fine_tune_model = model
+    if recompute:
+        from activation_recompute import with_recomputation
+        fine_tune_model = with_recomputation(model, recompute_segments)
+        print(f"   Recomputing activations in {len(fine_tune_model.layers) - 1} segments")
+    
     # Recompile with lower learning rate
-    model.compile(
-        optimizer=Adam(learning_rate=LEARNING_RATE / 10),
-        loss='binary_crossentropy',
-        metrics=['accuracy']
+    fine_tune_model.compile(
+        optimizer=make_optimizer(LEARNING_RATE / 10, accumulation_steps),
+        loss=loss,
+        metrics=list(metrics)
     )
     
-    history2 = model.fit(
+    history2 = fine_tune_model.fit(
         train_gen,
         epochs=EPOCHS - 15,
         initial_epoch=15,
@@ -243,12 +421,392 @@ def plot_training_history(history1, history2):
     print("\n📊 Training curves saved to 'training_history.png'")
 
 
+# ============== KNOWLEDGE DISTILLATION ==============
+
+def load_teacher_targets(teacher_path, dataset_path):
+    """
+    Teacher probabilities for every training image, computed once and cached
+    
+    The cache key covers the teacher file and the training file list, so
+    the teacher only runs again when either of them changes.
+    """
+    # Same split as the training generator, but without augmentation or shuffling
+    generator = ImageDataGenerator(rescale=1./255, validation_split=0.2).flow_from_directory(
+        dataset_path,
+        target_size=IMG_SIZE,
+        batch_size=BATCH_SIZE,
+        class_mode='binary',
+        subset='training',
+        shuffle=False
+    )
+    
+    teacher_stat = os.stat(teacher_path)
+    key = hashlib.sha1(
+        f"{os.path.abspath(teacher_path)}|{teacher_stat.st_mtime}|{teacher_stat.st_size}|".encode()
+        + "\n".join(generator.filenames).encode()
+    ).hexdigest()[:12]
+    cache_path = os.path.join(os.path.dirname(teacher_path), f"teacher_targets_{key}.npz")
+    
+    if os.path.exists(cache_path):
+        print(f"\n♻️  Using cached teacher outputs: {cache_path}")
+        with np.load(cache_path) as cache:
+            return cache["filenames"], cache["probabilities"]
+    
+    print(f"\n🧑‍🏫 Computing teacher outputs for {generator.samples} training images (cached for next runs)...")
+    teacher = tf.keras.models.load_model(teacher_path, compile=False)
+    probabilities = teacher.predict(generator, verbose=1).reshape(-1)
+    filenames = np.array(generator.filenames)
+    np.savez(cache_path, filenames=filenames, probabilities=probabilities)
+    
+    return filenames, probabilities
+
+
+def soften(probabilities, temperature):
+    """Divide sigmoid logits by the temperature and map back to probabilities"""
+    probabilities = np.clip(probabilities, 1e-7, 1 - 1e-7)
+    logits = np.log(probabilities) - np.log1p(-probabilities)
+    return 1.0 / (1.0 + np.exp(-logits / temperature))
+
+
+def pack_targets(labels, soft_targets=None):
+    """
+    [hard label, soft target] per image, the target make_distillation_loss unpacks
+    
+    Without soft targets (validation) the hard label is used for both.
+    """
+    soft_targets = labels if soft_targets is None else soft_targets
+    return np.stack([labels, soft_targets], axis=-1).astype(np.float32)
+
+
+def make_distillation_loss(alpha=DISTILL_ALPHA, temperature=DISTILL_TEMPERATURE):
+    """Hard-label BCE plus temperature-scaled BCE against the teacher's soft targets"""
+    
+    def distillation_loss(y_true, y_pred):
+        hard, soft = y_true[:, 0:1], y_true[:, 1:2]
+        y_pred = tf.clip_by_value(y_pred, 1e-7, 1 - 1e-7)
+        student_logits = tf.math.log(y_pred) - tf.math.log1p(-y_pred)
+        soft_student = tf.sigmoid(student_logits / temperature)
+        
+        hard_loss = tf.keras.losses.binary_crossentropy(hard, y_pred)
+        # T^2 keeps soft-target gradients on the same scale as the hard loss
+        soft_loss = tf.keras.losses.binary_crossentropy(soft, soft_student) * temperature ** 2
+        return alpha * hard_loss + (1 - alpha) * soft_loss
+    
+    return distillation_loss
+
+
+def accuracy(y_true, y_pred):
+    """Binary accuracy against the hard label of a packed distillation target"""
+    return tf.keras.metrics.binary_accuracy(y_true[:, 0:1], y_pred)
+
+
+def measure_latency(model, repeats=30):
+    """Median single-image latency in milliseconds of a compiled forward pass"""
+    forward = tf.function(lambda x: model(x, training=False))
+    image = tf.random.uniform((1, *IMG_SIZE, 3))
+    forward(image)
+    
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        forward(image).numpy()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def compare_models(teacher_path, student_path, val_paths, val_labels):
+    """Print a size / latency / accuracy comparison of teacher and student"""
+    val_images = make_dataset(val_paths, val_labels, training=False).map(lambda x, y: x)
+    print("\n" + "="*60)
+    print("⚖️  TEACHER vs STUDENT")
+    print("="*60)
+    
+    rows = []
+    for name, path in [("Teacher", teacher_path), ("Student", student_path)]:
+        model = tf.keras.models.load_model(path, compile=False)
+        predictions = model.predict(val_images, verbose=0).reshape(-1)
+        val_accuracy = float(np.mean((predictions > 0.5) == (val_labels > 0.5)))
+        rows.append((
+            name,
+            model.count_params(),
+            os.path.getsize(path) / (1024 * 1024),
+            measure_latency(model),
+            val_accuracy
+        ))
+    
+    print(f"   {'Model':<8} {'Params':>12} {'Size MB':>9} {'Latency ms':>11} {'Val Acc':>8}")
+    for name, params, size_mb, latency_ms, val_accuracy in rows:
+        print(f"   {name:<8} {params:>12,} {size_mb:>9.1f} {latency_ms:>11.1f} {val_accuracy:>8.1%}")
+    
+    teacher, student = rows
+    print(f"\n   Student is {teacher[1] / student[1]:.1f}x smaller and "
+          f"{teacher[3] / student[3]:.1f}x faster per image "
+          f"({student[4] - teacher[4]:+.1%} accuracy)")
+
+
+def distill(architecture, output_path):
+    """Train a student on the teacher's cached soft targets and save it as a servable .h5"""
+    if not os.path.exists(TEACHER_MODEL_PATH):
+        print(f"\n❌ ERROR: Teacher model not found at: {TEACHER_MODEL_PATH}")
+        return
+    
+    filenames, teacher_probabilities = load_teacher_targets(TEACHER_MODEL_PATH, DATASET_PATH)
+    
+    subsets = list_dataset(DATASET_PATH)
+    train_paths, train_labels = subsets["training"]
+    val_paths, val_labels = subsets["validation"]
+    # Cached targets are stored by file name relative to the dataset folder
+    lookup = dict(zip(filenames, teacher_probabilities))
+    teacher_probabilities = np.array([lookup[os.path.relpath(path, DATASET_PATH)] for path in train_paths])
+    soft_targets = soften(teacher_probabilities, DISTILL_TEMPERATURE)
+    
+    # The soft target travels with its image through shuffling and augmentation
+    train_dataset = make_dataset(train_paths, pack_targets(train_labels, soft_targets), training=True)
+    val_dataset = make_dataset(val_paths, pack_targets(val_labels), training=False)
+    
+    student, base_model = build_model(architecture)
+    loss = make_distillation_loss()
+    student.compile(
+        optimizer=Adam(learning_rate=LEARNING_RATE),
+        loss=loss,
+        metrics=[accuracy]
+    )
+    
+    history1, history2 = train_model(
+        student, base_model,
+        train_dataset,
+        val_dataset,
+        output_path,
+        loss=loss,
+        metrics=(accuracy,)
+    )
+    
+    try:
+        plot_training_history(history1, history2)
+    except Exception as e:
+        print(f"⚠️ Could not plot training history: {e}")
+    
+    # Re-save the best checkpoint with a standard loss so it loads without custom objects
+    best_student = tf.keras.models.load_model(output_path, compile=False)
+    best_student.compile(optimizer=Adam(learning_rate=LEARNING_RATE), loss='binary_crossentropy', metrics=['accuracy'])
+    best_student.save(output_path)
+    
+    compare_models(TEACHER_MODEL_PATH, output_path, val_paths, val_labels)
+    
+    print(f"\n✅ Student model saved to: {output_path}")
+    print("\n🔄 To serve the student, set MODEL_PATH to it (or use it as SCREENING_MODEL_PATH)")
+
+
+# ============== DATA-PARALLEL TRAINING ==============
+
+def train_distributed(strategy, architecture, output_path):
+    """
+    One worker of --workers N: the two training phases of train_model on this worker's shard
+    
+    Every worker runs this in lockstep. The global batch is N x BATCH_SIZE
+    and the learning rate grows with it (linear scaling rule).
+    
+    Returns:
+        history1, history2, (val_loss, val_accuracy) over the whole validation set
+    """
+    from distributed_training import worker_context, fit_distributed, evaluate_distributed
+    
+    worker_index, num_workers = worker_context()
+    global_batch_size = BATCH_SIZE * num_workers
+    learning_rate = LEARNING_RATE * num_workers
+    
+    # Every worker reads every num_workers-th file: disjoint shards that together cover the dataset
+    subsets = list_dataset(DATASET_PATH)
+    train_paths, train_labels = subsets["training"]
+    val_paths, val_labels = subsets["validation"]
+    train_shard = (train_paths[worker_index::num_workers], train_labels[worker_index::num_workers])
+    val_dataset = make_dataset(val_paths[worker_index::num_workers], val_labels[worker_index::num_workers],
+                               training=False)
+    # Same number of steps on every worker, or the last all-reduce would wait forever
+    steps_per_epoch = math.ceil(len(train_paths) / global_batch_size)
+    
+    print(f"\n🔀 Worker {worker_index + 1}/{num_workers}: {len(train_shard[0])} training images, "
+          f"{steps_per_epoch} steps of {global_batch_size} images per epoch")
+    print(f"   Learning rate: {learning_rate:g} ({LEARNING_RATE:g} x {num_workers} workers)")
+    
+    with strategy.scope():
+        model, base_model = build_model(architecture, learning_rate=learning_rate)
+    
+    # All workers see the same all-reduced val metrics, so they agree on every callback
+    # decision; only the chief writes the checkpoint
+    callbacks = create_callbacks(output_path, checkpoint=worker_index == 0)
+    train_dataset_fn = lambda: make_dataset(*train_shard, training=True, repeat=True)
+    
+    # Phase 1: Train only the top layers
+    print("\n" + "="*50)
+    print("📈 PHASE 1: Training top layers (base frozen)")
+    print("="*50)
+    
+    history1 = fit_distributed(strategy, model, train_dataset_fn, val_dataset, global_batch_size,
+                               epochs=15, steps_per_epoch=steps_per_epoch, callbacks=callbacks)
+    
+    # Phase 2: Fine-tune the entire model
+    print("\n" + "="*50)
+    print("📈 PHASE 2: Fine-tuning entire model")
+    print("="*50)
+    
+    base_model.trainable = True
+    with strategy.scope():
+        model.compile(
+            optimizer=Adam(learning_rate=learning_rate / 10),
+            loss='binary_crossentropy',
+            metrics=['accuracy']
+        )
+    
+    history2 = fit_distributed(strategy, model, train_dataset_fn, val_dataset, global_batch_size,
+                               epochs=EPOCHS - 15, steps_per_epoch=steps_per_epoch, callbacks=callbacks,
+                               initial_epoch=15)
+    
+    return history1, history2, evaluate_distributed(strategy, model, val_dataset, global_batch_size)
+
+
+def benchmark_worker(strategy, architecture, steps, result_path):
+    """One worker of a --scaling-report run: time full fine-tuning steps on synthetic images"""
+    from distributed_training import worker_context, benchmark_throughput
+    
+    worker_index, num_workers = worker_context()
+    with strategy.scope():
+        # Random weights: the step time does not depend on them, and nothing is downloaded
+        model, base_model = build_model(architecture, weights=None)
+        base_model.trainable = True
+        model.compile(optimizer=Adam(learning_rate=LEARNING_RATE / 10), loss='binary_crossentropy',
+                      metrics=['accuracy'])
+    
+    images_per_sec = benchmark_throughput(strategy, model, BATCH_SIZE, steps)
+    if worker_index == 0:
+        with open(result_path, "w") as f:
+            json.dump({
+                "workers": num_workers,
+                "per_worker_batch_size": BATCH_SIZE,
+                "global_batch_size": BATCH_SIZE * num_workers,
+                "steps": steps,
+                "images_per_sec": images_per_sec,
+            }, f)
+
+
+def scaling_report(args):
+    """Training throughput with each worker count in --scaling-workers"""
+    import tempfile
+    from distributed_training import launch_workers, print_scaling_report
+    
+    print(f"\n⏱️  Timing {args.benchmark_steps} fine-tuning steps of {args.architecture} "
+          f"({BATCH_SIZE} images per worker) with {args.scaling_workers} workers")
+    
+    results = []
+    for num_workers in sorted(set(args.scaling_workers)):
+        print(f"\n⏳ {num_workers} worker(s)...")
+        result_path = os.path.join(tempfile.gettempdir(), f"training_scaling_{os.getpid()}_{num_workers}.json")
+        exit_code = launch_workers(os.path.abspath(__file__), [
+            "--scaling-report",
+            "--architecture", args.architecture,
+            "--benchmark-steps", str(args.benchmark_steps),
+            "--benchmark-result", result_path,
+        ], num_workers)
+        if exit_code != 0:
+            continue
+        with open(result_path) as f:
+            results.append(json.load(f))
+        os.remove(result_path)
+        print(f"   {results[-1]['images_per_sec']:.1f} images/sec")
+    
+    if not results:
+        print("\n❌ No worker count completed")
+        return
+    print_scaling_report(results, SCALING_REPORT_PATH)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the oral lesion classifier")
+    parser.add_argument("--architecture", choices=["efficientnet", "mobilenet"], default=None,
+                        help="Backbone to train ('mobilenet' produces the cascade screening model "
+                             "and is the default student for --distill)")
+    parser.add_argument("--output", default=None, help="Where to save the trained model")
+    parser.add_argument("--distill", action="store_true",
+                        help=f"Train a student on soft targets from {TEACHER_MODEL_PATH}")
+    parser.add_argument("--augmentation", choices=["batched", "generator"], default="batched",
+                        help="'batched' augments whole batches in a tf.data pipeline (augmentation.py); "
+                             "'generator' uses ImageDataGenerator's per-image transforms "
+                             "(--distill always uses the batched pipeline)")
+    parser.add_argument("--micro-batch-size", type=int, default=None,
+                        help="Images per forward/backward pass (default: BATCH_SIZE); "
+                             "lower it to bound memory")
+    parser.add_argument("--accumulation-steps", type=int, default=1,
+                        help="Batches whose gradients are averaged into one update "
+                             "(effective batch = micro-batch size x this)")
+    parser.add_argument("--recompute", action="store_true",
+                        help="Recompute activations in the backward pass of phase 2 "
+                             "(less memory, about one extra forward pass per step)")
+    parser.add_argument("--recompute-segments", type=int, default=0,
+                        help="Segments for --recompute (0 = sqrt of the possible cut points)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Train data-parallel in this many local processes (1 = a single model.fit; "
+                             "more always uses the 'batched' tf.data pipeline)")
+    parser.add_argument("--scaling-report", action="store_true",
+                        help=f"Measure training throughput for each --scaling-workers count "
+                             f"and save it to {SCALING_REPORT_PATH}")
+    parser.add_argument("--scaling-workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="Worker counts for --scaling-report")
+    parser.add_argument("--benchmark-steps", type=int, default=20,
+                        help="Timed training steps per worker count in --scaling-report")
+    # Set by the launcher on the processes it starts
+    parser.add_argument("--worker-index", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--benchmark-result", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
+    
+    strategy = None
+    if args.worker_index is not None:
+        # Joins the cluster before TensorFlow runs any other op (check_gpu included)
+        from distributed_training import create_strategy
+        strategy = create_strategy()
+    
+    if args.architecture is None:
+        args.architecture = "mobilenet" if args.distill else "efficientnet"
+    
+    if args.scaling_report:
+        if strategy is None:
+            scaling_report(args)
+        else:
+            benchmark_worker(strategy, args.architecture, args.benchmark_steps, args.benchmark_result)
+        return
+    
+    if args.distill:
+        output_path = args.output or STUDENT_MODEL_PATH
+    else:
+        output_path = args.output or (
+            SCREENING_MODEL_PATH if args.architecture == "mobilenet" else OUTPUT_MODEL_PATH
+        )
+    
     print("="*60)
     print("🦷 ORAL LESION MODEL TRAINING")
-    print("   Using EfficientNetB0 with Transfer Learning")
+    if args.distill:
+        print(f"   Distilling {TEACHER_MODEL_PATH} into a {args.architecture} student")
+    elif args.architecture == "mobilenet":
+        print("   Using MobileNetV2 with Transfer Learning (screening model)")
+    else:
+        print("   Using EfficientNetB0 with Transfer Learning")
+    if args.workers > 1 and not args.distill:
+        print(f"   Data-parallel across {args.workers} worker processes")
+    micro_batch_size = args.micro_batch_size or BATCH_SIZE
+    if args.accumulation_steps > 1 or args.micro_batch_size or args.recompute:
+        print(f"   Memory-bounded: batches of {micro_batch_size} x {args.accumulation_steps} accumulation steps "
+              f"= effective batch {micro_batch_size * args.accumulation_steps}"
+              + (", activations recomputed in phase 2" if args.recompute else ""))
     print("="*60)
     
+    if TRAIN_CONFIG:
+        print(f"\n⚙️  Using tuned hyperparameters from {TRAIN_CONFIG_PATH}:")
+        for name, value in TRAIN_CONFIG.items():
+            print(f"   {name} = {value}")
+    
     # Check GPU
     check_gpu()
     
@@ -267,16 +825,51 @@ def main():
         return
     
     # Create output directory
-    os.makedirs(os.path.dirname(OUTPUT_MODEL_PATH), exist_ok=True)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    
+    memory_options = args.accumulation_steps > 1 or args.micro_batch_size or args.recompute
+    if memory_options and (args.distill or args.workers > 1):
+        print("\n⚠️ --micro-batch-size, --accumulation-steps and --recompute only apply to "
+              "single-process training without --distill; ignored")
+    elif (args.accumulation_steps > 1 or args.recompute) and not KERAS_3:
+        print(f"\n❌ --accumulation-steps and --recompute need Keras 3 (TensorFlow >= 2.16), "
+              f"found Keras {tf.keras.__version__}")
+        return
     
-    # Create data generators
-    train_gen, val_gen = create_data_generators(DATASET_PATH)
+    if args.distill:
+        if args.workers > 1:
+            print("\n⚠️ --distill trains in a single process; --workers is ignored")
+        distill(args.architecture, output_path)
+        return
     
-    # Build model
-    model, base_model = build_model()
+    if args.workers > 1 and strategy is None:
+        # Worker 0 (the chief) prints to this console, the others to log files
+        from distributed_training import launch_workers
+        launch_workers(os.path.abspath(__file__), sys.argv[1:], args.workers)
+        return
     
-    # Train
-    history1, history2 = train_model(model, base_model, train_gen, val_gen)
+    if strategy is not None:
+        history1, history2, (val_loss, val_acc) = train_distributed(strategy, args.architecture, output_path)
+        if args.worker_index != 0:
+            return
+    else:
+        # Create data generators
+        if args.augmentation == "batched":
+            train_gen, val_gen = create_datasets(DATASET_PATH, micro_batch_size)
+        else:
+            train_gen, val_gen = create_data_generators(DATASET_PATH, micro_batch_size)
+        
+        # Build model
+        model, base_model = build_model(args.architecture)
+        
+        # Train
+        history1, history2 = train_model(
+            model, base_model, train_gen, val_gen, output_path,
+            accumulation_steps=args.accumulation_steps,
+            recompute=args.recompute,
+            recompute_segments=args.recompute_segments
+        )
+        val_loss, val_acc = model.evaluate(val_gen, verbose=0)
     
     # Plot training history
     try:
@@ -289,14 +882,20 @@ def main():
     print("📊 FINAL EVALUATION")
     print("="*50)
     
-    val_loss, val_acc = model.evaluate(val_gen, verbose=0)
     print(f"   Validation Loss: {val_loss:.4f}")
     print(f"   Validation Accuracy: {val_acc:.2%}")
     
-    print(f"\n✅ Model saved to: {OUTPUT_MODEL_PATH}")
+    print(f"\n✅ Model saved to: {output_path}")
+    if args.architecture == "mobilenet":
+        print("\n🔄 To use this model as the cascade screening stage:")
+        print(f"   1. Set SCREENING_MODEL_PATH={output_path} and CASCADE_ENABLED=true")
+        print("   2. Run: python calibrate_cascade.py")
+        print("   3. Restart backend server")
+        return
+    
     print("\n🔄 To use this model, replace the old one:")
     print(f"   1. Backup: models/oral_lesion_model.h5")
-    print(f"   2. Rename: {OUTPUT_MODEL_PATH} → models/oral_lesion_model.h5")
+    print(f"   2. Rename: {output_path} → models/oral_lesion_model.h5")
     print("   3. Restart backend server")
 
 